@@ -0,0 +1,140 @@
+import copy
+import io
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+import seaborn as sns
+from matplotlib.figure import Figure
+
+from perf import span
+
+RESULTS = ["Pass", "Fail", "Hold"]
+RESULT_COLORS = ['#28a745', '#dc3545', '#ffc107']
+# Rendered chart images kept across reruns and sessions
+FIGURE_CACHE_SIZE = 32
+
+_figures = OrderedDict()
+_figures_lock = threading.Lock()
+
+
+def _by_count(counts):
+    """Largest first, ties by name (so updated and rebuilt aggregates plot the same)"""
+    return counts.sort_index().sort_values(ascending=False, kind="stable")
+
+
+class AnalyticsAggregates:
+    """Everything the Analytics page plots, computed once per data version.
+
+    The tester filter only slices these small frames; the task rows are not
+    rescanned. Trends over time come from the result history (history.py).
+    """
+
+    def __init__(self, df, total_tasks=None):
+        # `df` may hold only the rows with a result, given the number of tasks
+        self.total_tasks = df.shape[0] if total_tasks is None else total_tasks
+        self.completed_tasks, self.result_counts, self.tester_counts = self._counts(df)
+        self.testers = sorted(self.tester_counts.index)
+
+    @staticmethod
+    def _counts(df):
+        completed = int(df["Test Result"].notna().sum())
+        recorded = df[(df["Test Result"].notna()) | (df["Timestamp"].notna())]
+        result_counts = recorded["Test Result"].dropna().value_counts().reindex(RESULTS, fill_value=0)
+
+        dated = recorded[pd.to_datetime(recorded["Timestamp"], errors='coerce').notna()]
+        # Per-tester counts only cover results with a valid timestamp (as the page always did)
+        tester_counts = _by_count(dated["Tester Name"].value_counts())
+        return completed, result_counts, tester_counts
+
+    def updated(self, old_df, df, positions):
+        """Aggregates for `df`, a new version in which only rows `positions` changed: their old
+        contribution is subtracted and the new one added"""
+        old_completed, old_results, old_testers = self._counts(old_df.iloc[positions])
+        completed, results, testers = self._counts(df.iloc[positions])
+
+        def apply(counts, removed, added):
+            counts = counts.sub(removed, fill_value=0).add(added, fill_value=0)
+            return counts[counts > 0].astype("int64")
+
+        new = copy.copy(self)
+        new.completed_tasks = self.completed_tasks - old_completed + completed
+        new.result_counts = self.result_counts - old_results + results
+        new.tester_counts = _by_count(apply(self.tester_counts, old_testers, testers))
+        new.testers = sorted(new.tester_counts.index)
+        return new
+
+    @property
+    def completion_percent(self):
+        return int((self.completed_tasks / self.total_tasks) * 100) if self.total_tasks > 0 else 0
+
+    def tester_summary(self, tester=None):
+        counts = self.tester_counts if tester is None else self.tester_counts[self.tester_counts.index == tester]
+        summary = counts.reset_index()
+        summary.columns = ["Tester Name", "Tasks Completed"]
+        return summary
+
+
+def render_figure(key, draw, figsize=None):
+    """PNG bytes of a chart, cached by `key` (include the data version and filters).
+
+    `draw(fig, ax)` is only called on a cache miss. The figure is built without pyplot,
+    whose global figure state is not safe across concurrent sessions.
+    """
+    with _figures_lock:
+        png = _figures.get(key)
+        if png is not None:
+            _figures.move_to_end(key)
+            return png
+    with span("chart", chart=str(key[1]) if len(key) > 1 else None):
+        fig = Figure(figsize=figsize)
+        ax = fig.subplots()
+        draw(fig, ax)
+        bio = io.BytesIO()
+        fig.savefig(bio, format="png", bbox_inches="tight")
+        png = bio.getvalue()
+    with _figures_lock:
+        _figures[key] = png
+        while len(_figures) > FIGURE_CACHE_SIZE:
+            _figures.popitem(last=False)
+    return png
+
+
+def draw_result_pie(result_counts):
+    def draw(fig, ax):
+        ax.pie(result_counts, labels=result_counts.index, autopct='%1.1f%%', startangle=90, colors=RESULT_COLORS)
+        ax.axis('equal')
+    return draw
+
+
+def draw_trend(trend, period="Day"):
+    """Results per period (a history rollup) as bars, with the pass rate on a second axis"""
+    def draw(fig, ax):
+        labels = trend.index.astype(str)
+        ax.bar(labels, trend["Results"], color="#9ecae1", label="Results")
+        ax.set_ylabel("Results")
+        ax.set_xlabel(period)
+        ax.set_title(f"Results and Pass Rate Per {period}")
+        ax.tick_params(axis='x', labelrotation=45)
+        for label in ax.get_xticklabels():
+            label.set_ha('right')
+
+        rate_ax = ax.twinx()
+        rate_ax.plot(labels, trend["Pass Rate"] * 100, color=RESULT_COLORS[0], marker="o", label="Pass rate")
+        rate_ax.set_ylim(0, 105)
+        rate_ax.set_ylabel("Pass rate (%)")
+        fig.tight_layout()
+    return draw
+
+
+def draw_tester_bar(tester_summary):
+    def draw(fig, ax):
+        sns.barplot(data=tester_summary, x="Tester Name", y="Tasks Completed", palette="Blues_d", ax=ax)
+
+        ax.set_xlabel("Tester", fontsize=10)
+        ax.set_ylabel("Task Count", fontsize=10)
+        ax.set_title("Tasks Completed Per Tester", fontsize=12)
+        ax.tick_params(axis='x', labelrotation=0, labelsize=8)
+        ax.tick_params(axis='y', labelsize=8)
+        fig.tight_layout()  # Adjust spacing to avoid cut-offs
+    return draw
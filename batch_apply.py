@@ -0,0 +1,161 @@
+"""Apply a batch of test results without the Streamlit app.
+
+Input is CSV or JSONL (by file extension, or --format) with one result per
+row/line:
+
+    task_id, tester_name, test_result, comment, screenshots, timestamp
+
+`comment`, `screenshots` and `timestamp` are optional. In CSV, `screenshots`
+is a ";"-separated list of image paths; in JSONL it may also be a list.
+Relative paths are resolved against the batch file's directory. Without a
+timestamp the time of the run is used.
+
+All results are validated first, then applied to one loaded workbook (or
+SQLite database) with a single Summary update and a single save. With --sync
+the result is uploaded to GitHub once, merging concurrent remote changes.
+
+    python batch_apply.py results.csv
+    python batch_apply.py results.jsonl --excel main_excel.xlsx --sync --token $GITHUB_TOKEN
+    python batch_apply.py results.csv --shard 2025-04
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+
+from shards import get_registry
+from storage import get_storage
+from utils import normalize_id, normalize_ids
+
+RESULTS = ("Pass", "Fail", "Hold")
+FIELDS = ("task_id", "tester_name", "test_result", "comment", "screenshots", "timestamp")
+# Same defaults as main.py
+GITHUB_REPO = "Ai-TestingApp/Ai-Testing-Tool"
+GITHUB_FILE = "main_excel.xlsx"
+
+
+def read_batch(path, fmt=None):
+    """Rows of the batch file as dicts with FIELDS keys (missing ones are None)"""
+    fmt = fmt or ("jsonl" if os.path.splitext(path)[1].lower() in (".jsonl", ".json") else "csv")
+    with open(path, "r", encoding="utf-8-sig", newline="") as f:
+        if fmt == "jsonl":
+            rows = [json.loads(line) for line in f if line.strip()]
+        else:
+            rows = list(csv.DictReader(f))
+    base_dir = os.path.dirname(os.path.abspath(path))
+    batch = []
+    for row in rows:
+        item = {field: row.get(field) or None for field in FIELDS}
+        screenshots = item["screenshots"] or []
+        if isinstance(screenshots, str):
+            screenshots = [p.strip() for p in screenshots.split(";") if p.strip()]
+        item["screenshots"] = [p if os.path.isabs(p) else os.path.join(base_dir, p) for p in screenshots]
+        if item["task_id"] is not None:
+            item["task_id"] = str(item["task_id"]).strip()
+        batch.append(item)
+    return batch
+
+
+def validate(batch, known_ids):
+    """List of (line, message) problems; `known_ids` are the normalized Sheet1 task IDs"""
+    problems = []
+    for line, item in enumerate(batch, start=1):
+        if not item["task_id"]:
+            problems.append((line, "missing task_id"))
+        elif normalize_id(item["task_id"]) not in known_ids:
+            problems.append((line, f"unknown task_id {item['task_id']}"))
+        if not item["tester_name"]:
+            problems.append((line, "missing tester_name"))
+        if item["test_result"] not in RESULTS:
+            problems.append((line, f"test_result must be one of {', '.join(RESULTS)}, got {item['test_result']!r}"))
+        for path in item["screenshots"]:
+            if not os.path.isfile(path):
+                problems.append((line, f"screenshot not found: {path}"))
+    return problems
+
+
+def load_screenshots(item):
+    images = []
+    for path in item["screenshots"]:
+        with open(path, "rb") as f:
+            images.append(f.read())
+    return dict(item, screenshots=images)
+
+
+def sync_once(storage, args):
+    """Upload the result to GitHub, merging remote changes on conflict; returns the worker status"""
+    import blobstore
+    from github_sync import SyncWorker, get_client
+
+    client = get_client(args.token, args.repo, branch=args.branch, base_url=args.api_url)
+    worker = SyncWorker(client, args.excel, args.remote_file, merge=storage.merge_remote,
+                        read_local=storage.export_bytes if storage.name == "sqlite" else None,
+                        blob_store=(blobstore.get_blob_store(args.excel)
+                                    if blobstore.SCREENSHOT_STORAGE != "embed" else None),
+                        blob_remote_dir=blobstore.remote_blob_dir(args.remote_file))
+    worker.notify(storage.version(), args.message)
+    worker.wait_idle(timeout=args.sync_timeout)
+    return worker.status()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("batch", help="CSV or JSONL file with results")
+    parser.add_argument("--format", choices=["csv", "jsonl"], help="input format (default: from the extension)")
+    parser.add_argument("--excel", help="workbook to update (default: the active shard, see shards.py)")
+    parser.add_argument("--shard", help="name of the shard (test cycle) to update instead")
+    parser.add_argument("--backend", choices=["excel", "sqlite"], help="storage backend (default: storage.py)")
+    parser.add_argument("--dry-run", action="store_true", help="only validate the batch")
+    parser.add_argument("--sync", action="store_true", help="upload to GitHub once after saving")
+    parser.add_argument("--token", default=os.environ.get("GITHUB_TOKEN"), help="GitHub token (default: $GITHUB_TOKEN)")
+    parser.add_argument("--repo", default=GITHUB_REPO)
+    parser.add_argument("--branch", default="main")
+    parser.add_argument("--api-url", default="https://api.github.com", help="GitHub API base URL")
+    parser.add_argument("--remote-file", help="path in the repository (default: the shard's)")
+    parser.add_argument("--message", default="Batch update from batch_apply.py")
+    parser.add_argument("--sync-timeout", type=float, default=300)
+    args = parser.parse_args(argv)
+
+    if args.sync and not args.token:
+        print("❌ --sync needs --token or $GITHUB_TOKEN", file=sys.stderr)
+        return 1
+
+    registry = get_registry()
+    shard = registry.get(args.shard) if args.shard else registry.active
+    if args.excel is None or args.shard:
+        args.excel = shard.path
+    args.remote_file = args.remote_file or (shard.remote if args.excel == shard.path else GITHUB_FILE)
+    storage = get_storage(args.excel, backend=args.backend,
+                          db_path=shard.db_path if args.excel == shard.path else None)
+    task_ids = storage.load()["Task ID"]
+    # normalized -> Task ID as written in Sheet1, so "2" and "2.0" land in the same block as in the app
+    sheet_ids = dict(zip(normalize_ids(task_ids), task_ids))
+    batch = read_batch(args.batch, args.format)
+    problems = validate(batch, sheet_ids)
+    for line, message in problems:
+        print(f"{args.batch}:{line}: {message}", file=sys.stderr)
+    if problems:
+        print(f"❌ {len(problems)} problem(s), nothing applied", file=sys.stderr)
+        return 1
+    if args.dry_run:
+        print(f"✅ {len(batch)} result(s) valid")
+        return 0
+
+    for item in batch:
+        item["task_id"] = sheet_ids[normalize_id(item["task_id"])]
+    version = storage.submit_many([load_screenshots(item) for item in batch])
+    print(f"✅ Applied {len(batch)} result(s) to {args.excel if storage.name == 'excel' else storage.db_path} "
+          f"(data version {version})")
+
+    if args.sync:
+        status = sync_once(storage, args)
+        if status["state"] != "synced":
+            print(f"❌ GitHub sync did not finish: {status['last_error'] or status['state']}", file=sys.stderr)
+            return 1
+        print(f"☁️ Synced to {args.repo}/{args.remote_file}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
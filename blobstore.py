@@ -0,0 +1,117 @@
+import os
+import posixpath
+import threading
+
+from github_sync import GitHubSyncError
+
+# How screenshots go into the "Task ID N" sheets:
+#   "embed"     - full image embedded in the workbook (the original behaviour)
+#   "thumbnail" - full image in the blob store, small thumbnail + link in the workbook
+#   "link"      - full image in the blob store, only a link cell in the workbook
+SCREENSHOT_STORAGE = "embed"
+# Blob directory next to the workbook (links in the workbook use this relative path)
+BLOB_DIR = "screenshots"
+
+EXTENSIONS = {"png": "png", "palette": "png", "jpeg": "jpg"}
+
+
+class BlobStore:
+    """Content-addressed screenshot files: `<root>/<digest>.<ext>`, written once.
+
+    `uploaded.txt` records the names already pushed to GitHub, so each sync only
+    uploads blobs added since the previous one.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self.manifest_path = os.path.join(root, "uploaded.txt")
+        self._lock = threading.Lock()
+        self._uploaded = None
+
+    @staticmethod
+    def name_for(screenshot):
+        return f"{screenshot.digest}.{EXTENSIONS.get(screenshot.format, 'png')}"
+
+    def path(self, name):
+        return os.path.join(self.root, name)
+
+    def put(self, screenshot):
+        """Store a ProcessedScreenshot's full image; returns its blob name"""
+        name = self.name_for(screenshot)
+        path = self.path(name)
+        if not os.path.exists(path):
+            os.makedirs(self.root, exist_ok=True)
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(screenshot.data)
+            os.replace(tmp_path, path)
+        return name
+
+    def get(self, name):
+        """Bytes of a stored blob, or None if it is not available locally"""
+        try:
+            with open(self.path(name), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def names(self):
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(name for name in os.listdir(self.root)
+                      if name != os.path.basename(self.manifest_path) and not name.endswith(".tmp"))
+
+    def _load_uploaded(self):
+        if self._uploaded is None:
+            self._uploaded = set()
+            if os.path.exists(self.manifest_path):
+                with open(self.manifest_path, "r", encoding="utf-8") as f:
+                    self._uploaded = {line.strip() for line in f if line.strip()}
+        return self._uploaded
+
+    def pending_uploads(self):
+        with self._lock:
+            uploaded = self._load_uploaded()
+            return [name for name in self.names() if name not in uploaded]
+
+    def upload_pending(self, client, remote_dir, message="Add screenshots"):
+        """Push blobs not uploaded yet to `remote_dir` in the repo; returns how many were sent"""
+        sent = 0
+        for name in self.pending_uploads():
+            remote_path = f"{remote_dir}/{name}" if remote_dir else name
+            try:
+                client.put_file(remote_path, self.get(name), None, f"{message}: {name}")
+            except GitHubSyncError as e:
+                # Same name means same content: a blob pushed by another instance is already there
+                if e.status_code not in (409, 422):
+                    raise
+            with self._lock:
+                self._load_uploaded().add(name)
+                with open(self.manifest_path, "a", encoding="utf-8") as f:
+                    f.write(name + "\n")
+            sent += 1
+        return sent
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def blob_root(workbook_path):
+    """Blob directory of the workbook at `workbook_path`: BLOB_DIR next to it, so the relative
+    links in the workbook resolve from wherever it is opened (e.g. shards/screenshots)"""
+    return os.path.join(os.path.dirname(os.path.abspath(workbook_path)), BLOB_DIR)
+
+
+def remote_blob_dir(remote_path):
+    """Blob directory in the GitHub repo for the workbook stored at `remote_path`"""
+    return posixpath.join(posixpath.dirname(remote_path), BLOB_DIR)
+
+
+def get_blob_store(workbook_path):
+    """Process-wide blob store of the workbook at `workbook_path`"""
+    root = blob_root(workbook_path)
+    with _stores_lock:
+        if root not in _stores:
+            _stores[root] = BlobStore(root)
+        return _stores[root]
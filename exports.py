@@ -0,0 +1,135 @@
+"""Downloads built on demand and cached per (data version, filter), shared by all sessions.
+
+The full workbook is the storage's own export; filtered variants (one tester,
+a Task ID range, results only) are Sheet1-style tables, as .xlsx or CSV. Each
+variant is built at most once per data version, even when several sessions ask
+at the same time, and kept in an LRU bounded by EXPORT_CACHE_BYTES.
+"""
+import io
+import threading
+from collections import OrderedDict, namedtuple
+
+import openpyxl
+import pandas as pd
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import PatternFill
+
+from perf import span
+from storage import SHEET1_COLUMNS, sheet_task_id
+from utils import RESULT_FILLS, normalize_ids
+
+# Total size of the cached downloads
+EXPORT_CACHE_BYTES = 256 * 1024 * 1024
+XLSX_MIME = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+# `first_task`/`last_task` are normalized Task IDs (inclusive, in Sheet1 order); fmt is "xlsx" or "csv"
+ExportFilter = namedtuple("ExportFilter", ["tester", "first_task", "last_task", "results_only", "fmt"],
+                          defaults=(None, None, None, False, "xlsx"))
+FULL_EXPORT = ExportFilter()
+
+_exports = OrderedDict()
+_exports_size = 0
+_exports_lock = threading.Lock()
+_building = {}
+
+
+def filter_frame(df, export_filter):
+    """Rows of `df` selected by `export_filter`; KeyError for a Task ID that is not in Sheet1"""
+    mask = pd.Series(True, index=df.index)
+    if export_filter.first_task is not None or export_filter.last_task is not None:
+        normalized = normalize_ids(df["Task ID"]).to_numpy()
+        positions = pd.Series(range(len(df)), index=df.index)
+        for bound, task_id in (("first", export_filter.first_task), ("last", export_filter.last_task)):
+            if task_id is None:
+                continue
+            matches = (normalized == task_id).nonzero()[0]
+            if not len(matches):
+                raise KeyError(f"Task ID {task_id} not found")
+            mask &= positions >= matches[0] if bound == "first" else positions <= matches[0]
+    if export_filter.tester is not None:
+        mask &= df["Tester Name"] == export_filter.tester
+    if export_filter.results_only:
+        mask &= df["Test Result"].notna()
+    return df.loc[mask.to_numpy(), SHEET1_COLUMNS]
+
+
+def _table_workbook(frame):
+    """Sheet1-style .xlsx of `frame`, with the result cells filled as in the app's workbook"""
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet("Sheet1")
+    ws.append(SHEET1_COLUMNS)
+    result_column = SHEET1_COLUMNS.index("Test Result")
+    for values in frame.itertuples(index=False):
+        values = [None if pd.isna(value) else value for value in values]
+        values[0] = sheet_task_id(values[0])
+        fill_color = RESULT_FILLS.get(values[result_column])
+        if fill_color:
+            cell = WriteOnlyCell(ws, value=values[result_column])
+            cell.fill = PatternFill(start_color=fill_color, end_color=fill_color, fill_type="solid")
+            values[result_column] = cell
+        ws.append(values)
+    bio = io.BytesIO()
+    wb.save(bio)
+    return bio.getvalue()
+
+
+def build_export(storage, export_filter):
+    if export_filter == FULL_EXPORT:
+        return storage.export_bytes()
+    frame = filter_frame(storage.load(), export_filter)
+    if export_filter.fmt == "csv":
+        return frame.to_csv(index=False).encode("utf-8")
+    return _table_workbook(frame)
+
+
+def _store(key, data):
+    global _exports_size
+    storage, version, export_filter = key
+    # Older versions of the same download are never asked for again
+    for stale in [other for other in _exports if other[0] is storage and other[2] == export_filter]:
+        _exports_size -= len(_exports.pop(stale))
+    if len(data) > EXPORT_CACHE_BYTES:
+        return
+    _exports[key] = data
+    _exports_size += len(data)
+    while _exports_size > EXPORT_CACHE_BYTES:
+        _exports_size -= len(_exports.popitem(last=False)[1])
+
+
+def get_export(storage, export_filter=FULL_EXPORT):
+    """Bytes of a download for the current data version; built on the first request only.
+    A build that overlapped a data change is returned but not cached: it may hold the newer data"""
+    key = (storage, storage.version(), export_filter)
+    with _exports_lock:
+        data = _exports.get(key)
+        if data is not None:
+            _exports.move_to_end(key)
+            return data
+        build_lock = _building.setdefault(key, threading.Lock())
+    with build_lock:
+        with _exports_lock:
+            data = _exports.get(key)
+        if data is None:
+            with span("export.build", fmt=export_filter.fmt, full=export_filter == FULL_EXPORT):
+                data = build_export(storage, export_filter)
+            if storage.version() == key[1]:
+                with _exports_lock:
+                    _store(key, data)
+    with _exports_lock:
+        _building.pop(key, None)
+    return data
+
+
+def file_name(export_filter):
+    if export_filter == FULL_EXPORT:
+        return "updated_results.xlsx"
+    parts = ["results" if export_filter.results_only else "tasks"]
+    if export_filter.tester:
+        parts.append(export_filter.tester.replace(" ", "_"))
+    if export_filter.first_task or export_filter.last_task:
+        parts.append(f"{export_filter.first_task or 'first'}-{export_filter.last_task or 'last'}")
+    return "_".join(parts) + "." + export_filter.fmt
+
+
+def mime_type(export_filter):
+    return "text/csv" if export_filter.fmt == "csv" else XLSX_MIME
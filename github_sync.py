@@ -0,0 +1,519 @@
+import base64
+import json
+import os
+import random
+import threading
+import time
+
+from perf import span, trace
+
+GITHUB_API_URL = "https://api.github.com"
+# Status codes the contents API uses when the given SHA is not the current one
+CONFLICT_STATUSES = (409, 422)
+MAX_MERGE_ATTEMPTS = 5
+# (connect, read) timeouts in seconds
+TIMEOUT = (10, 60)
+# Kept-alive connections per client, and retries of GETs (and of connections that never got through)
+POOL_SIZE = 8
+MAX_RETRIES = 3
+RETRY_BACKOFF = 0.5
+RETRY_STATUSES = (500, 502, 503, 504)
+# Files larger than this are committed through the Git Data API instead of the contents endpoint
+LARGE_FILE_BYTES = 50 * 1024 * 1024
+# Raw bytes base64-encoded at a time while a request body is sent (a multiple of 3)
+ENCODE_CHUNK = 3 * 256 * 1024
+
+
+class GitHubSyncError(Exception):
+    def __init__(self, message, status_code=None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def _requests():
+    # Imported on the first API call, so app runs that never sync don't load it
+    import requests
+    return requests
+
+
+class _Base64Body:
+    """JSON request body `{**fields, "content": "<base64 of content>"}`, encoded chunk by chunk as it is sent.
+
+    The base64 text (a third larger than the file) and the JSON string around
+    it never exist in memory as a whole. Its length is known up front, so it
+    goes out with a Content-Length rather than chunked.
+    """
+
+    def __init__(self, fields, content):
+        self._prefix = json.dumps({**fields, "content": ""})[:-2].encode()
+        self._suffix = b'"}'
+        self._content = memoryview(content)
+        self._length = len(self._prefix) + 4 * ((len(content) + 2) // 3) + len(self._suffix)
+        self.seek(0)
+
+    def __len__(self):
+        return self._length
+
+    def __iter__(self):
+        return iter(lambda: self.read(ENCODE_CHUNK), b"")
+
+    def _parts(self):
+        yield self._prefix
+        for start in range(0, len(self._content), ENCODE_CHUNK):
+            yield base64.b64encode(self._content[start:start + ENCODE_CHUNK])
+        yield self._suffix
+
+    def seek(self, position, whence=0):
+        # Only rewinding is needed (urllib3 rewinds the body before a retry)
+        if position or whence:
+            raise OSError("request body can only be rewound")
+        self._iter = self._parts()
+        self._part = b""
+        self._offset = 0
+        self._position = 0
+
+    def tell(self):
+        return self._position
+
+    def read(self, size=-1):
+        chunks = []
+        wanted = size
+        while size < 0 or wanted > 0:
+            if self._offset >= len(self._part):
+                self._part, self._offset = next(self._iter, b""), 0
+                if not self._part:
+                    break
+            take = len(self._part) - self._offset
+            if size >= 0:
+                take = min(take, wanted)
+                wanted -= take
+            chunks.append(self._part[self._offset:self._offset + take])
+            self._offset += take
+        data = b"".join(chunks)
+        self._position += len(data)
+        return data
+
+
+class ContentsClient:
+    """Minimal client for the GitHub contents API of one repository.
+
+    Requests go through one pooled, kept-alive session with retries. The
+    repository metadata and the last SHA seen for each path are cached.
+    Uploads are base64-encoded while they are sent. Files over
+    LARGE_FILE_BYTES are committed through the Git Data API (blob, tree,
+    commit, ref), with the same SHA check as the contents endpoint.
+    `base_url` can point at a local stand-in (see tools/fake_github.py).
+    """
+
+    def __init__(self, token, repo, branch="main", base_url=GITHUB_API_URL, timeout=TIMEOUT):
+        self.repo = repo
+        self._branch = branch
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.headers = {
+            "Authorization": f"Bearer {token}",
+            "Accept": "application/vnd.github.v3+json"
+        }
+        self._session = None
+        self._session_lock = threading.Lock()
+        self._repo_info = None
+        self._shas = {}
+
+    @property
+    def session(self):
+        with self._session_lock:
+            if self._session is None:
+                requests = _requests()
+                from urllib3.util.retry import Retry
+
+                retry = Retry(total=MAX_RETRIES, backoff_factor=RETRY_BACKOFF, status_forcelist=RETRY_STATUSES,
+                              allowed_methods=frozenset(["GET"]), raise_on_status=False)
+                adapter = requests.adapters.HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE,
+                                                        max_retries=retry)
+                session = requests.Session()
+                session.headers.update(self.headers)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                self._session = session
+            return self._session
+
+    def _request(self, method, endpoint, **kwargs):
+        return self.session.request(method, f"{self.base_url}/repos/{self.repo}{endpoint}", timeout=self.timeout,
+                                    **kwargs)
+
+    def _api(self, method, endpoint, what, **kwargs):
+        response = self._request(method, endpoint, **kwargs)
+        if response.status_code not in (200, 201):
+            raise GitHubSyncError(f"❌ {what} failed: {response.status_code}, {response.text}", response.status_code)
+        return response.json()
+
+    def repo_info(self):
+        """Repository metadata (default branch, size, ...), fetched once"""
+        if self._repo_info is None:
+            self._repo_info = self._api("GET", "", "Reading repository metadata")
+        return self._repo_info
+
+    @property
+    def branch(self):
+        # None means the repository's default branch
+        return self._branch or self.repo_info()["default_branch"]
+
+    def _url(self, path):
+        return f"/contents/{path}"
+
+    def known_sha(self, path):
+        """SHA of `path` as of the last response that mentioned it (None if never seen)"""
+        return self._shas.get(path)
+
+    def get_sha(self, path):
+        with span("github.get_sha", path=path):
+            response = self._request("GET", self._url(path), params={"ref": self.branch})
+        if response.status_code != 200:
+            raise GitHubSyncError(f"❌ Failed to get file SHA from GitHub: {response.status_code}, {response.text}",
+                                  response.status_code)
+        sha = self._shas[path] = response.json()["sha"]
+        return sha
+
+    def poll(self, path, etag=None):
+        """Conditional GET of the file's metadata: None if unchanged since `etag`, else (etag, sha).
+
+        GitHub answers an unchanged If-None-Match with 304, which does not count
+        against the rate limit, so this is cheap to call every few seconds.
+        """
+        headers = {"If-None-Match": etag} if etag else {}
+        with span("github.poll", path=path):
+            response = self._request("GET", self._url(path), headers=headers, params={"ref": self.branch})
+        if response.status_code == 304:
+            return None
+        if response.status_code != 200:
+            raise GitHubSyncError(f"❌ Failed to check file on GitHub: {response.status_code}, {response.text}",
+                                  response.status_code)
+        sha = self._shas[path] = response.json()["sha"]
+        return response.headers.get("ETag"), sha
+
+    def get_file(self, path):
+        """Return (sha, content bytes) of the file on the branch"""
+        with span("github.get_file", path=path):
+            return self._get_file(path)
+
+    def _get_file(self, path):
+        response = self._request("GET", self._url(path), params={"ref": self.branch})
+        if response.status_code != 200:
+            raise GitHubSyncError(f"❌ Failed to get file from GitHub: {response.status_code}, {response.text}",
+                                  response.status_code)
+        meta = response.json()
+        self._shas[path] = meta["sha"]
+        if meta.get("encoding") == "base64" and meta.get("content"):
+            return meta["sha"], base64.b64decode(meta["content"])
+        # Files over 1 MB come without inline content; fetch the raw bytes instead
+        raw = self._request("GET", self._url(path), headers={"Accept": "application/vnd.github.raw"},
+                            params={"ref": self.branch})
+        if raw.status_code != 200:
+            raise GitHubSyncError(f"❌ Failed to download file from GitHub: {raw.status_code}", raw.status_code)
+        return meta["sha"], raw.content
+
+    def put_file(self, path, content, sha, message):
+        with span("github.put_file", path=path, bytes=len(content)):
+            if len(content) > LARGE_FILE_BYTES:
+                return self._put_large_file(path, content, sha, message)
+            return self._put_file(path, content, sha, message)
+
+    def _put_file(self, path, content, sha, message):
+        data = {
+            "message": message,
+            "branch": self.branch
+        }
+        if sha is not None:
+            # Omitted when creating a new file
+            data["sha"] = sha
+        response = self._request("PUT", self._url(path), data=_Base64Body(data, content),
+                                 headers={"Content-Type": "application/json"})
+        if response.status_code not in (200, 201):
+            raise GitHubSyncError(f"⚠️ GitHub update failed: {response.status_code} {response.text}",
+                                  response.status_code)
+        result = response.json()
+        self._shas[path] = result["content"]["sha"]
+        return result
+
+    def _put_large_file(self, path, content, sha, message):
+        """Commit `content` as blob -> tree -> commit -> ref update, for files the contents API refuses"""
+        try:
+            current = self.get_sha(path)
+        except GitHubSyncError as e:
+            if e.status_code != 404:
+                raise
+            current = None
+        if current != sha:
+            # Same answers as the contents API: 409 for a stale SHA, 422 for creating an existing file
+            raise GitHubSyncError(f"⚠️ GitHub update failed: {path} is at {current}, not {sha}",
+                                  409 if sha else 422)
+        branch = self.branch
+        blob = self._api("POST", "/git/blobs", "Uploading blob", data=_Base64Body({"encoding": "base64"}, content),
+                         headers={"Content-Type": "application/json"})["sha"]
+        head = self._api("GET", f"/git/ref/heads/{branch}", "Reading branch")["object"]["sha"]
+        base_tree = self._api("GET", f"/git/commits/{head}", "Reading commit")["tree"]["sha"]
+        tree = self._api("POST", "/git/trees", "Creating tree", json={
+            "base_tree": base_tree,
+            "tree": [{"path": path, "mode": "100644", "type": "blob", "sha": blob}],
+        })["sha"]
+        commit = self._api("POST", "/git/commits", "Creating commit",
+                           json={"message": message, "tree": tree, "parents": [head]})
+        # Not forced: if the branch moved since `head` this fails with 422, which callers treat as a conflict
+        self._api("PATCH", f"/git/refs/heads/{branch}", "Updating branch", json={"sha": commit["sha"]})
+        self._shas[path] = blob
+        return {"content": {"path": path, "sha": blob}, "commit": commit}
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(token, repo, branch="main", base_url=GITHUB_API_URL):
+    """Process-wide ContentsClient (and so one connection pool) per token, repository and branch"""
+    key = (token, repo, branch, base_url)
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            client = _clients[key] = ContentsClient(token, repo, branch=branch, base_url=base_url)
+        return client
+
+
+class SyncWorker:
+    """Uploads the local workbook to GitHub from a background thread.
+
+    `notify(version)` only records that a newer version is on disk, so a burst
+    of submissions collapses into one upload of the latest file. Failed uploads
+    are retried with exponential backoff.
+
+    With a `merge` callable the worker does optimistic concurrency: every PUT
+    carries the SHA of the remote version the local file already includes.
+    If someone else uploaded in between, the PUT is rejected, the remote file
+    is passed to `merge(remote_bytes)` (which folds it into the local file)
+    and the upload is retried against the new SHA. Without `merge` the remote
+    file is overwritten, as before.
+
+    `read_local` overrides how the bytes to upload are produced (by default the
+    file at `local_path` is read), e.g. to upload an export generated on demand.
+    With a `blob_store` (see blobstore.py), screenshots added since the last
+    sync are pushed to `blob_remote_dir` before the workbook that links to them.
+
+    With `poll_interval` (and `merge`), the worker also watches the remote file
+    while idle: a conditional GET every `poll_interval` seconds, and when the
+    SHA is not one the local data already includes, the new version is pulled
+    and merged, so other testers' results show up without a restart. That SHA
+    is kept in `<local_path>.remote_sha`, so after a restart the first poll
+    (or upload) does not pull a remote file the local one already includes.
+    """
+
+    def __init__(self, client, local_path, remote_path, merge=None, read_local=None, blob_store=None,
+                 blob_remote_dir=None, base_backoff=1.0, max_backoff=60.0, poll_interval=None):
+        self.client = client
+        self.local_path = local_path
+        self.read_local = read_local
+        self.blob_store = blob_store
+        self.blob_remote_dir = blob_remote_dir
+        self.remote_path = remote_path
+        self.merge = merge
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self._base_sha = client.known_sha(remote_path) or self._stored_sha()
+        self.merges = 0
+        self.poll_interval = poll_interval if merge is not None else None
+        self._etag = None
+        self._last_poll = None
+        self._poll_error = None
+
+        self._cond = threading.Condition()
+        self._pending_version = None
+        self._pending_since = None
+        self._message = None
+        self._synced_version = None
+        self._last_sync = None
+        self._last_error = None
+        self._failures = 0
+        self._uploading = False
+        self._thread = threading.Thread(target=self._run, name="github-sync", daemon=True)
+        self._thread.start()
+
+    def notify(self, version, message="Automated update from Streamlit app"):
+        with self._cond:
+            if self._pending_version is None or version > self._pending_version:
+                self._pending_version = version
+                self._message = message
+                if self._pending_since is None:
+                    self._pending_since = time.time()
+            self._cond.notify()
+
+    def status(self):
+        with self._cond:
+            pending = self._pending_version is not None
+            if self._uploading:
+                state = "uploading"
+            elif pending and self._last_error:
+                state = "retrying"
+            elif pending:
+                state = "pending"
+            else:
+                state = "synced"
+            return {
+                "state": state,
+                "synced_version": self._synced_version,
+                "pending_version": self._pending_version,
+                "lag_seconds": time.time() - self._pending_since if self._pending_since else 0.0,
+                "last_sync": self._last_sync,
+                "last_error": self._last_error,
+                "last_poll": self._last_poll,
+                "poll_error": self._poll_error,
+            }
+
+    def wait_idle(self, timeout=None):
+        """Block until every notified version is uploaded (used by scripts and the CLI)"""
+        deadline = None if timeout is None else time.time() + timeout
+        with self._cond:
+            while self._pending_version is not None or self._uploading:
+                remaining = None if deadline is None else deadline - time.time()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+            return True
+
+    def _read_local(self):
+        if self.read_local is not None:
+            return self.read_local()
+        with open(self.local_path, "rb") as f:
+            return f.read()
+
+    def _stored_sha(self):
+        try:
+            with open(f"{self.local_path}.remote_sha", "r", encoding="utf-8") as f:
+                return f.read().strip() or None
+        except OSError:
+            return None
+
+    def _set_base_sha(self, sha):
+        """Remember the remote SHA the local data now includes (also on disk, for the next start)"""
+        self._base_sha = sha
+        sha_path = f"{self.local_path}.remote_sha"
+        try:
+            with open(f"{sha_path}.tmp", "w", encoding="utf-8") as f:
+                f.write(sha or "")
+            os.replace(f"{sha_path}.tmp", sha_path)
+        except OSError:
+            # Only costs one extra pull and merge after a restart
+            pass
+
+    def _pull_and_merge(self):
+        try:
+            sha, remote_content = self.client.get_file(self.remote_path)
+        except GitHubSyncError as e:
+            if e.status_code != 404:
+                raise
+            # Not on GitHub yet (e.g. a new shard): the next PUT creates it
+            self._set_base_sha(None)
+            return
+        self.merge(remote_content)
+        self.merges += 1
+        self._set_base_sha(sha)
+
+    def _upload(self, message):
+        if self.blob_store is not None:
+            self.blob_store.upload_pending(self.client, self.blob_remote_dir)
+        if self.merge is None:
+            content = self._read_local()
+            sha = self.client.known_sha(self.remote_path) or self.client.get_sha(self.remote_path)
+            try:
+                self.client.put_file(self.remote_path, content, sha, message)
+            except GitHubSyncError as e:
+                if e.status_code not in CONFLICT_STATUSES:
+                    raise
+                # Changed on GitHub since our last upload: overwrite it, as without a cached SHA
+                self.client.put_file(self.remote_path, content, self.client.get_sha(self.remote_path), message)
+            return
+        if self._base_sha is None:
+            self._pull_and_merge()
+        for _ in range(MAX_MERGE_ATTEMPTS):
+            try:
+                response = self.client.put_file(self.remote_path, self._read_local(), self._base_sha, message)
+            except GitHubSyncError as e:
+                if e.status_code not in CONFLICT_STATUSES:
+                    raise
+                self._pull_and_merge()
+                continue
+            self._set_base_sha(response["content"]["sha"])
+            return
+        raise GitHubSyncError(f"⚠️ GitHub update kept conflicting after {MAX_MERGE_ATTEMPTS} merges")
+
+    def _poll(self):
+        """Merge the remote file if it changed since the version the local data includes"""
+        try:
+            changed = self.client.poll(self.remote_path, self._etag)
+            if changed is not None:
+                self._etag, sha = changed
+                if sha != self._base_sha:
+                    with trace("remote_change", path=self.remote_path):
+                        self._pull_and_merge()
+            self._poll_error = None
+        except GitHubSyncError as e:
+            # 404: not uploaded yet (e.g. a new shard), nothing to merge
+            self._poll_error = None if e.status_code == 404 else str(e)
+        except Exception as e:
+            self._poll_error = str(e)
+        self._last_poll = time.time()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._pending_version is None:
+                    if not self._cond.wait(self.poll_interval) and self.poll_interval:
+                        break
+                if self._pending_version is None:
+                    version = None
+                else:
+                    version, message = self._pending_version, self._message
+                    self._uploading = True
+            if version is None:
+                self._poll()
+                continue
+            started = time.time()
+            try:
+                with trace("sync", version=version, path=self.remote_path):
+                    self._upload(message)
+            except Exception as e:
+                with self._cond:
+                    self._uploading = False
+                    self._failures += 1
+                    self._last_error = str(e)
+                    delay = min(self.max_backoff, self.base_backoff * 2 ** (self._failures - 1))
+                    self._cond.notify_all()
+                time.sleep(delay * random.uniform(0.5, 1.0))
+                continue
+            with self._cond:
+                self._uploading = False
+                self._failures = 0
+                self._last_error = None
+                self._synced_version = version
+                self._last_sync = time.time()
+                if self._pending_version == version:
+                    self._pending_version = None
+                    self._pending_since = None
+                else:
+                    self._pending_since = started
+                self._cond.notify_all()
+
+
+_workers = {}
+_workers_lock = threading.Lock()
+
+
+def get_sync_worker(token, repo, local_path, remote_path, branch="main", base_url=GITHUB_API_URL, merge=None,
+                    read_local=None, blob_store=None, blob_remote_dir=None, poll_interval=None):
+    """Process-wide SyncWorker for one (repo, file), shared by all sessions"""
+    key = (repo, branch, remote_path, local_path, base_url)
+    with _workers_lock:
+        worker = _workers.get(key)
+        if worker is None:
+            client = get_client(token, repo, branch=branch, base_url=base_url)
+            worker = _workers[key] = SyncWorker(client, local_path, remote_path, merge=merge, read_local=read_local,
+                                                blob_store=blob_store, blob_remote_dir=blob_remote_dir,
+                                                poll_interval=poll_interval)
+        return worker
@@ -0,0 +1,247 @@
+"""Append-only history of result events, with daily/weekly rollups for the Analytics page.
+
+Sheet1 only holds the latest result of each task; here every submission is
+kept as a fixed-size record (time, task, tester, result) in
+`<path>.history/events.bin`, with task IDs and tester names interned in
+`names.jsonl`. On load the records are read straight into a numpy array and
+rolled up once; later events update the rollups in place, so range queries
+never rescan the events.
+
+Rollups are per period (day, or week starting Monday) and tester: Pass/Fail/Hold
+counts and flips, i.e. results that changed a task from Pass to Fail or back
+(Holds in between are ignored).
+"""
+import json
+import os
+import threading
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+from journal import cut_torn_tail
+from utils import normalize_id
+
+RESULTS = ["Pass", "Fail", "Hold"]
+EVENT_DTYPE = np.dtype([("time", "<i8"), ("task", "<i4"), ("tester", "<i4"), ("result", "i1")])
+# Rollup columns: one count per result, then flips
+COUNT_COLUMNS = RESULTS + ["Flips"]
+FREQUENCIES = {"D": 1, "W": 7}
+
+_EPOCH = pd.Timestamp(0)
+_DAY = 86400
+# 1970-01-01 was a Thursday; weeks start on Monday
+_WEEK_OFFSET = 3
+
+
+def _seconds(values):
+    """Seconds since the epoch (naive local time) of timestamps; -1 where unparseable"""
+    times = pd.to_datetime(pd.Series(values, dtype=object), errors="coerce")
+    return ((times - _EPOCH) // pd.Timedelta(seconds=1)).fillna(-1).astype("int64").to_numpy()
+
+
+def _period(day, freq):
+    return day if freq == "D" else (day + _WEEK_OFFSET) // 7
+
+
+def _period_start(period, freq):
+    day = period if freq == "D" else period * 7 - _WEEK_OFFSET
+    return date(1970, 1, 1) + timedelta(days=int(day))
+
+
+class ResultHistory:
+    def __init__(self, history_dir):
+        self.dir = history_dir
+        self.events_path = os.path.join(history_dir, "events.bin")
+        self.names_path = os.path.join(history_dir, "names.jsonl")
+        self._lock = threading.Lock()
+        self._synced_version = None
+        os.makedirs(history_dir, exist_ok=True)
+        self._load()
+
+    def _load(self):
+        self._names = []
+        # A torn last line from a crash mid-append is cut off, so the next name gets a line (and code) of its own
+        cut_torn_tail(self.names_path)
+        if os.path.exists(self.names_path):
+            with open(self.names_path, "r", encoding="utf-8") as f:
+                self._names = [json.loads(line) for line in f]
+        self._codes = {name: code for code, name in enumerate(self._names)}
+        events = np.zeros(0, EVENT_DTYPE)
+        if os.path.exists(self.events_path):
+            raw = np.fromfile(self.events_path, dtype=np.uint8)
+            # A torn last record is dropped, as are records naming strings that never reached names.jsonl
+            events = raw[:len(raw) - len(raw) % EVENT_DTYPE.itemsize].view(EVENT_DTYPE)
+            events = events[(events["task"] < len(self._names)) & (events["tester"] < len(self._names))]
+            if len(events) * EVENT_DTYPE.itemsize != len(raw):
+                # ...on disk too: appends must stay record-aligned, and those codes will name other strings
+                tmp_path = f"{self.events_path}.tmp"
+                events.tofile(tmp_path)
+                os.replace(tmp_path, self.events_path)
+        self.count = len(events)
+        self._rollups = {freq: {} for freq in FREQUENCIES}
+        self._flips = {}
+        self._latest = {}
+        self._verdicts = {}
+        self._frames = {}
+        if not self.count:
+            return
+
+        frame = pd.DataFrame(events)
+        frame["day"] = frame["time"] // _DAY
+        verdicts = frame[frame["result"] < 2]
+        previous = verdicts.groupby("task")["result"].shift()
+        frame["flip"] = False
+        frame.loc[verdicts.index, "flip"] = previous.notna() & (previous != verdicts["result"])
+        for freq in FREQUENCIES:
+            grouped = frame.assign(period=_period(frame["day"], freq)).groupby(["period", "tester"])
+            counts = grouped["result"].value_counts().unstack(fill_value=0).reindex(columns=range(len(RESULTS)),
+                                                                                   fill_value=0)
+            counts[len(RESULTS)] = grouped["flip"].sum()
+            self._rollups[freq] = {key: row for key, row in zip(counts.index, counts.to_numpy("int64"))}
+        for task, day in frame.loc[frame["flip"], ["task", "day"]].itertuples(index=False):
+            self._flips.setdefault(task, []).append(day)
+        last = frame.groupby("task").tail(1)
+        self._latest = dict(zip(last["task"], zip(last["result"], last["time"])))
+        last_verdicts = verdicts.groupby("task").tail(1)
+        self._verdicts = dict(zip(last_verdicts["task"], last_verdicts["result"]))
+
+    def _code(self, name, new_names):
+        code = self._codes.get(name)
+        if code is None:
+            code = self._codes[name] = len(self._names)
+            self._names.append(name)
+            new_names.append(name)
+        return code
+
+    def _add(self, event):
+        time, task, tester, result = (int(value) for value in event)
+        day = time // _DAY
+        flip = 0
+        if result < 2:
+            previous = self._verdicts.get(task)
+            flip = int(previous is not None and previous != result)
+            self._verdicts[task] = result
+            if flip:
+                self._flips.setdefault(task, []).append(day)
+        self._latest[task] = (result, time)
+        for freq, rollup in self._rollups.items():
+            counts = rollup.setdefault((_period(day, freq), tester), np.zeros(len(COUNT_COLUMNS), "int64"))
+            counts[result] += 1
+            counts[-1] += flip
+
+    def _append(self, events, times):
+        """Write and roll up events whose time parsed; call with the lock held"""
+        new_names = []
+        records = np.array([(time, self._code(normalize_id(task_id), new_names),
+                             self._code("" if pd.isna(tester) else str(tester), new_names), RESULTS.index(result))
+                            for (task_id, tester, result), time in zip(events, times) if time >= 0],
+                           dtype=EVENT_DTYPE)
+        if not len(records):
+            return 0
+        # Names first, so a record never refers to a string that is not on disk
+        if new_names:
+            with open(self.names_path, "a", encoding="utf-8") as f:
+                f.writelines(json.dumps(name) + "\n" for name in new_names)
+        with open(self.events_path, "ab") as f:
+            f.write(records.tobytes())
+        for event in records:
+            self._add(event)
+        self.count += len(records)
+        self._frames = {}
+        return len(records)
+
+    def record(self, events):
+        """Append events: (task_id, tester_name, test_result, timestamp) tuples. Results other
+        than Pass/Fail/Hold and unparseable timestamps are skipped. Returns how many were kept"""
+        events = [event for event in events if event[2] in RESULTS]
+        times = _seconds([event[3] for event in events])
+        with self._lock:
+            return self._append([event[:3] for event in events], times)
+
+    def reconcile(self, df):
+        """Record the current result of every Sheet1 row whose latest event differs from it
+        (remote merges, other tools, or anything recorded before the history existed)"""
+        recorded = df[df["Test Result"].isin(RESULTS)]
+        times = _seconds(recorded["Timestamp"].tolist())
+        with self._lock:
+            missing = []
+            for task_id, tester, result, time in zip(recorded["Task ID"], recorded["Tester Name"],
+                                                     recorded["Test Result"], times):
+                code = self._codes.get(normalize_id(task_id))
+                latest = self._latest.get(code)
+                # A row older than the latest event comes from a stale frame: it is already history
+                if latest is None or (latest != (RESULTS.index(result), time) and time >= latest[1]):
+                    missing.append(((task_id, tester, result), time))
+            return self._append(*zip(*missing)) if missing else 0
+
+    def synced(self, version, load):
+        """The history, reconciled with the data once per data `version` (`load()` returns the frame)"""
+        if version != self._synced_version:
+            self.reconcile(load())
+            self._synced_version = version
+        return self
+
+    def _frame(self, freq):
+        with self._lock:
+            frame = self._frames.get(freq)
+            if frame is None:
+                rollup = self._rollups[freq]
+                frame = pd.DataFrame(list(rollup.values()) or np.zeros((0, len(COUNT_COLUMNS)), "int64"),
+                                     columns=COUNT_COLUMNS)
+                frame.insert(0, "Period", [_period_start(period, freq) for period, _ in rollup])
+                frame.insert(1, "Tester Name", [self._names[tester] for _, tester in rollup])
+                frame = self._frames[freq] = frame.sort_values(["Period", "Tester Name"], ignore_index=True)
+            return frame
+
+    def _between(self, freq, start, end, tester):
+        frame = self._frame(freq)
+        if start is not None:
+            frame = frame[frame["Period"] >= _period_start(_period((start - date(1970, 1, 1)).days, freq), freq)]
+        if end is not None:
+            frame = frame[frame["Period"] <= end]
+        if tester is not None:
+            frame = frame[frame["Tester Name"] == tester]
+        return frame
+
+    @staticmethod
+    def _totals(frame, by):
+        totals = frame.groupby(by)[COUNT_COLUMNS].sum()
+        totals.insert(len(RESULTS), "Results", totals[RESULTS].sum(axis=1))
+        verdicts = totals["Pass"] + totals["Fail"]
+        totals["Pass Rate"] = (totals["Pass"] / verdicts.where(verdicts > 0)).round(3)
+        return totals
+
+    def span(self):
+        """(first, last) day with events, or None"""
+        frame = self._frame("D")
+        return (frame["Period"].min(), frame["Period"].max()) if len(frame) else None
+
+    def rollup(self, freq="D", start=None, end=None, tester=None):
+        """Counts, Results, Pass Rate (Pass / (Pass + Fail)) and Flips per period overlapping [start, end]"""
+        return self._totals(self._between(freq, start, end, tester), "Period")
+
+    def tester_rollup(self, freq="D", start=None, end=None):
+        """The same totals per tester over the periods overlapping [start, end]"""
+        return self._totals(self._between(freq, start, end, None), "Tester Name")
+
+    def flaky_tasks(self, start=None, end=None):
+        """Task IDs with their number of Pass/Fail flips in [start, end], most first"""
+        first = -np.inf if start is None else (start - date(1970, 1, 1)).days
+        last = np.inf if end is None else (end - date(1970, 1, 1)).days
+        with self._lock:
+            flips = {self._names[task]: sum(first <= day <= last for day in days) for task, days in self._flips.items()}
+        flaky = pd.Series(flips, dtype="int64").rename("Flips").rename_axis("Task ID")
+        return flaky[flaky > 0].sort_index().sort_values(ascending=False, kind="stable")
+
+
+_histories = {}
+_histories_lock = threading.Lock()
+
+
+def get_history(path):
+    """Process-wide result history of the data file at `path` (kept in `<path>.history/`)"""
+    with _histories_lock:
+        if path not in _histories:
+            _histories[path] = ResultHistory(f"{path}.history")
+        return _histories[path]
@@ -0,0 +1,232 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+# Compact after this many journaled submissions, or this many seconds after the first one
+COMPACT_BATCH = 20
+COMPACT_INTERVAL = 30.0
+
+
+def cut_torn_tail(path):
+    """Cut a JSON-lines file back to its last newline, dropping a line torn by a crash mid-append,
+    so the next append starts on a line of its own. Returns how many bytes were dropped"""
+    try:
+        f = open(path, "rb+")
+    except FileNotFoundError:
+        return 0
+    with f:
+        size = end = f.seek(0, os.SEEK_END)
+        while end > 0:
+            start = max(0, end - 4096)
+            f.seek(start)
+            newline = f.read(end - start).rfind(b"\n")
+            if newline >= 0:
+                end = start + newline + 1
+                break
+            end = start
+        if end < size:
+            f.truncate(end)
+            f.flush()
+            os.fsync(f.fileno())
+    return size - end
+
+
+class SubmissionJournal:
+    """Durable append-only log of submissions for one workbook.
+
+    Entries are JSON lines in `<dir>/journal.jsonl`; screenshots are stored once
+    per content hash in `<dir>/blobs/`. Each entry is fsynced before
+    `append()` returns, so a submission survives a crash before the workbook
+    itself is saved. Entries that cannot be applied are quarantined in
+    `<dir>/rejected.jsonl` (see reject()).
+    """
+
+    def __init__(self, journal_dir):
+        self.dir = journal_dir
+        self.blob_dir = os.path.join(journal_dir, "blobs")
+        self.log_path = os.path.join(journal_dir, "journal.jsonl")
+        self.rejected_path = os.path.join(journal_dir, "rejected.jsonl")
+        self._lock = threading.Lock()
+        os.makedirs(self.blob_dir, exist_ok=True)
+        cut_torn_tail(self.log_path)
+        cut_torn_tail(self.rejected_path)
+        self.last_seq = max((entry["seq"] for entry in self._read()), default=0)
+        self._rejected = {entry["seq"] for entry in self._read(self.rejected_path)}
+
+    def _read(self, path=None):
+        path = path or self.log_path
+        if not os.path.exists(path):
+            return
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    # A torn last line from a crash mid-append (cut on open): everything before it is intact
+                    break
+
+    def _write_blob(self, data):
+        digest = hashlib.sha256(data).hexdigest()
+        blob_path = os.path.join(self.blob_dir, digest)
+        if not os.path.exists(blob_path):
+            tmp_path = f"{blob_path}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, blob_path)
+        return digest
+
+    def blob(self, digest):
+        with open(os.path.join(self.blob_dir, digest), "rb") as f:
+            return f.read()
+
+    def append(self, task_id, tester_name, test_result, comment, screenshots, timestamp):
+        """Durably record a submission; `screenshots` are raw image bytes. Returns its sequence number"""
+        return self.append_many([{
+            "task_id": task_id,
+            "tester_name": tester_name,
+            "test_result": test_result,
+            "comment": comment,
+            "screenshots": screenshots,
+            "timestamp": timestamp,
+        }])[-1]
+
+    def append_many(self, submissions):
+        """Durably record several submissions (dicts of append() arguments) with one fsync.
+        Returns their sequence numbers"""
+        with self._lock:
+            # Blobs are written under the lock too, so truncate() never sees one without its entry
+            digests = [[self._write_blob(data) for data in submission["screenshots"]] for submission in submissions]
+            entries = []
+            for submission, screenshots in zip(submissions, digests):
+                self.last_seq += 1
+                entries.append({
+                    "seq": self.last_seq,
+                    "task_id": submission["task_id"],
+                    "tester_name": submission["tester_name"],
+                    "test_result": submission["test_result"],
+                    "comment": submission["comment"],
+                    "screenshots": screenshots,
+                    "timestamp": submission["timestamp"],
+                })
+            with open(self.log_path, "a", encoding="utf-8") as f:
+                f.writelines(json.dumps(entry) + "\n" for entry in entries)
+                f.flush()
+                os.fsync(f.fileno())
+            return [entry["seq"] for entry in entries]
+
+    def entries_after(self, seq):
+        with self._lock:
+            return [entry for entry in self._read()
+                    if entry["seq"] > seq and not entry.get("compacted") and entry["seq"] not in self._rejected]
+
+    def reject(self, entry, error):
+        """Quarantine an entry that cannot be applied (e.g. an image that does not decode): it is
+        copied to rejected.jsonl with the error, its blobs are kept, and entries_after() skips it"""
+        with self._lock:
+            with open(self.rejected_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(dict(entry, error=str(error))) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            self._rejected.add(entry["seq"])
+
+    def truncate(self, seq):
+        """Drop entries up to `seq` (already compacted into the workbook) and unreferenced blobs"""
+        with self._lock:
+            remaining = [entry for entry in self._read() if entry["seq"] > seq and not entry.get("compacted")]
+            tmp_path = f"{self.log_path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                # Marker keeps sequence numbers increasing after the log is emptied
+                f.write(json.dumps({"seq": max(seq, self.last_seq), "compacted": True}) + "\n")
+                for entry in remaining:
+                    f.write(json.dumps(entry) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.log_path)
+            referenced = {digest for entry in remaining for digest in entry["screenshots"]}
+            referenced.update(digest for entry in self._read(self.rejected_path) for digest in entry["screenshots"])
+            for name in os.listdir(self.blob_dir):
+                if name not in referenced and not name.endswith(".tmp"):
+                    os.remove(os.path.join(self.blob_dir, name))
+
+
+class Compactor:
+    """Background thread that calls `compact()` in batches: after COMPACT_BATCH
+    journaled submissions, COMPACT_INTERVAL seconds after the oldest pending
+    one, or immediately on `compact_now()`."""
+
+    def __init__(self, compact, batch=COMPACT_BATCH, interval=COMPACT_INTERVAL):
+        self.compact = compact
+        self.batch = batch
+        self.interval = interval
+        self.last_error = None
+        self._cond = threading.Condition()
+        self._pending = 0
+        self._oldest = None
+        self._requested = 0
+        # Requests answered by a finished compaction (successful or not) / by a successful one
+        self._attempted = 0
+        self._completed = 0
+        self._error = None
+        self._thread = threading.Thread(target=self._run, name="journal-compactor", daemon=True)
+        self._thread.start()
+
+    def appended(self, count=1):
+        with self._cond:
+            self._pending += count
+            if self._oldest is None:
+                self._oldest = time.time()
+            self._cond.notify()
+
+    def compact_now(self, timeout=None):
+        """Request a compaction and wait for it: True once it succeeded, False on timeout.
+        A failed compaction raises its error (the entries stay journaled and are retried later)"""
+        with self._cond:
+            self._requested += 1
+            target = self._requested
+            self._cond.notify_all()
+            if not self._cond.wait_for(lambda: self._attempted >= target, timeout):
+                return False
+            if self._completed < target:
+                raise self._error
+            return True
+
+    def _due(self):
+        if self._requested > self._attempted:
+            return True
+        if not self._pending:
+            return False
+        return self._pending >= self.batch or time.time() - self._oldest >= self.interval
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._due():
+                    timeout = None if self._oldest is None else max(0.0, self._oldest + self.interval - time.time())
+                    self._cond.wait(timeout)
+                generation = self._requested
+                self._pending = 0
+                self._oldest = None
+            try:
+                self.compact()
+            except Exception as e:
+                with self._cond:
+                    self.last_error = str(e)
+                    self._error = e
+                    self._attempted = generation
+                    # Entries stay in the journal; try again after the next interval
+                    self._pending = max(self._pending, 1)
+                    self._oldest = self._oldest or time.time()
+                    self._cond.notify_all()
+                continue
+            with self._cond:
+                self.last_error = None
+                self._error = None
+                self._attempted = self._completed = generation
+                self._cond.notify_all()
@@ -1,20 +1,17 @@
 import streamlit as st
 import pandas as pd
-from utils import load_excel_data, save_screenshots_to_excel
-from PIL import Image
-import io
-import os
-import matplotlib.pyplot as plt
-import seaborn as sns
+from utils import normalize_id, set_save_listener
+from task_index import TaskIndex
+from sheet_view import PAGE_SIZES, SheetView, page_count
+from screenshots import PREVIEW_COLUMNS, duplicate_uploads, preview_uploads
+from github_sync import get_sync_worker
+from storage import get_storage
+from exports import ExportFilter, FULL_EXPORT, file_name, get_export, mime_type
+from shards import get_registry, get_shard_index
+import blobstore
+import perf
 import time
-
-# Replace the GitHub import with this try-except block
-try:
-    from github import Github  # For GitHub integration
-    GITHUB_ENABLED = True
-except ImportError:
-    GITHUB_ENABLED = False
-    st.warning("PyGithub not installed - GitHub updates disabled", icon="⚠️")
+import functools
 
 # Page setup with custom theme (MUST BE FIRST STREAMLIT COMMAND)
 st.set_page_config(page_title="Testing Tool", layout="wide")
@@ -32,38 +29,104 @@ st.markdown("""
 
 # NEW: GitHub configuration
 GITHUB_REPO = "Ai-TestingApp/Ai-Testing-Tool"
-GITHUB_FILE = "main_excel.xlsx"
-
-# Load Excel data
-MAIN_EXCEL_PATH = "main_excel.xlsx"
-df_main, wb = load_excel_data(MAIN_EXCEL_PATH)
-
-# Clean and normalize Task IDs
-df_main["Task ID"] = df_main["Task ID"].astype(str).str.strip()
+# One workbook per test cycle (shards.json); without it the single main_excel.xlsx as before.
+# Only the active shard is loaded here.
+registry = get_registry()
+active_shard = registry.active
+GITHUB_FILE = active_shard.remote
+MAIN_EXCEL_PATH = active_shard.path
+# Seconds between conditional checks of the GitHub file for other testers' results
+REMOTE_POLL_INTERVAL = 15
+# Seconds between checks of open pages for newer data (their task locks, tables and charts rerender)
+DATA_CHECK_INTERVAL = 5
+
+def get_github_token():
+    try:
+        return st.secrets["GITHUB_TOKEN"]
+    except Exception:
+        return None
+
+# Results live in the Excel file itself or in SQLite (storage.STORAGE_BACKEND);
+# with SQLite the workbook is generated on demand for download and GitHub.
+storage = get_storage(MAIN_EXCEL_PATH, db_path=active_shard.db_path)
+
+# Background uploader shared by all sessions (None when no token is configured).
+# Concurrent uploads from other testers are merged per task instead of overwritten.
+GITHUB_TOKEN = get_github_token()
+sync_worker = get_sync_worker(GITHUB_TOKEN, GITHUB_REPO, MAIN_EXCEL_PATH, GITHUB_FILE,
+                              merge=storage.merge_remote,
+                              read_local=(lambda: get_export(storage)) if storage.name == "sqlite" else None,
+                              # Screenshots kept outside the workbook are pushed next to it
+                              blob_store=(blobstore.get_blob_store(MAIN_EXCEL_PATH)
+                                          if blobstore.SCREENSHOT_STORAGE != "embed" else None),
+                              blob_remote_dir=blobstore.remote_blob_dir(GITHUB_FILE),
+                              # Remote changes are merged in while idle
+                              poll_interval=REMOTE_POLL_INTERVAL
+                              ) if GITHUB_TOKEN else None
+if sync_worker and storage.name == "excel":
+    # Every compaction of the journal into the Excel file queues an upload
+    set_save_listener(MAIN_EXCEL_PATH, sync_worker.notify)
+
+# Phase timings for this rerun (no-op unless TESTING_TOOL_PERF=1)
+perf.begin("rerun")
+
+# Load task data (cached, re-read only when the data changes; SQLite pages query what they show)
+try:
+    storage.version()
+except Exception as e:
+    st.error(f"Error loading Excel: {str(e)}")
+    raise
 
 # Sidebar navigation
 st.sidebar.title("🛍️ Navigation")
 page = st.sidebar.radio("Go to", ["Testing App", "Excel Sheet", "Analytics"])
-
-# Improved ID normalization function
-def normalize_id(task_id):
-    """Convert all task IDs to consistent string format"""
-    try:
-        # Handle string inputs
-        if isinstance(task_id, str):
-            if '.' in task_id:
-                return task_id  # Keep decimal IDs as-is (2.0, 2.1 etc.)
-            return str(int(float(task_id)))  # Convert "2" to "2"
-        
-        # Handle numeric inputs
-        if float(task_id).is_integer():
-            return str(int(task_id))  # Convert 2.0 to "2"
-        return str(task_id)  # Keep 2.1 as "2.1"
-    except:
-        return str(task_id)  # Fallback for any format
+perf.annotate(page=page)
+if len(registry.shards) > 1:
+    st.sidebar.caption(f"🗂️ Test cycle: {active_shard.name}")
+
+# GitHub sync status
+if sync_worker:
+    sync_status = sync_worker.status()
+    if sync_status["state"] == "synced":
+        st.sidebar.caption("☁️ GitHub: up to date")
+    else:
+        st.sidebar.caption(f"☁️ GitHub: {sync_status['state']} (lag {sync_status['lag_seconds']:.0f}s)")
+    if sync_status["last_error"]:
+        st.sidebar.caption(f"⚠️ Last sync error: {sync_status['last_error']}")
+    if sync_status["poll_error"]:
+        st.sidebar.caption(f"⚠️ Could not check GitHub for changes: {sync_status['poll_error']}")
+
+# Downloads: the full workbook or a subset; each is built only when clicked and cached per data version
+with st.sidebar.expander("📥 Export"):
+    export_tester = st.selectbox("Tester", ["All"] + storage.testers(), key="export_tester")
+    first_task = st.text_input("From Task ID", key="export_first").strip()
+    last_task = st.text_input("To Task ID", key="export_last").strip()
+    results_only = st.checkbox("Only tasks with a result", key="export_results_only")
+    export_format = st.radio("Format", ["Excel", "CSV"], horizontal=True, key="export_format")
+    export_filter = ExportFilter(
+        tester=None if export_tester == "All" else export_tester,
+        first_task=normalize_id(first_task) if first_task else None,
+        last_task=normalize_id(last_task) if last_task else None,
+        results_only=results_only,
+        fmt="csv" if export_format == "CSV" else "xlsx",
+    )
+    unknown = [task_id for task_id in (export_filter.first_task, export_filter.last_task)
+               if task_id is not None and not storage.has_task(task_id)]
+    if unknown:
+        st.warning(f"Task ID not found: {', '.join(unknown)}")
+    else:
+        st.download_button(
+            label="📥 Download",
+            data=functools.partial(get_export, storage, export_filter),
+            file_name=file_name(export_filter),
+            mime=mime_type(export_filter),
+            key="export_download"
+        )
 
 # Graph plotting function (unchanged)
 def plot_test_result_summary(df):
+    from matplotlib.figure import Figure
+
     result_counts = df['Test Result'].dropna().value_counts()
     result_counts = result_counts.reindex(['Pass', 'Fail', 'Hold']).fillna(0)
 
@@ -71,7 +134,8 @@ def plot_test_result_summary(df):
         st.warning("No test results available to display.")
         return
 
-    fig, ax = plt.subplots()
+    fig = Figure()
+    ax = fig.subplots()
     colors = ['#28a745', '#dc3545', '#ffc107']
     ax.pie(result_counts, labels=result_counts.index, autopct='%1.1f%%', startangle=90, colors=colors)
     ax.axis('equal')
@@ -82,51 +146,28 @@ if page == "Testing App":
     st.title("🔪 Testing Documentation Tool")
 
     # Tester Selection
-    tester_names = sorted(df_main["Tester Name"].dropna().unique())
-    tester_name = st.selectbox("👤 Select Tester Name", tester_names)
+    tester_name = st.selectbox("👤 Select Tester Name", storage.testers())
+    # Covers at least this tester's tasks (SQLite reads only those, through the tester index)
+    task_index = storage.get_view("task_index", TaskIndex, tester=tester_name)
+
+    # Precomputed per-tester task order and completed/available/locked state
+    sorted_task_ids = task_index.tasks_for(tester_name)
+    available_task_ids = task_index.available(tester_name)
 
-    # Filter and prepare tasks
-    tester_tasks = df_main[df_main["Tester Name"] == tester_name].copy()
-    tester_tasks["Normalized_ID"] = tester_tasks["Task ID"].apply(normalize_id)
-    
     # Debug output (can remove later)
-    st.sidebar.write("Debug - Task IDs:", tester_tasks["Task ID"].unique())
-    st.sidebar.write("Normalized IDs:", tester_tasks["Normalized_ID"].unique())
-
-    # Determine completed tasks
-    completed_ids = df_main[df_main["Test Result"].notna()]["Task ID"].apply(normalize_id).tolist()
-
-    # Prepare task availability
-    available_task_ids = []
-    disabled_task_ids = []
-    sorted_task_ids = tester_tasks.sort_values("Task ID")["Task ID"].unique()
-
-    for i, tid in enumerate(sorted_task_ids):
-        norm_tid = normalize_id(tid)
-        if norm_tid in completed_ids:
-            disabled_task_ids.append(tid)
-        elif i == 0 or normalize_id(sorted_task_ids[i-1]) in completed_ids:
-            available_task_ids.append(tid)
-
-    # Display task options
-    task_display_options = [
-        f"{tid} ✅ (Completed)" if tid in disabled_task_ids else
-        f"{tid} 🔒 (Locked)" if tid not in available_task_ids else
-        tid
-        for tid in sorted_task_ids
-    ]
+    st.sidebar.write("Debug - Task IDs:", sorted_task_ids)
+    st.sidebar.write("Normalized IDs:", [normalize_id(tid) for tid in sorted_task_ids])
 
     if available_task_ids:
         task_id = st.selectbox("🆔 Select Task ID", 
                              options=available_task_ids,
-                             format_func=lambda x: task_display_options[sorted_task_ids.tolist().index(x)])
+                             format_func=lambda x: task_index.label(tester_name, x))
         
         # Find matching task
         search_id = normalize_id(task_id)
-        selected_row = tester_tasks[tester_tasks["Normalized_ID"] == search_id]
+        selected_row = task_index.row(task_id)
 
-        if not selected_row.empty:
-            selected_row = selected_row.iloc[0]
+        if selected_row is not None:
             with st.expander("📋 Task Details", expanded=True):
                 st.text_input("📝 Task Heading", selected_row.get("Task Name", ""), disabled=True)
                 st.text_input("🛍️ Navigation", selected_row.get("Navigation", ""), disabled=True)
@@ -145,53 +186,44 @@ if page == "Testing App":
                 )
 
                 if screenshots:
-                    cols = st.columns(min(3, len(screenshots)))
-                    for i, img_file in enumerate(screenshots):
-                        with cols[i % 3]:
-                            st.image(Image.open(img_file), caption=img_file.name, use_column_width=True)
+                    # Thumbnails are made once per uploaded file; full decoding waits for Submit
+                    cols = st.columns(PREVIEW_COLUMNS)
+                    for i, (upload, preview) in enumerate(zip(screenshots, preview_uploads(screenshots))):
+                        with cols[i % PREVIEW_COLUMNS]:
+                            st.image(preview, caption=upload.name)
+                    duplicates = duplicate_uploads(screenshots) if len(screenshots) > 1 else []
+                    if duplicates:
+                        st.info(f"ℹ️ {len(duplicates)} identical screenshot(s) will be saved only once: "
+                                + ", ".join(upload.name for upload in duplicates))
 
                 if st.button("✅ Submit Task"):
-                    output = io.BytesIO()
                     screenshots = screenshots if screenshots else []
 
-                    # Save results to in-memory Excel file
-                    save_screenshots_to_excel(
-                        excel_path=output,
-                        df_main=df_main,
-                        wb=wb,
-                        task_id=task_id,
-                        tester_name=tester_name,
-                        test_result=test_result,
-                        comment=comment,
-                        screenshots=screenshots
-                    )
-
-                    # Get raw bytes of the Excel file
-                    excel_bytes = output.getvalue()
-
-                    # Push to GitHub (before UI feedback)
-                    if GITHUB_ENABLED and 'GITHUB_TOKEN' in st.secrets:
-                        try:
-                            st.write("🔄 Pushing to GitHub...")
-                            g = Github(st.secrets.GITHUB_TOKEN)
-                            repo = g.get_repo(GITHUB_REPO)
-                            contents = repo.get_contents(GITHUB_FILE)
-                            repo.update_file(
-                                path=GITHUB_FILE,
-                                message=f"Update by {tester_name} on Task {task_id}",
-                                content=excel_bytes,
-                                sha=contents.sha
-                            )
-                            st.success("✅ Updated GitHub successfully!")
-                        except Exception as e:
-                            st.warning(f"⚠️ GitHub update failed: {str(e)}")
-
-                    # Offer file for download
+                    with perf.trace("submission", tester=tester_name, task=str(task_id),
+                                    screenshots=len(screenshots)):
+                        # Queued for the storage's single writer, which groups concurrent submissions:
+                        # Excel: journaled and compacted into the file in batches; SQLite: one transaction
+                        version = storage.submit(
+                            task_id=task_id,
+                            tester_name=tester_name,
+                            test_result=test_result,
+                            comment=comment,
+                            screenshots=screenshots
+                        )
+
+                    # The writer thread's acknowledgment: the data version that contains this submission
+                    st.success(f"✅ Saved (data version {version})")
+                    if sync_worker:
+                        if storage.name == "sqlite":
+                            sync_worker.notify(version)
+                        st.info("🔄 Queued for GitHub sync")
+
+                    # Offer file for download (built on click, once per data version for all sessions)
                     st.download_button(
                         label="📥 Download Updated Excel",
-                        data=excel_bytes,
-                        file_name="updated_results.xlsx",
-                        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+                        data=functools.partial(get_export, storage, FULL_EXPORT),
+                        file_name=file_name(FULL_EXPORT),
+                        mime=mime_type(FULL_EXPORT)
                     )
 
                     st.balloons()
@@ -212,18 +244,48 @@ elif page == "Excel Sheet":
     st.title("📄 Excel Sheet Viewer")
 
     # Add a tester name filter
-    tester_filter = st.sidebar.selectbox("👤 Filter by Tester", ["All"] + sorted(df_main["Tester Name"].dropna().unique().tolist()))
+    tester_filter = st.sidebar.selectbox("👤 Filter by Tester", ["All"] + storage.testers())
+
+    # Filters run on the server against a per-version row index; only one page of rows is sent
+    sheet_view = storage.get_view("sheet_view", SheetView, tester=None if tester_filter == "All" else tester_filter)
+    result_filter = st.sidebar.selectbox("✅ Filter by Result", ["All"] + sheet_view.results)
+
+    filter_col, sort_col, order_col = st.columns([2, 1, 1])
+    with filter_col:
+        search = st.text_input("🔍 Search", "")
+    with sort_col:
+        sort_by = st.selectbox("↕️ Sort by", ["Sheet order"] + sheet_view.columns)
+    with order_col:
+        ascending = st.radio("Order", ["Ascending", "Descending"], horizontal=True) == "Ascending"
+    columns = st.multiselect("🧾 Columns", sheet_view.columns, default=sheet_view.columns)
+
+    positions = sheet_view.query(
+        tester=None if tester_filter == "All" else tester_filter,
+        result=None if result_filter == "All" else result_filter,
+        search=search,
+        sort_by=None if sort_by == "Sheet order" else sort_by,
+        ascending=ascending,
+    )
 
     if tester_filter != "All":
-        filtered_df = df_main[df_main["Tester Name"] == tester_filter]
         st.write(f"Showing tasks assigned to **{tester_filter}**:")
     else:
-        filtered_df = df_main
         st.write("Showing all tasks:")
 
+    size_col, page_col = st.columns(2)
+    with size_col:
+        page_size = st.selectbox("Rows per page", PAGE_SIZES, index=1)
+    with page_col:
+        n_pages = page_count(len(positions), page_size)
+        page_number = st.number_input(f"Page (of {n_pages})", min_value=1, max_value=n_pages, value=1, step=1)
+
+    first_row = (page_number - 1) * page_size
+    st.caption(f"Rows {min(first_row + 1, len(positions))}–{min(first_row + page_size, len(positions))} "
+               f"of {len(positions)}")
+
     with st.container():
         st.markdown("<div class='scrollable-table'>", unsafe_allow_html=True)
-        st.dataframe(filtered_df, use_container_width=True)
+        st.dataframe(sheet_view.page(positions, page_number, page_size, columns), use_container_width=True)
         st.markdown("</div>", unsafe_allow_html=True)
     
 
@@ -231,95 +293,100 @@ elif page == "Excel Sheet":
 elif page == "Analytics":
     st.title("📊 Analytics Dashboard")
 
-    # Filter rows with either Test Result or Timestamp
-    df_filtered = df_main[(df_main["Test Result"].notna()) | (df_main["Timestamp"].notna())].copy()
+    # Plotting libraries are only loaded once someone opens this page
+    from analytics import AnalyticsAggregates, draw_result_pie, draw_tester_bar, draw_trend, render_figure
+
+    # Counts per result/day/tester, computed once per data version; filters only slice them.
+    # Charts are rendered to PNG once per (version, filters) and shared by all sessions.
+    data_version = storage.version()
+    scope = "Active cycle"
+    if len(registry.shards) > 1:
+        scope = st.radio("🗂️ Scope", ["Active cycle", "All cycles"], horizontal=True)
+    if scope == "All cycles":
+        # Other shards come from the cross-shard index (their Sheet1 result columns only), the
+        # active one from the live data; the combined counts are cached per set of shard versions
+        shard_names = [shard.name for shard in registry.shards]
+        selected = st.multiselect("Test cycles", shard_names, default=shard_names)
+        shard_index = get_shard_index()
+        data_version, combined = shard_index.combined(
+            [shard for shard in registry.shards if shard.name in selected],
+            live=(active_shard.name, data_version, storage.load()))
+        aggregates = shard_index.get_derived(data_version, "analytics", AnalyticsAggregates, combined)
+    else:
+        # Built from the rows with a result (SQLite reads only those)
+        aggregates = storage.get_view("analytics", functools.partial(AnalyticsAggregates,
+                                                                     total_tasks=storage.task_count()),
+                                      results_only=True)
 
     # Create layout
     col1, col2 = st.columns(2)
 
     # -- Graph 1: Test Result Summary Pie (LEFT) --
     with col1:
-        result_counts = df_filtered['Test Result'].dropna().value_counts()
-        result_counts = result_counts.reindex(['Pass', 'Fail', 'Hold']).fillna(0)
+        result_counts = aggregates.result_counts
 
         if result_counts.sum() > 0:
-            fig, ax = plt.subplots()
-            colors = ['#28a745', '#dc3545', '#ffc107']
-            ax.pie(result_counts, labels=result_counts.index, autopct='%1.1f%%', startangle=90, colors=colors)
-            ax.axis('equal')
             st.markdown("### 📊 Test Result Summary")
-            st.pyplot(fig)
+            st.image(render_figure((data_version, "result_pie"), draw_result_pie(result_counts)))
         else:
             st.warning("No test results available to display.")
 
-    # -- Graph 2: Task Completion Over Time (RIGHT) --
-        # -- Graph 2: Task Completion Over Time (RIGHT) --
+    # -- Graph 2: Results Over Time (RIGHT) --
+    # From the active cycle's result history: every submission, not just each task's latest
+    # result, pre-aggregated per day and week, so a range query only reads the rollups
+    history = storage.history()
+    history_span = history.span()
+    history_version = (storage.version(), history.count)
     with col2:
-        if "Timestamp" in df_filtered.columns:
-            df_filtered["Date"] = pd.to_datetime(df_filtered["Timestamp"], errors='coerce').dt.date
-            df_filtered = df_filtered.dropna(subset=["Date"])
-
-            if not df_filtered.empty:
-                # Add date range filter
-                min_date = df_filtered["Date"].min()
-                max_date = df_filtered["Date"].max()
-                start_date, end_date = st.date_input(
-                    "📅 Select Date Range",
-                    value=(min_date, max_date),
-                    min_value=min_date,
-                    max_value=max_date,
-                )
-
-                filtered_dates = df_filtered[
-                    (df_filtered["Date"] >= start_date) & (df_filtered["Date"] <= end_date)
-                ]
-                date_summary = filtered_dates.groupby("Date").size().reset_index(name="Tasks Completed")
-
-                st.markdown("### 📈 Task Completion Over Time")
-                fig, ax = plt.subplots(figsize=(6, 4))
-                sns.lineplot(data=date_summary, x="Date", y="Tasks Completed", marker="o", ax=ax)
-                ax.set_ylabel("Tasks")
-                ax.set_xlabel("Date")
-                ax.set_title("Tasks Completed Per Day")
-
-                # Format the x-axis
-                ax.set_xticks(date_summary["Date"])
-                ax.set_xticklabels(date_summary["Date"].astype(str), rotation=45, ha='right')
-
-                st.pyplot(fig)
-            else:
-                st.info("No valid timestamp data found.")
+        if history_span:
+            # Add date range filter
+            min_date, max_date = history_span
+            start_date, end_date = st.date_input(
+                "📅 Select Date Range",
+                value=(min_date, max_date),
+                min_value=min_date,
+                max_value=max_date,
+            )
+            period = st.radio("Group by", ["Day", "Week"], horizontal=True)
+            freq = period[0]
+
+            st.markdown("### 📈 Results Over Time")
+            if scope == "All cycles":
+                st.caption(f"Test cycle: {active_shard.name}")
+            trend = history.rollup(freq, start_date, end_date)
+            st.image(render_figure((history_version, "trend", freq, start_date, end_date),
+                                   draw_trend(trend, period), figsize=(6, 4)))
+        else:
+            st.info("No valid timestamp data found.")
     # -- Graph 3: Tasks Completed Per Tester (BOTTOM) --
     st.markdown("### 🧑‍💻 Tasks Completed Per Tester")
 
-    tester_filter = st.selectbox("👤 Filter by Tester", ["All"] + sorted(df_filtered["Tester Name"].dropna().unique()))
+    tester_filter = st.selectbox("👤 Filter by Tester", ["All"] + aggregates.testers)
 
-    if tester_filter != "All":
-        tester_data = df_filtered[df_filtered["Tester Name"] == tester_filter]
-    else:
-        tester_data = df_filtered
-
-    tester_summary = tester_data["Tester Name"].value_counts().reset_index()
-    tester_summary.columns = ["Tester Name", "Tasks Completed"]
+    tester_summary = aggregates.tester_summary(None if tester_filter == "All" else tester_filter)
 
     if not tester_summary.empty:
-        fig, ax = plt.subplots(figsize=(6, 3))  # Smaller size
-        sns.barplot(data=tester_summary, x="Tester Name", y="Tasks Completed", palette="Blues_d", ax=ax)
-        
-        ax.set_xlabel("Tester", fontsize=10)
-        ax.set_ylabel("Task Count", fontsize=10)
-        ax.set_title("Tasks Completed Per Tester", fontsize=12)
-        ax.tick_params(axis='x', labelrotation=0, labelsize=8)
-        ax.tick_params(axis='y', labelsize=8)
-        fig.tight_layout()  # Adjust spacing to avoid cut-offs
-
-        st.pyplot(fig)
+        st.image(render_figure((data_version, "tester_bar", tester_filter),
+                               draw_tester_bar(tester_summary), figsize=(6, 3)))  # Smaller size
     else:
         st.info("No tester task completion data available.")
+
+    # -- Pass rate and flakiness in the selected range (result history) --
+    if history_span:
+        st.markdown("### 🔁 Pass Rate and Flaky Tasks")
+        history_col1, history_col2 = st.columns(2)
+        with history_col1:
+            st.dataframe(history.tester_rollup(freq, start_date, end_date), use_container_width=True)
+        with history_col2:
+            flaky_tasks = history.flaky_tasks(start_date, end_date)
+            if flaky_tasks.empty:
+                st.info("No task flipped between Pass and Fail in this range.")
+            else:
+                st.dataframe(flaky_tasks, use_container_width=True)
         # -- Completion Progress Bar --
-    total_tasks = df_main.shape[0]
-    completed_tasks = df_main["Test Result"].notna().sum()
-    completion_percent = int((completed_tasks / total_tasks) * 100) if total_tasks > 0 else 0
+    total_tasks = aggregates.total_tasks
+    completed_tasks = aggregates.completed_tasks
+    completion_percent = aggregates.completion_percent
 
     st.markdown("### 📈 Overall Task Completion")
 
@@ -331,6 +398,27 @@ elif page == "Analytics":
     st.progress(completion_percent)
 
 
+@st.fragment(run_every=DATA_CHECK_INTERVAL)
+def watch_data_version():
+    """Rerun the page when the data changed elsewhere (another session, or a merged remote change)"""
+    version = storage.version()
+    if st.session_state.setdefault("data_version", version) != version:
+        st.session_state["data_version"] = version
+        st.rerun(scope="app")
+
+
+# Record the version this run showed (including its own submission), then keep checking
+st.session_state["data_version"] = storage.version()
+watch_data_version()
 
+perf.end()
 
-       
+# Performance panel: the latest reruns, submissions and background jobs (uploads, compactions)
+if perf.PERF_ENABLED:
+    with st.sidebar.expander("⏱️ Performance"):
+        for recorded in perf.recent_traces()[:10]:
+            context = ", ".join(f"{key}={value}" for key, value in recorded["context"].items())
+            st.markdown(f"**{recorded['trace']}** {recorded['duration_ms']:.0f} ms  \n{context}")
+            if recorded["spans"]:
+                spans = pd.DataFrame(recorded["spans"])
+                st.dataframe(spans[["name", "duration_ms", "start_ms"]], hide_index=True)
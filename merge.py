@@ -0,0 +1,156 @@
+import io
+from copy import copy
+from datetime import datetime
+
+import openpyxl
+from openpyxl.drawing.image import Image as OpenpyxlImage
+
+from utils import (BLOCK_LABELS, _ReusableBytesIO, get_workbook_index, normalize_id,
+                   persist_workbook, workbook_lock, writable_workbook)
+from summary import get_summary_engine
+
+MAIN_COLUMNS = 7
+
+
+def _timestamp(value):
+    """A Sheet1 Timestamp (text or datetime) as a datetime; None if it does not parse"""
+    if isinstance(value, datetime):
+        return value.replace(tzinfo=None)
+    try:
+        return datetime.fromisoformat(str(value).strip()).replace(tzinfo=None)
+    except ValueError:
+        return None
+
+
+def _result_key(values):
+    """Sort key of Sheet1 (tester, result, timestamp) values: the parsed timestamp (then its text),
+    then tester and result, so every instance picks the same winner for equal timestamps"""
+    tester, result, timestamp = ("" if value is None else str(value) for value in values)
+    return _timestamp(values[2]) or datetime.min, timestamp, tester, result
+
+
+def _is_newer(remote_values, local_values):
+    """Whether remote (tester, result, timestamp) Sheet1 values replace the local ones"""
+    if remote_values[2] in (None, ""):
+        return False
+    return local_values[2] in (None, "") or _result_key(remote_values) > _result_key(local_values)
+
+
+def _block_ranges(ws):
+    """(label, text) -> (first_row, last_row) of the last block for each key in a task sheet"""
+    starts = []
+    last_row = 0
+    for row, (label, text) in enumerate(ws.iter_rows(min_row=1, max_col=2, values_only=True), start=1):
+        if label is not None or text is not None:
+            last_row = row
+        if label in BLOCK_LABELS:
+            starts.append((row, (label, text)))
+    ranges = {}
+    for i, (row, key) in enumerate(starts):
+        end = starts[i + 1][0] - 1 if i + 1 < len(starts) else last_row
+        ranges[key] = (row, end)
+    return ranges
+
+
+def _copy_block(remote_ws, local_ws, local_index, key, first, last):
+    """Append rows first..last of remote_ws (cells, styles, images) as the current block for `key`"""
+    local_index.sheet_blocks(local_ws)
+    start = local_index.append_row(local_ws) if local_index.last_row[local_ws.title] else 1
+    offset = start - first
+    for row in remote_ws.iter_rows(min_row=first, max_row=last, max_col=2):
+        for cell in row:
+            if cell.value is None:
+                continue
+            target = local_ws.cell(row=cell.row + offset, column=cell.column, value=cell.value)
+            if cell.has_style:
+                target.font = copy(cell.font)
+                target.fill = copy(cell.fill)
+            if cell.hyperlink is not None:
+                # Link to a screenshot in the blob store
+                target.hyperlink = cell.hyperlink.target
+    for img in remote_ws._images:
+        anchor_row = img.anchor._from.row + 1
+        if first <= anchor_row <= last:
+            data = img.ref.getvalue() if isinstance(img.ref, io.BytesIO) else img._data()
+            local_img = OpenpyxlImage(_ReusableBytesIO(data))
+            local_ws.add_image(local_img, f"A{anchor_row + offset}")
+            local_ws.row_dimensions[anchor_row + offset].height = 100
+            local_ws.column_dimensions['A'].width = 60
+
+    blocks = local_index.sheet_blocks(local_ws)
+    blocks[key] = [start, None]
+    local_index.block_written(local_ws, blocks[key], last + offset)
+
+
+def merge_workbooks(local_wb, remote_wb):
+    """Fold another copy of the workbook into `local_wb`.
+
+    Per task, the side with the newer Sheet1 Timestamp wins (last writer wins; ties
+    go to the greater tester, then result):
+    its Sheet1 result columns and its block in the "Task ID N" sheet are taken.
+    Rows only present remotely are added. Returns the normalized IDs added or
+    updated from `remote_wb`.
+    """
+    local_index = get_workbook_index(local_wb)
+    local_main = local_wb["Sheet1"]
+    summary_engine = get_summary_engine(local_wb)
+    changes = []
+    added_rows = 0
+    taken = []
+    remote_ranges = {}
+
+    for values in remote_wb["Sheet1"].iter_rows(min_row=2, max_col=MAIN_COLUMNS):
+        task_id = values[0].value
+        if task_id is None:
+            continue
+        norm_id = normalize_id(task_id)
+        row = local_index.main_rows.get(norm_id)
+        if row is None:
+            row = local_main.max_row + 1
+            for cell in values[:4]:
+                local_main.cell(row=row, column=cell.column, value=cell.value)
+            local_index.main_rows[norm_id] = row
+            added_rows += 1
+            taken.append(norm_id)
+        local_values = tuple(local_main.cell(row=row, column=col).value for col in (5, 6, 7))
+        remote_values = tuple(cell.value for cell in values[4:7])
+        if not _is_newer(remote_values, local_values):
+            continue
+
+        for cell in values[4:7]:
+            target = local_main.cell(row=row, column=cell.column, value=cell.value)
+            if cell.has_style:
+                target.fill = copy(cell.fill)
+        changes.append((local_values, remote_values))
+        if norm_id not in taken:
+            taken.append(norm_id)
+
+        sheet_name = f"Task ID {str(task_id).split('.')[0]}"
+        if sheet_name not in remote_wb.sheetnames:
+            continue
+        remote_ws = remote_wb[sheet_name]
+        if sheet_name not in remote_ranges:
+            remote_ranges[sheet_name] = _block_ranges(remote_ws)
+        matches = [(first, last, key) for key, (first, last) in remote_ranges[sheet_name].items()
+                   if normalize_id(str(key[1]).replace("Task ", "", 1)) == norm_id]
+        if matches:
+            first, last, key = max(matches)
+            local_ws = local_wb[sheet_name] if sheet_name in local_wb.sheetnames else local_wb.create_sheet(sheet_name)
+            _copy_block(remote_ws, local_ws, local_index, key, first, last)
+
+    if changes or added_rows:
+        last_id = taken[-1] if taken else None
+        last_tester = changes[-1][1][0] if changes else None
+        summary_engine.apply_changes(changes, last_id, last_tester, added_rows=added_rows)
+    return taken
+
+
+def merge_remote_workbook(path, remote_content):
+    """Merge remote workbook bytes into the cached workbook for `path` and save it locally"""
+    remote_wb = openpyxl.load_workbook(io.BytesIO(remote_content))
+    with workbook_lock:
+        wb = writable_workbook(path)
+        taken = merge_workbooks(wb, remote_wb)
+        if taken:
+            persist_workbook(path, wb)
+    return taken
@@ -0,0 +1,148 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+
+# Phase timing; off unless TESTING_TOOL_PERF=1 (then spans cost a few microseconds each)
+PERF_ENABLED = os.environ.get("TESTING_TOOL_PERF", "") == "1"
+# Finished traces are appended here as JSON lines (None to keep them in memory only)
+PERF_LOG = os.environ.get("TESTING_TOOL_PERF_LOG", "perf_log.jsonl")
+# Traces kept for the sidebar performance panel
+RECENT_TRACES = 50
+
+_NULL = nullcontext()
+_local = threading.local()
+_recent = deque(maxlen=RECENT_TRACES)
+_log_lock = threading.Lock()
+
+
+class Trace:
+    """Spans recorded for one rerun, submission or background job"""
+
+    def __init__(self, kind, context):
+        self.kind = kind
+        self.context = context
+        self.started = time.time()
+        self._t0 = time.perf_counter()
+        self.duration = None
+        self.spans = []
+        self.depth = 0
+
+    def to_dict(self):
+        return {
+            "trace": self.kind,
+            "context": self.context,
+            "started": datetime.fromtimestamp(self.started).isoformat(timespec="milliseconds"),
+            "duration_ms": round(self.duration * 1000, 3),
+            "thread": threading.current_thread().name,
+            "spans": self.spans,
+        }
+
+
+def _stack():
+    stack = getattr(_local, "traces", None)
+    if stack is None:
+        stack = _local.traces = []
+    return stack
+
+
+def _finish(trace):
+    trace.duration = time.perf_counter() - trace._t0
+    record = trace.to_dict()
+    _recent.append(record)
+    if PERF_LOG:
+        line = json.dumps(record, default=str)
+        with _log_lock:
+            with open(PERF_LOG, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+
+
+def begin(kind, **context):
+    """Start a trace on this thread (e.g. one Streamlit rerun); a trace left open by an
+    interrupted rerun is finished first"""
+    if not PERF_ENABLED:
+        return
+    stack = _stack()
+    while stack:
+        _finish(stack.pop())
+    stack.append(Trace(kind, context))
+
+
+def annotate(**context):
+    """Add context (page, tester, ...) to the innermost open trace"""
+    if PERF_ENABLED and _stack():
+        _stack()[-1].context.update(context)
+
+
+def current_context():
+    """Context of the innermost open trace on this thread ({} without one), e.g. to carry a
+    submission's tester and task into the writer thread's trace"""
+    if PERF_ENABLED and _stack():
+        return dict(_stack()[-1].context)
+    return {}
+
+
+def end():
+    if PERF_ENABLED:
+        stack = _stack()
+        while stack:
+            _finish(stack.pop())
+
+
+@contextmanager
+def _trace(kind, context):
+    stack = _stack()
+    trace = Trace(kind, context)
+    stack.append(trace)
+    try:
+        yield trace
+    finally:
+        if trace in stack:
+            stack.remove(trace)
+            _finish(trace)
+
+
+def trace(kind, **context):
+    """Context manager grouping the spans inside it (e.g. one submission) into their own trace"""
+    if not PERF_ENABLED:
+        return _NULL
+    return _trace(kind, context)
+
+
+@contextmanager
+def _span(name, attrs):
+    stack = _stack()
+    if not stack:
+        # Outside any trace (background threads): the span is a trace of its own
+        with _trace(name, attrs):
+            yield
+        return
+    current = stack[-1]
+    started = time.perf_counter()
+    current.depth += 1
+    try:
+        yield
+    finally:
+        current.depth -= 1
+        current.spans.append({
+            "name": name,
+            "start_ms": round((started - current._t0) * 1000, 3),
+            "duration_ms": round((time.perf_counter() - started) * 1000, 3),
+            "depth": current.depth,
+            **attrs,
+        })
+
+
+def span(name, **attrs):
+    """Time a phase: `with span("save"):` (a no-op when PERF_ENABLED is off)"""
+    if not PERF_ENABLED:
+        return _NULL
+    return _span(name, attrs)
+
+
+def recent_traces():
+    """Most recent finished traces, newest first"""
+    return list(reversed(_recent))
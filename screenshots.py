@@ -0,0 +1,183 @@
+import io
+import hashlib
+import threading
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from perf import span
+
+# Size of the image embedded in the "Task ID N" sheets
+SCREENSHOT_MAX_SIZE = (600, 400)
+# Size of the thumbnail shown in the upload preview
+PREVIEW_MAX_SIZE = (240, 160)
+# Output encoding for embedded screenshots: "png", "palette" (8-bit PNG) or "jpeg".
+# WebP is not offered: openpyxl re-encodes anything but png/jpeg/gif to PNG on save.
+SCREENSHOT_FORMAT = "png"
+SCREENSHOT_QUALITY = 80
+MAX_WORKERS = 4
+CACHE_SIZE = 64
+# Upload thumbnails kept (keyed by upload), and how many the Submit form shows per row
+PREVIEW_CACHE_SIZE = 256
+PREVIEW_COLUMNS = 4
+
+ProcessedScreenshot = namedtuple("ProcessedScreenshot", ["digest", "data", "format", "preview", "name"])
+
+_executor = None
+_executor_lock = threading.Lock()
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+_previews = OrderedDict()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="screenshots")
+        return _executor
+
+
+def read_upload(upload):
+    """Raw bytes of an uploaded file / file-like object, leaving it rewound"""
+    if isinstance(upload, bytes):
+        return upload
+    if hasattr(upload, "getvalue"):
+        return upload.getvalue()
+    upload.seek(0)
+    data = upload.read()
+    upload.seek(0)
+    return data
+
+
+def content_hash(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def _encode(img, fmt, quality):
+    bio = io.BytesIO()
+    if fmt == "jpeg":
+        img.convert("RGB").save(bio, format="JPEG", quality=quality, optimize=True)
+    elif fmt == "palette":
+        img.convert("RGB").quantize(colors=256).save(bio, format="PNG", optimize=True)
+    else:
+        img.save(bio, format="PNG")
+    return bio.getvalue()
+
+
+def _process(data, digest, name, fmt, quality):
+    # Pillow is imported where images are decoded, not when this module is
+    from PIL import Image
+
+    with Image.open(io.BytesIO(data)) as img:
+        img.draft("RGB", SCREENSHOT_MAX_SIZE)
+        img.thumbnail(SCREENSHOT_MAX_SIZE)
+        encoded = _encode(img, fmt, quality)
+        img.thumbnail(PREVIEW_MAX_SIZE)
+        preview = _encode(img, "jpeg", 70)
+    return ProcessedScreenshot(digest, encoded, fmt, preview, name)
+
+
+def make_preview(data):
+    """Small JPEG thumbnail of already-encoded image bytes"""
+    from PIL import Image
+
+    with Image.open(io.BytesIO(data)) as img:
+        img.draft("RGB", PREVIEW_MAX_SIZE)
+        img.thumbnail(PREVIEW_MAX_SIZE)
+        return _encode(img, "jpeg", 70)
+
+
+def preview_uploads(uploads):
+    """JPEG thumbnails of uploads for the Submit form, made once per uploaded file.
+
+    Keyed by the upload's `file_id` (Streamlit gives each uploaded file one),
+    so later reruns neither read nor hash the file; anything without one is
+    keyed by its content hash. Only a thumbnail-sized
+    decode happens here; the full resize and encode waits for Submit
+    (process_screenshots).
+    """
+    with span("previews", count=len(uploads)):
+        previews = []
+        pending = []
+        for upload in uploads:
+            key = getattr(upload, "file_id", None)
+            data = None
+            if not key:
+                data = read_upload(upload)
+                key = content_hash(data)
+            with _cache_lock:
+                cached = _previews.get(key)
+                if cached is not None:
+                    _previews.move_to_end(key)
+            if cached is None:
+                if data is None:
+                    data = read_upload(upload)
+                pending.append((len(previews), key, _get_executor().submit(make_preview, data)))
+            previews.append(cached)
+
+        for i, key, future in pending:
+            previews[i] = future.result()
+            with _cache_lock:
+                _previews[key] = previews[i]
+                while len(_previews) > PREVIEW_CACHE_SIZE:
+                    _previews.popitem(last=False)
+        return previews
+
+
+def duplicate_uploads(uploads):
+    """Uploads whose content repeats an earlier one in `uploads` (process_screenshots keeps only the first)"""
+    seen = set()
+    duplicates = []
+    for upload in uploads:
+        digest = content_hash(read_upload(upload))
+        if digest in seen:
+            duplicates.append(upload)
+        seen.add(digest)
+    return duplicates
+
+
+def process_screenshots(uploads, fmt=None, quality=None):
+    """Decode, resize and encode uploads in a thread pool.
+
+    Called on Submit (previews come from preview_uploads). Results are cached
+    by content hash (and output settings), so identical images are only
+    processed once. Duplicate uploads in the same batch are dropped (see
+    duplicate_uploads); a workbook stores each distinct image once anyway.
+    Items that already are ProcessedScreenshot are passed through.
+    """
+    with span("images", count=len(uploads)):
+        return _process_batch(uploads, fmt or SCREENSHOT_FORMAT, quality or SCREENSHOT_QUALITY)
+
+
+def _process_batch(uploads, fmt, quality):
+    results = []
+    pending = []
+    seen = set()
+    for upload in uploads:
+        if isinstance(upload, ProcessedScreenshot):
+            results.append(upload)
+            continue
+        data = read_upload(upload)
+        digest = content_hash(data)
+        if digest in seen:
+            continue
+        seen.add(digest)
+        key = (digest, fmt, quality)
+        with _cache_lock:
+            cached = _cache.get(key)
+            if cached is not None:
+                _cache.move_to_end(key)
+        name = getattr(upload, "name", None)
+        if cached is None:
+            pending.append((len(results), key, _get_executor().submit(_process, data, digest, name, fmt, quality)))
+        elif cached.name != name:
+            cached = cached._replace(name=name)
+        results.append(cached)
+
+    for i, key, future in pending:
+        results[i] = future.result()
+        with _cache_lock:
+            _cache[key] = results[i]
+            while len(_cache) > CACHE_SIZE:
+                _cache.popitem(last=False)
+    return results
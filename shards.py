@@ -0,0 +1,262 @@
+"""Test-cycle shards: one workbook per test cycle/release (or module) instead of one ever-growing file.
+
+shards.json lists the shards and which one is active:
+
+    {"active": "2025-04", "shards": [
+        {"name": "main", "path": "main_excel.xlsx"},
+        {"name": "2025-04", "path": "shards/2025-04.xlsx"}]}
+
+`remote` (path in the GitHub repo) defaults to `path`. Without shards.json
+there is a single shard, main_excel.xlsx, exactly as before. The app only
+loads the active shard. ShardIndex keeps the Sheet1 result columns of every
+shard in shard_index.json, so the Analytics page can combine shards without
+opening their workbooks; a shard is re-read (read-only, Sheet1 only) when
+its file changes.
+
+    python shards.py list
+    python shards.py new 2025-05 --from 2025-04   # same tasks, results cleared; becomes active
+    python shards.py activate 2025-04
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+from collections import namedtuple
+from datetime import datetime
+
+import openpyxl
+import pandas as pd
+
+import storage
+from utils import get_file_version, read_excel_frame
+
+SHARDS_FILE = "shards.json"
+SHARD_INDEX_FILE = "shard_index.json"
+# Where `python shards.py new` puts new shard workbooks
+SHARD_DIR = "shards"
+# The shard used when there is no shards.json (the original single workbook)
+DEFAULT_SHARD = {"name": "main", "path": "main_excel.xlsx"}
+INDEX_COLUMNS = ["Task ID", "Tester Name", "Test Result", "Timestamp"]
+# Sheet1 columns copied into a new shard; the result columns (Test Result, Timestamp) start empty
+TASK_COLUMNS = 5
+
+Shard = namedtuple("Shard", ["name", "path", "remote", "db_path"])
+
+
+def _shard(spec):
+    path = spec["path"]
+    db_path = spec.get("db_path") or (storage.SQLITE_PATH if path == DEFAULT_SHARD["path"]
+                                      else f"{os.path.splitext(path)[0]}.db")
+    return Shard(spec["name"], path, spec.get("remote") or path, db_path)
+
+
+def _write_json(path, data):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2, default=str)
+    os.replace(tmp_path, path)
+
+
+class ShardRegistry:
+    """The shards listed in shards.json (or the single default shard)"""
+
+    def __init__(self, path=SHARDS_FILE):
+        self.path = path
+        self.reload()
+
+    def reload(self):
+        if os.path.exists(self.path):
+            with open(self.path, "r", encoding="utf-8") as f:
+                self._data = json.load(f)
+            self.signature = get_file_version(self.path)
+        else:
+            self._data = {"active": DEFAULT_SHARD["name"], "shards": [dict(DEFAULT_SHARD)]}
+            self.signature = None
+
+    def save(self):
+        _write_json(self.path, self._data)
+        self.signature = get_file_version(self.path)
+
+    @property
+    def shards(self):
+        return [_shard(spec) for spec in self._data["shards"]]
+
+    def get(self, name):
+        for shard in self.shards:
+            if shard.name == name:
+                return shard
+        raise KeyError(f"No shard named {name!r} (known: {', '.join(s.name for s in self.shards)})")
+
+    @property
+    def active(self):
+        return self.get(self._data["active"])
+
+    def add(self, name, path=None, remote=None):
+        if any(spec["name"] == name for spec in self._data["shards"]):
+            raise ValueError(f"Shard {name!r} already exists")
+        spec = {"name": name, "path": path or os.path.join(SHARD_DIR, f"{name}.xlsx").replace(os.sep, "/")}
+        if remote:
+            spec["remote"] = remote
+        self._data["shards"].append(spec)
+        self.save()
+        return _shard(spec)
+
+    def activate(self, name):
+        self.get(name)
+        self._data["active"] = name
+        self.save()
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_registry(path=SHARDS_FILE):
+    """Process-wide registry, re-read when shards.json changed (e.g. after `shards.py activate`)"""
+    global _registry
+    with _registry_lock:
+        signature = get_file_version(path) if os.path.exists(path) else None
+        if _registry is None or _registry.path != path:
+            _registry = ShardRegistry(path)
+        elif _registry.signature != signature:
+            _registry.reload()
+        return _registry
+
+
+def create_shard_workbook(source_path, target_path):
+    """New shard workbook with the tasks of `source_path` (Sheet1 only, results cleared)"""
+    source = openpyxl.load_workbook(source_path, read_only=True)
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet("Sheet1")
+    try:
+        for i, row in enumerate(source["Sheet1"].values):
+            row = list(row)
+            ws.append(row if i == 0 else row[:TASK_COLUMNS] + [None] * (len(row) - TASK_COLUMNS))
+    finally:
+        source.close()
+    os.makedirs(os.path.dirname(target_path) or ".", exist_ok=True)
+    wb.save(target_path)
+
+
+class ShardIndex:
+    """Sheet1 result columns of every shard, for analytics across shards.
+
+    Entries are keyed by each shard file's signature and persisted in
+    SHARD_INDEX_FILE, so unchanged shards are never opened; a changed one is
+    re-read read-only. The active shard is normally passed in from the live
+    storage instead, so its uncompacted submissions count too.
+    """
+
+    def __init__(self, path=SHARD_INDEX_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self._frames = {}
+        self._derived = {}
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                self._entries = json.load(f)
+        except (OSError, ValueError):
+            self._entries = {}
+
+    def frame(self, shard):
+        """(signature, DataFrame with INDEX_COLUMNS) of a shard's Sheet1"""
+        signature = list(get_file_version(shard.path))
+        with self._lock:
+            cached = self._frames.get(shard.name)
+            if cached and cached[0] == signature:
+                return cached
+            entry = self._entries.get(shard.name)
+            if entry is None or entry["signature"] != signature or entry["path"] != shard.path:
+                df = read_excel_frame(shard.path).reindex(columns=INDEX_COLUMNS)
+                entry = self._entries[shard.name] = {
+                    "path": shard.path,
+                    "signature": signature,
+                    "indexed": datetime.now().isoformat(timespec="seconds"),
+                    "rows": [[None if pd.isna(value) else str(value) for value in row]
+                             for row in df.itertuples(index=False)],
+                }
+                _write_json(self.path, self._entries)
+            cached = self._frames[shard.name] = (signature, pd.DataFrame(entry["rows"], columns=INDEX_COLUMNS))
+            return cached
+
+    def combined(self, shards, live=None):
+        """(key, DataFrame of all shards with a "Shard" column); `live` is an optional
+        (shard name, data version, DataFrame) used instead of the index for that shard.
+        Shards whose file does not exist yet are skipped."""
+        frames, key = [], []
+        for shard in shards:
+            if live and shard.name == live[0]:
+                version, df = live[1], live[2].reindex(columns=INDEX_COLUMNS)
+            elif os.path.exists(shard.path):
+                version, df = self.frame(shard)
+            else:
+                continue
+            frames.append(df.assign(Shard=shard.name))
+            key.append((shard.name, str(version)))
+        df = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=INDEX_COLUMNS + ["Shard"])
+        return tuple(key), df
+
+    def get_derived(self, key, name, build, df):
+        """`build(df)` for the combined data identified by `key`, kept until the key changes"""
+        with self._lock:
+            if self._derived.get("key") != key:
+                self._derived = {"key": key}
+            if name not in self._derived:
+                self._derived[name] = build(df)
+            return self._derived[name]
+
+
+_index = None
+
+
+def get_shard_index():
+    global _index
+    with _registry_lock:
+        if _index is None:
+            _index = ShardIndex()
+        return _index
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("list", help="show the shards and which one is active")
+    new = commands.add_parser("new", help="create a shard with the tasks of another one and make it active")
+    new.add_argument("name")
+    new.add_argument("--from", dest="source", help="shard to copy tasks from (default: the active one)")
+    new.add_argument("--path", help=f"workbook path (default: {SHARD_DIR}/<name>.xlsx)")
+    new.add_argument("--remote", help="path in the GitHub repository (default: the workbook path)")
+    new.add_argument("--no-activate", action="store_true", help="keep the current shard active")
+    activate = commands.add_parser("activate", help="make a shard the one the app works on")
+    activate.add_argument("name")
+    commands.add_parser("index", help="refresh shard_index.json for every shard")
+    args = parser.parse_args(argv)
+
+    registry = ShardRegistry()
+    if args.command == "list":
+        active = registry.active.name
+        for shard in registry.shards:
+            state = "missing" if not os.path.exists(shard.path) else f"{os.path.getsize(shard.path) / 1e6:.1f} MB"
+            print(f"{'*' if shard.name == active else ' '} {shard.name:20s} {shard.path} ({state})")
+    elif args.command == "new":
+        source = registry.get(args.source) if args.source else registry.active
+        shard = registry.add(args.name, path=args.path, remote=args.remote)
+        create_shard_workbook(source.path, shard.path)
+        if not args.no_activate:
+            registry.activate(shard.name)
+        print(f"✅ Created shard {shard.name} at {shard.path} with the tasks of {source.name}")
+    elif args.command == "activate":
+        registry.activate(args.name)
+        print(f"✅ Active shard: {args.name}")
+    elif args.command == "index":
+        index = ShardIndex()
+        for shard in registry.shards:
+            if os.path.exists(shard.path):
+                _, df = index.frame(shard)
+                print(f"{shard.name}: {len(df)} tasks, {int(df['Test Result'].notna().sum())} results")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
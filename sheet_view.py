@@ -0,0 +1,78 @@
+import numpy as np
+from pandas.api.types import is_datetime64_any_dtype, is_numeric_dtype
+
+NOT_TESTED = "Not tested"
+PAGE_SIZES = [25, 50, 100, 250]
+
+
+def _as_text(column):
+    return column.where(column.notna(), "").astype(str)
+
+
+class SheetView:
+    """Row index for the Excel Sheet page, built once per data version.
+
+    Filtering, searching and sorting work on arrays of row positions; only the
+    requested page of rows is ever materialized as a DataFrame.
+    """
+
+    def __init__(self, df):
+        self.df = df
+        self.columns = list(df.columns)
+
+        # Row positions per tester and per result ("Not tested" for empty results)
+        self.by_tester = df.groupby("Tester Name", sort=True).indices
+        self.testers = list(self.by_tester)
+        results = df["Test Result"].fillna(NOT_TESTED).astype(str).to_numpy()
+        self.by_result = df.groupby(results, sort=True).indices
+        self.results = list(self.by_result)
+
+        # One lowercase string per row with every column, for substring search
+        search_text = _as_text(df[self.columns[0]]).str.lower()
+        for column in self.columns[1:]:
+            search_text = search_text + " " + _as_text(df[column]).str.lower()
+        self._search_text = search_text.reset_index(drop=True)
+        self._ranks = {}
+
+    def _rank(self, column, ascending=True):
+        """Position of each row in the sort order of `column` (computed on first use). Numbers and
+        dates sort by value, other columns as text; empty cells come last in either direction"""
+        if column not in self._ranks:
+            values = self.df[column]
+            missing = values.isna().to_numpy()
+            if is_numeric_dtype(values) or is_datetime64_any_dtype(values):
+                values = values.to_numpy()
+            else:
+                values = _as_text(values).to_numpy()
+            present = np.flatnonzero(~missing)
+            order = present[np.argsort(values[present], kind="stable")]
+            ranks = np.full(len(values), len(order), dtype=np.int64)
+            ranks[order] = np.arange(len(order))
+            self._ranks[column] = ranks, len(order)
+        ranks, count = self._ranks[column]
+        return ranks if ascending else np.where(ranks < count, count - 1 - ranks, count)
+
+    def query(self, tester=None, result=None, search="", sort_by=None, ascending=True):
+        """Row positions matching the filters, in display order"""
+        positions = np.arange(len(self.df))
+        if tester is not None:
+            positions = self.by_tester.get(tester, positions[:0])
+        if result is not None:
+            positions = np.intersect1d(positions, self.by_result.get(result, positions[:0]), assume_unique=True)
+        search = search.strip().lower()
+        if search:
+            hits = self._search_text.iloc[positions].str.contains(search, regex=False).to_numpy()
+            positions = positions[hits]
+        if sort_by:
+            positions = positions[np.argsort(self._rank(sort_by, ascending)[positions], kind="stable")]
+        return positions
+
+    def page(self, positions, page_number, page_size, columns=None):
+        """The rows of one page (1-based) as a DataFrame, keeping the workbook's row labels"""
+        start = (page_number - 1) * page_size
+        rows = self.df.iloc[positions[start:start + page_size]]
+        return rows[columns] if columns is not None else rows
+
+
+def page_count(total_rows, page_size):
+    return max(1, -(-total_rows // page_size))
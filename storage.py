@@ -0,0 +1,511 @@
+import io
+import os
+import sqlite3
+import threading
+from datetime import datetime
+
+import openpyxl
+import pandas as pd
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import PatternFill
+
+from utils import (RESULT_FILLS, append_block, export_workbook_bytes, get_data_version, get_derived,
+                   journal_prepared, load_excel_frame, normalize_id, prepare_submissions, save_submissions,
+                   update_derived, write_workbook)
+from screenshots import ProcessedScreenshot, process_screenshots
+from merge import _block_ranges, _is_newer, merge_remote_workbook
+import blobstore
+from blobstore import get_blob_store
+from history import get_history
+from perf import span
+from task_index import TaskIndex
+from writer import SubmissionQueue
+from summary import SUMMARY_SHEET, write_summary_sheet
+
+# Which backend the app uses: "excel" (main_excel.xlsx is the database) or "sqlite"
+STORAGE_BACKEND = "excel"
+SQLITE_PATH = "testing.db"
+
+SHEET1_COLUMNS = ["Task ID", "Task Name", "Navigation", "Parameters", "Tester Name", "Test Result", "Timestamp"]
+
+
+def _stamped(submissions):
+    """Submissions with a timestamp each (one clock reading for the batch), so the
+    data and the result history record the same time"""
+    now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    return [dict(submission, timestamp=submission.get("timestamp") or now) for submission in submissions]
+
+
+def _submission(task_id, tester_name, test_result, comment, screenshots):
+    submission, = _stamped([{
+        "task_id": task_id,
+        "tester_name": tester_name,
+        "test_result": test_result,
+        "comment": comment,
+        "screenshots": screenshots,
+    }])
+    return submission
+
+
+def _record_history(path, submissions):
+    get_history(path).record([(submission["task_id"], submission["tester_name"], submission["test_result"],
+                               submission["timestamp"]) for submission in submissions])
+
+
+class ExcelStorage:
+    """The workbook itself is the database (the original layout)"""
+
+    name = "excel"
+
+    def __init__(self, path):
+        self.path = path
+        # Every session's submission goes through this one writer thread
+        self.writer = SubmissionQueue(self._write_batch, prepare=self._prepare, name="excel-writer")
+
+    def load(self):
+        return load_excel_frame(self.path)
+
+    def version(self):
+        load_excel_frame(self.path)
+        return get_data_version(self.path)
+
+    def get_derived(self, name, build):
+        load_excel_frame(self.path)
+        return get_derived(self.path, name, build)
+
+    def get_view(self, name, build, tester=None, results_only=False):
+        """`build(frame)` over at least one tester's rows (or the rows with a result), once per data
+        version. The workbook is parsed whole anyway, so every view here is built from all rows
+        and kept up to date incrementally"""
+        return self.get_derived(name, build)
+
+    def tasks_frame(self, tester=None):
+        df = self.load()
+        return df if tester is None else df[df["Tester Name"] == tester]
+
+    def results_frame(self):
+        df = self.load()
+        return df[(df["Test Result"].notna()) | (df["Timestamp"].notna())]
+
+    def testers(self):
+        return self.get_derived("task_index", TaskIndex).testers
+
+    def has_task(self, task_id):
+        return normalize_id(task_id) in self.get_derived("task_index", TaskIndex).row_by_id
+
+    def task_count(self):
+        return len(self.load())
+
+    def submit(self, task_id, tester_name, test_result, comment, screenshots):
+        """Queue a submission for the writer and wait for it; returns the data version containing it"""
+        return self.writer.submit(_submission(task_id, tester_name, test_result, comment, screenshots))
+
+    def _prepare(self, submission):
+        return prepare_submissions(self.path, [submission])[0]
+
+    def _write_batch(self, prepared):
+        """Journal a group of prepared submissions (one fsync); the compactor saves the file later"""
+        return journal_prepared(self.path, prepared, record=self._record_history)
+
+    def _record_history(self, submissions):
+        # Called under workbook_lock, so a history reconcile never sees the new data first
+        _record_history(self.path, submissions)
+
+    def submit_many(self, submissions):
+        """Apply a batch (dicts of apply_submission arguments) with one Summary update and one save"""
+        return save_submissions(self.path, _stamped(submissions), record=self._record_history)
+
+    def history(self):
+        """Result history of this workbook, reconciled with the current data"""
+        return get_history(self.path).synced(self.version(), self.load)
+
+    def export_bytes(self):
+        return export_workbook_bytes(self.path)
+
+    def merge_remote(self, content):
+        merge_remote_workbook(self.path, content)
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    task_id TEXT PRIMARY KEY,          -- normalized Task ID
+    raw_id TEXT NOT NULL,              -- Task ID as shown in Sheet1 (e.g. "1.0")
+    position INTEGER NOT NULL,
+    task_name TEXT,
+    navigation TEXT,
+    parameters TEXT,
+    tester_name TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_tasks_tester ON tasks (tester_name, position);
+CREATE INDEX IF NOT EXISTS idx_tasks_position ON tasks (position);
+
+CREATE TABLE IF NOT EXISTS results (
+    task_id TEXT PRIMARY KEY REFERENCES tasks (task_id),
+    tester_name TEXT,
+    test_result TEXT,
+    comment TEXT,
+    timestamp TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_results_tester ON results (tester_name);
+CREATE INDEX IF NOT EXISTS idx_results_timestamp ON results (timestamp);
+
+CREATE TABLE IF NOT EXISTS screenshots (
+    task_id TEXT NOT NULL REFERENCES tasks (task_id),
+    position INTEGER NOT NULL,
+    digest TEXT NOT NULL REFERENCES blobs (digest),
+    PRIMARY KEY (task_id, position)
+);
+
+CREATE TABLE IF NOT EXISTS blobs (
+    digest TEXT PRIMARY KEY,
+    format TEXT NOT NULL,
+    data BLOB NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+TASK_QUERY = """
+SELECT t.raw_id AS "Task ID", t.task_name AS "Task Name", t.navigation AS "Navigation",
+       t.parameters AS "Parameters", COALESCE(r.tester_name, t.tester_name) AS "Tester Name",
+       r.test_result AS "Test Result", r.timestamp AS "Timestamp"
+FROM tasks t LEFT JOIN results r ON r.task_id = t.task_id
+"""
+
+
+# One tester's rows: both candidate sets come from an index (idx_tasks_tester, idx_results_tester)
+TESTER_QUERY = TASK_QUERY + """
+WHERE t.task_id IN (SELECT task_id FROM tasks WHERE tester_name = ? UNION SELECT task_id FROM results WHERE tester_name = ?)
+  AND COALESCE(r.tester_name, t.tester_name) = ?
+ORDER BY t.position
+"""
+
+# Rows with a result, read from the results table rather than by scanning every task
+# (CROSS JOIN keeps that join order in SQLite)
+RESULTS_QUERY = """
+SELECT t.raw_id AS "Task ID", t.task_name AS "Task Name", t.navigation AS "Navigation",
+       t.parameters AS "Parameters", COALESCE(r.tester_name, t.tester_name) AS "Tester Name",
+       r.test_result AS "Test Result", r.timestamp AS "Timestamp"
+FROM results r CROSS JOIN tasks t ON t.task_id = r.task_id
+WHERE r.test_result IS NOT NULL OR r.timestamp IS NOT NULL
+ORDER BY t.position
+"""
+
+TESTERS_QUERY = """
+SELECT tester_name FROM results WHERE tester_name IS NOT NULL
+UNION
+SELECT t.tester_name FROM tasks t
+WHERE t.tester_name IS NOT NULL
+  AND NOT EXISTS (SELECT 1 FROM results r WHERE r.task_id = t.task_id AND r.tester_name IS NOT NULL)
+ORDER BY 1
+"""
+
+
+def sheet_task_id(raw_id):
+    """Task ID as written to Sheet1: a number when `raw_id` is one written as a number
+    ("2.0", "1.1"), otherwise the text itself (e.g. "1.10")"""
+    try:
+        number = float(raw_id)
+    except (TypeError, ValueError):
+        return raw_id
+    return number if str(number) == raw_id else raw_id
+
+
+def _text(value):
+    return None if value is None else str(value)
+
+
+class SQLiteStorage:
+    """Tasks, results and screenshots in SQLite; the Excel layout is generated on demand.
+
+    On first use an empty database is seeded from `seed_excel` (Sheet1 rows,
+    plus the comment and screenshots of each recorded result's block). Generated
+    workbooks stand in for `seed_excel`, so their screenshot links use its blob store.
+    """
+
+    name = "sqlite"
+
+    def __init__(self, db_path, seed_excel=None):
+        self.db_path = db_path
+        self.blob_store = get_blob_store(seed_excel or db_path)
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+        self._derived = {}
+        self._views = {}
+        # Every session's submission goes through this one writer thread (grouped into one transaction)
+        self.writer = SubmissionQueue(self.submit_many, prepare=self._prepare, name="sqlite-writer")
+        if seed_excel and os.path.exists(seed_excel) and not self._query_one("SELECT 1 FROM tasks LIMIT 1"):
+            with open(seed_excel, "rb") as f:
+                self.import_workbook(f.read())
+
+    def _query_one(self, sql, params=()):
+        with self._lock:
+            return self._conn.execute(sql, params).fetchone()
+
+    def _frame(self, sql, params=()):
+        with self._lock:
+            return pd.read_sql_query(sql, self._conn, params=params)
+
+    def version(self):
+        row = self._query_one("SELECT value FROM meta WHERE key = 'version'")
+        return row[0] if row else 0
+
+    def _bump_version(self):
+        self._conn.execute("INSERT INTO meta (key, value) VALUES ('version', 1) "
+                           "ON CONFLICT (key) DO UPDATE SET value = value + 1")
+
+    def load(self):
+        return self.get_derived("df", None)
+
+    def get_derived(self, name, build):
+        version = self.version()
+        with self._lock:
+            derived = self._derived
+            if derived.get("version") != version:
+                previous = derived
+                df = self._frame(TASK_QUERY + " ORDER BY t.position")
+                derived = self._derived = {"version": version, "df": df}
+                if "df" in previous:
+                    old_derived = {key: value for key, value in previous.items() if key not in ("version", "df")}
+                    derived.update(update_derived(previous["df"], old_derived, df))
+            if name not in derived:
+                with span(f"derived.{name}"):
+                    derived[name] = build(derived["df"])
+            return derived[name]
+
+    def _per_version(self, key, build):
+        version = self.version()
+        with self._lock:
+            if self._views.get("version") != version:
+                self._views = {"version": version}
+            if key not in self._views:
+                self._views[key] = build()
+            return self._views[key]
+
+    def get_view(self, name, build, tester=None, results_only=False):
+        """`build(frame)` over one tester's rows (or the rows with a result), read with an indexed
+        query once per data version; without a filter the same as get_derived"""
+        if tester is not None:
+            return self._per_version((name, tester), lambda: build(self.tasks_frame(tester)))
+        if results_only:
+            return self._per_version((name, "results"), lambda: build(self.results_frame()))
+        return self.get_derived(name, build)
+
+    def tasks_frame(self, tester=None):
+        if tester is None:
+            return self.load()
+        return self._frame(TESTER_QUERY, (tester, tester, tester))
+
+    def results_frame(self):
+        return self._frame(RESULTS_QUERY)
+
+    def testers(self):
+        return self._per_version("testers", lambda: [row[0] for row in self._conn.execute(TESTERS_QUERY)])
+
+    def has_task(self, task_id):
+        return self._query_one("SELECT 1 FROM tasks WHERE task_id = ?", (normalize_id(task_id),)) is not None
+
+    def task_count(self):
+        return self._query_one("SELECT COUNT(*) FROM tasks")[0]
+
+    def _store_result(self, norm_id, tester_name, test_result, comment, timestamp, screenshots):
+        self._conn.execute(
+            "INSERT INTO results (task_id, tester_name, test_result, comment, timestamp) VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT (task_id) DO UPDATE SET tester_name = excluded.tester_name, "
+            "test_result = excluded.test_result, comment = excluded.comment, timestamp = excluded.timestamp",
+            (norm_id, tester_name, test_result, comment, timestamp))
+        if screenshots:
+            start = self._conn.execute("SELECT COALESCE(MAX(position), -1) + 1 FROM screenshots WHERE task_id = ?",
+                                       (norm_id,)).fetchone()[0]
+            for offset, shot in enumerate(process_screenshots(screenshots)):
+                self._conn.execute("INSERT OR IGNORE INTO blobs (digest, format, data) VALUES (?, ?, ?)",
+                                   (shot.digest, shot.format, shot.data))
+                self._conn.execute("INSERT INTO screenshots (task_id, position, digest) VALUES (?, ?, ?)",
+                                   (norm_id, start + offset, shot.digest))
+
+    def submit(self, task_id, tester_name, test_result, comment, screenshots):
+        """Queue a submission for the writer and wait for it; returns the data version containing it"""
+        return self.writer.submit(_submission(task_id, tester_name, test_result, comment, screenshots))
+
+    def _prepare(self, submission):
+        """Check the Task ID and decode the screenshots before the submission joins a transaction"""
+        if not self._query_one("SELECT 1 FROM tasks WHERE task_id = ?", (normalize_id(submission["task_id"]),)):
+            raise KeyError(f"Task ID {submission['task_id']} not found")
+        return dict(submission, screenshots=process_screenshots(submission.get("screenshots") or []))
+
+    def submit_many(self, submissions):
+        """Record a batch of submissions in one transaction; nothing is stored if a task ID is unknown"""
+        submissions = _stamped(submissions)
+        with span("sqlite.submit", count=len(submissions)), self._lock:
+            with self._conn:
+                for submission in submissions:
+                    norm_id = normalize_id(submission["task_id"])
+                    if not self._conn.execute("SELECT 1 FROM tasks WHERE task_id = ?", (norm_id,)).fetchone():
+                        raise KeyError(f"Task ID {submission['task_id']} not found")
+                    self._store_result(norm_id, submission["tester_name"], submission["test_result"],
+                                       submission.get("comment"), submission["timestamp"],
+                                       submission.get("screenshots") or [])
+                self._bump_version()
+            # Still under the lock: nothing reads the new version before its history is recorded
+            _record_history(self.db_path, submissions)
+            return self.version()
+
+    def history(self):
+        """Result history of this database, reconciled with the current results"""
+        return get_history(self.db_path).synced(self.version(), self.results_frame)
+
+    def import_workbook(self, content, only_newer=False):
+        """Load tasks/results from workbook bytes; with `only_newer`, keep local results that are newer"""
+        wb = openpyxl.load_workbook(io.BytesIO(content))
+        ranges = {}
+        imported = 0
+        with self._lock, self._conn:
+            next_position = self._conn.execute("SELECT COALESCE(MAX(position), -1) + 1 FROM tasks").fetchone()[0]
+            for values in wb["Sheet1"].iter_rows(min_row=2, max_col=7, values_only=True):
+                if values[0] is None:
+                    continue
+                raw_id = str(float(values[0])) if isinstance(values[0], (int, float)) else str(values[0]).strip()
+                norm_id = normalize_id(values[0])
+                inserted = self._conn.execute(
+                    "INSERT OR IGNORE INTO tasks (task_id, raw_id, position, task_name, navigation, parameters, "
+                    "tester_name) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (norm_id, raw_id, next_position, *(_text(v) for v in values[1:5]))).rowcount
+                next_position += inserted
+                tester_name, test_result, timestamp = values[4], values[5], _text(values[6])
+                if test_result is None and timestamp is None:
+                    continue
+                if only_newer:
+                    local = self._conn.execute("SELECT tester_name, test_result, timestamp FROM results "
+                                               "WHERE task_id = ?", (norm_id,)).fetchone()
+                    if local and local[2] and not _is_newer((tester_name, test_result, timestamp), local):
+                        continue
+                comment, screenshots = self._read_block(wb, ranges, values[0], norm_id)
+                self._conn.execute("DELETE FROM screenshots WHERE task_id = ?", (norm_id,))
+                self._store_result(norm_id, _text(tester_name), _text(test_result), comment, timestamp, screenshots)
+                imported += 1
+            if imported:
+                self._bump_version()
+        return imported
+
+    def _read_block(self, wb, ranges, task_id, norm_id):
+        sheet_name = f"Task ID {str(task_id).split('.')[0]}"
+        if sheet_name not in wb.sheetnames:
+            return None, []
+        ws = wb[sheet_name]
+        if sheet_name not in ranges:
+            ranges[sheet_name] = _block_ranges(ws)
+        matches = [(first, last) for key, (first, last) in ranges[sheet_name].items()
+                   if normalize_id(str(key[1]).replace("Task ", "", 1)) == norm_id]
+        if not matches:
+            return None, []
+        first, last = max(matches)
+        comment = None
+        for label, value in ws.iter_rows(min_row=first, max_row=last, max_col=2, values_only=True):
+            if label == "Comment":
+                comment = value
+        # Full images linked from the blob store win over an embedded thumbnail on the same row
+        shots = {img.anchor._from.row + 1: img.ref.getvalue() for img in ws._images
+                 if first <= img.anchor._from.row + 1 <= last}
+        for row in ws.iter_rows(min_row=first, max_row=last, min_col=2, max_col=2):
+            target = row[0].hyperlink.target if row[0].hyperlink is not None else None
+            if target and target.startswith(f"{blobstore.BLOB_DIR}/"):
+                data = self.blob_store.get(target.split("/", 1)[1])
+                if data is not None:
+                    shots[row[0].row] = data
+        return comment, [shots[row] for row in sorted(shots)]
+
+    def _screenshots_for(self, norm_id):
+        rows = self._conn.execute(
+            "SELECT b.digest, b.data, b.format FROM screenshots s JOIN blobs b ON b.digest = s.digest "
+            "WHERE s.task_id = ? ORDER BY s.position", (norm_id,)).fetchall()
+        return [ProcessedScreenshot(digest, data, fmt, None, None) for digest, data, fmt in rows]
+
+    def export_workbook(self):
+        """Build today's Excel layout (Sheet1, "Task ID N" sheets, Summary with charts) as a write-only workbook.
+
+        Rows are streamed into the sheets as they are read from the database, so
+        only the images (written out on save) are held in memory.
+        """
+        wb = openpyxl.Workbook(write_only=True)
+        main_ws = wb.create_sheet("Sheet1")
+        main_ws.append(SHEET1_COLUMNS)
+        with self._lock:
+            sheet1_rows = []
+            for raw_id, task_name, navigation, parameters, tester_name, test_result, timestamp in self._conn.execute(
+                    "SELECT t.raw_id, t.task_name, t.navigation, t.parameters, COALESCE(r.tester_name, t.tester_name), "
+                    "r.test_result, r.timestamp FROM tasks t "
+                    "LEFT JOIN results r ON r.task_id = t.task_id AND r.test_result IS NOT NULL "
+                    "ORDER BY t.position"):
+                values = (sheet_task_id(raw_id), task_name, navigation, parameters, tester_name, test_result, timestamp)
+                sheet1_rows.append(values)
+                if test_result is None:
+                    main_ws.append(values)
+                    continue
+                fill_color = RESULT_FILLS.get(test_result, "FFFFFF")
+                result = WriteOnlyCell(main_ws, value=test_result)
+                result.fill = PatternFill(start_color=fill_color, end_color=fill_color, fill_type="solid")
+                main_ws.append(values[:5] + (result, timestamp))
+
+            results = self._conn.execute(
+                "SELECT t.task_id, t.raw_id, t.navigation, r.tester_name, r.test_result, r.comment, r.timestamp, "
+                "(SELECT COUNT(*) FROM screenshots s WHERE s.task_id = t.task_id) "
+                "FROM results r CROSS JOIN tasks t ON t.task_id = r.task_id "
+                "WHERE r.test_result IS NOT NULL ORDER BY r.timestamp, t.position").fetchall()
+            with_images = {f"Task ID {raw_id.split('.')[0]}" for _, raw_id, *_, count in results if count}
+            sheets, next_rows = {}, {}
+            for norm_id, raw_id, navigation, tester_name, test_result, comment, timestamp, count in results:
+                sheet_name = f"Task ID {raw_id.split('.')[0]}"
+                ws = sheets.get(sheet_name)
+                if ws is None:
+                    ws = sheets[sheet_name] = wb.create_sheet(sheet_name)
+                    if sheet_name in with_images:
+                        ws.column_dimensions["A"].width = 60
+                    if SUMMARY_SHEET not in wb.sheetnames:
+                        # Where apply_submission's Summary ends up: right after the first task sheet
+                        summary_ws = wb.create_sheet(SUMMARY_SHEET)
+                    next_rows[sheet_name] = 1
+                elif next_rows[sheet_name] > 1:
+                    ws.append([])
+                    next_rows[sheet_name] += 1
+                label = "Task" if "." not in raw_id else "Subtask"
+                next_rows[sheet_name] = append_block(
+                    ws, next_rows[sheet_name], label, f"Task {raw_id}", navigation, tester_name, timestamp,
+                    test_result, comment, self._screenshots_for(norm_id) if count else [], blob_store=self.blob_store)
+            if results:
+                last = results[-1]
+                write_summary_sheet(summary_ws, sheet1_rows, last[1], last[3])
+        return wb
+
+    def export_bytes(self):
+        with span("export"):
+            wb = self.export_workbook()
+        bio = io.BytesIO()
+        with span("serialize"):
+            write_workbook(wb, bio)
+        return bio.getvalue()
+
+    def merge_remote(self, content):
+        self.import_workbook(content, only_newer=True)
+
+
+_storages = {}
+_storages_lock = threading.Lock()
+
+
+def get_storage(excel_path, backend=None, db_path=None):
+    """Process-wide storage for a workbook: the Excel file itself or a SQLite database
+    (`db_path`, default SQLITE_PATH) seeded from it"""
+    backend = backend or STORAGE_BACKEND
+    with _storages_lock:
+        key = (backend, excel_path)
+        if key not in _storages:
+            if backend == "sqlite":
+                _storages[key] = SQLiteStorage(db_path or SQLITE_PATH, seed_excel=excel_path)
+            else:
+                _storages[key] = ExcelStorage(excel_path)
+        return _storages[key]
@@ -0,0 +1,302 @@
+import weakref
+from collections import Counter
+from datetime import date, datetime
+
+import pandas as pd
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font, PatternFill
+from openpyxl.chart import PieChart, LineChart, BarChart, Reference
+from openpyxl.chart.label import DataLabelList
+
+SUMMARY_SHEET = "Summary"
+RESULTS = ("Pass", "Fail", "Hold")
+PROGRESS_ROW = 12
+DATE_HEADER_ROW = 19
+TESTER_HEADER_ROW = 39
+PROGRESS_FILL = "ADD8E6"
+# Chart anchors and (anchor, title, y axis title, x axis title) of the two series charts
+PIE_ANCHOR = "D2"
+LINE_CHART = ("D18", "Task Completion Over Time", "Tasks Completed", "Date")
+BAR_CHART = ("D35", "Tasks Completed Per Tester", "Task Count", "Tester")
+
+
+def _date_key(timestamp):
+    """Date string used by the per-day histogram, or None if the timestamp is missing/invalid"""
+    if timestamp is None or timestamp == "":
+        return None
+    if isinstance(timestamp, datetime):
+        return str(timestamp.date())
+    if isinstance(timestamp, date):
+        return str(timestamp)
+    try:
+        return str(datetime.fromisoformat(str(timestamp)).date())
+    except ValueError:
+        parsed = pd.to_datetime(timestamp, errors="coerce")
+        return None if pd.isna(parsed) else str(parsed.date())
+
+
+def _decrement(counter, key):
+    counter[key] -= 1
+    if counter[key] <= 0:
+        del counter[key]
+
+
+class SummaryEngine:
+    """Running counters behind the Summary sheet.
+
+    `apply()` folds in the change of a single Sheet1 row and rewrites only the
+    Summary cells and chart ranges that differ; `recompute()` rescans Sheet1
+    and rebuilds the sheet and its charts from scratch.
+    """
+
+    def __init__(self, wb, rows=None):
+        self.wb = wb
+        self.total_tasks = 0
+        self.result_counts = Counter()
+        self.daily = Counter()
+        self.testers = Counter()
+        self._tester_order = {}
+        self._charts = {}
+        self._rescan(rows)
+
+    def _rescan(self, rows=None):
+        """Count Sheet1 rows (or the given Sheet1-shaped value tuples)"""
+        self.total_tasks = 0
+        self.result_counts.clear()
+        self.daily.clear()
+        self.testers.clear()
+        self._tester_order.clear()
+        if rows is None:
+            rows = self.wb["Sheet1"].iter_rows(min_row=2, max_col=7, values_only=True)
+        for values in rows:
+            self.total_tasks += 1
+            self._count(values[4], values[5], values[6], +1)
+
+    def _count(self, tester, result, timestamp, sign):
+        if result in RESULTS:
+            if sign > 0:
+                self.result_counts[result] += 1
+            else:
+                _decrement(self.result_counts, result)
+        day = _date_key(timestamp)
+        if day is not None:
+            if sign > 0:
+                self.daily[day] += 1
+            else:
+                _decrement(self.daily, day)
+        if result is not None and tester is not None:
+            if sign > 0:
+                self._tester_order.setdefault(tester, len(self._tester_order))
+                self.testers[tester] += 1
+            else:
+                _decrement(self.testers, tester)
+
+    @property
+    def summary_ws(self):
+        if SUMMARY_SHEET not in self.wb.sheetnames:
+            self.wb.create_sheet(SUMMARY_SHEET)
+        return self.wb[SUMMARY_SHEET]
+
+    def apply(self, old, new, task_id, tester_name):
+        """Apply one Sheet1 row change; `old`/`new` are (tester, result, timestamp) tuples"""
+        self.apply_changes([(old, new)], task_id, tester_name)
+
+    def apply_changes(self, changes, task_id, tester_name, added_rows=0):
+        """Apply several (old, new) row changes and render the Summary once"""
+        self.total_tasks += added_rows
+        for old, new in changes:
+            self._count(*old, -1)
+            self._count(*new, +1)
+        self._render(task_id, tester_name)
+
+    def recompute(self, task_id, tester_name):
+        """Full rebuild from Sheet1, for consistency checks or a damaged Summary sheet"""
+        self._rescan()
+        ws = self.summary_ws
+        while ws._charts:
+            ws._charts.pop()
+        self._charts.clear()
+        self._render(task_id, tester_name)
+
+    def _set(self, ws, row, column, value, bold=False):
+        cell = ws.cell(row=row, column=column)
+        if cell.value != value:
+            cell.value = value
+            if bold:
+                cell.font = Font(bold=True)
+
+    def _write_table(self, ws, header_row, header, items, stop_row=None):
+        self._set(ws, header_row, 1, header, bold=True)
+        self._set(ws, header_row, 2, "Test Count", bold=True)
+        row = header_row + 1
+        for label, count in items:
+            self._set(ws, row, 1, label)
+            self._set(ws, row, 2, count)
+            row += 1
+        # Clear rows left over from a longer previous table
+        while (stop_row is None or row < stop_row) and ws.cell(row=row, column=1).value not in (None, ""):
+            ws.cell(row=row, column=1).value = None
+            ws.cell(row=row, column=2).value = None
+            row += 1
+
+    def layout(self, task_id, tester_name):
+        """Contents of the Summary sheet: (summary rows, progress text, date items, tester items)"""
+        total_tasks = self.total_tasks
+        pass_count, fail_count, hold_count = (self.result_counts[r] for r in RESULTS)
+        pass_rate = f"{(pass_count / total_tasks * 100):.2f}%" if total_tasks else "0%"
+
+        summary_data = [
+            ("Total Tasks", total_tasks),
+            ("Pass", pass_count),
+            ("Fail", fail_count),
+            ("Hold", hold_count),
+            ("Pass Rate", pass_rate),
+            ("Last Updated Task ID", task_id),
+            ("Last Updated By", tester_name),
+            ("Last Updated On", datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+        ]
+
+        percent_complete = (pass_count + fail_count + hold_count) / total_tasks if total_tasks else 0
+        progress_bar = int(percent_complete * 20) * "█" + (20 - int(percent_complete * 20)) * "-"
+        progress = f"[{progress_bar}] {int(percent_complete * 100)}%"
+
+        date_items = sorted(self.daily.items())
+        tester_items = sorted(self.testers.items(), key=lambda item: (-item[1], self._tester_order[item[0]]))
+        return summary_data, progress, date_items, tester_items
+
+    def _render(self, task_id, tester_name):
+        ws = self.summary_ws
+        summary_data, progress, date_items, tester_items = self.layout(task_id, tester_name)
+        for i, (label, value) in enumerate(summary_data, start=1):
+            self._set(ws, i, 1, label, bold=True)
+            self._set(ws, i, 2, value)
+
+        self._set(ws, PROGRESS_ROW, 1, "Progress")
+        self._set(ws, PROGRESS_ROW, 2, progress)
+        ws.cell(row=PROGRESS_ROW, column=2).fill = PatternFill(start_color=PROGRESS_FILL, end_color=PROGRESS_FILL,
+                                                               fill_type="solid")
+
+        self._write_table(ws, DATE_HEADER_ROW, "Date", date_items, stop_row=TESTER_HEADER_ROW)
+        self._write_table(ws, TESTER_HEADER_ROW, "Tester Name", tester_items)
+
+        self._update_charts(ws, len(date_items), len(tester_items))
+
+    def _find_chart(self, ws, kind):
+        chart = self._charts.get(kind)
+        if chart is None or chart not in ws._charts:
+            chart = next((c for c in ws._charts if isinstance(c, kind)), None)
+            if chart is not None:
+                self._charts[kind] = chart
+        return chart
+
+    def _update_charts(self, ws, n_dates, n_testers):
+        if self._find_chart(ws, PieChart) is None:
+            pie_chart = _pie_chart(ws)
+            ws.add_chart(pie_chart, PIE_ANCHOR)
+            self._charts[PieChart] = pie_chart
+
+        self._update_series_chart(ws, LineChart, DATE_HEADER_ROW, n_dates, *LINE_CHART)
+        self._update_series_chart(ws, BarChart, TESTER_HEADER_ROW, n_testers, *BAR_CHART)
+
+    def _update_series_chart(self, ws, kind, header_row, n_rows, anchor, title, y_title, x_title):
+        values = Reference(ws, min_col=2, min_row=header_row + 1, max_row=header_row + n_rows)
+        categories = Reference(ws, min_col=1, min_row=header_row + 1, max_row=header_row + n_rows)
+        chart = self._find_chart(ws, kind)
+        if chart is not None and chart.series and chart.series[0].cat is not None:
+            # Only the range of the existing series changes
+            series = chart.series[0]
+            if series.val.numRef.f != str(values):
+                series.val.numRef.f = str(values)
+                (series.cat.numRef or series.cat.strRef).f = str(categories)
+            return
+        if chart is not None:
+            ws._charts.remove(chart)
+        chart = _series_chart(ws, kind, header_row, n_rows, title, y_title, x_title)
+        ws.add_chart(chart, anchor)
+        self._charts[kind] = chart
+
+
+def _pie_chart(ws):
+    labels = Reference(ws, min_col=1, min_row=2, max_row=4)
+    data = Reference(ws, min_col=2, min_row=2, max_row=4)
+    pie_chart = PieChart()
+    pie_chart.title = "Test Result Summary"
+    pie_chart.add_data(data, titles_from_data=False)
+    pie_chart.set_categories(labels)
+    pie_chart.dataLabels = DataLabelList()
+    pie_chart.dataLabels.showVal = True
+    return pie_chart
+
+
+def _series_chart(ws, kind, header_row, n_rows, title, y_title, x_title):
+    data = Reference(ws, min_col=2, min_row=header_row, max_row=header_row + n_rows)
+    categories = Reference(ws, min_col=1, min_row=header_row + 1, max_row=header_row + n_rows)
+    chart = kind()
+    chart.title = title
+    chart.y_axis.title = y_title
+    chart.x_axis.title = x_title
+    chart.add_data(data, titles_from_data=True)
+    chart.set_categories(categories)
+    return chart
+
+
+def write_summary_sheet(ws, rows, task_id, tester_name):
+    """Write a complete Summary sheet for Sheet1-shaped `rows` into an empty (e.g. write-only) worksheet.
+
+    Same layout as SummaryEngine, but appended top to bottom; a date table
+    longer than the space above the tester table is cut off there.
+    """
+    summary_data, progress, date_items, tester_items = SummaryEngine(None, rows).layout(task_id, tester_name)
+    bold = Font(bold=True)
+
+    def cell(value, font=None, fill=None):
+        c = WriteOnlyCell(ws, value=value)
+        if font:
+            c.font = font
+        if fill:
+            c.fill = fill
+        return c
+
+    row = 0
+
+    def append(values=()):
+        nonlocal row
+        ws.append(list(values))
+        row += 1
+
+    for label, value in summary_data:
+        append([cell(label, bold), value])
+    while row < PROGRESS_ROW - 1:
+        append()
+    append(["Progress", cell(progress, fill=PatternFill(start_color=PROGRESS_FILL, end_color=PROGRESS_FILL,
+                                                        fill_type="solid"))])
+    while row < DATE_HEADER_ROW - 1:
+        append()
+    append([cell("Date", bold), cell("Test Count", bold)])
+    date_items = date_items[:TESTER_HEADER_ROW - DATE_HEADER_ROW - 1]
+    for label, count in date_items:
+        append([label, count])
+    while row < TESTER_HEADER_ROW - 1:
+        append()
+    append([cell("Tester Name", bold), cell("Test Count", bold)])
+    for label, count in tester_items:
+        append([label, count])
+
+    ws.add_chart(_pie_chart(ws), PIE_ANCHOR)
+    ws.add_chart(_series_chart(ws, LineChart, DATE_HEADER_ROW, len(date_items), *LINE_CHART[1:]), LINE_CHART[0])
+    ws.add_chart(_series_chart(ws, BarChart, TESTER_HEADER_ROW, len(tester_items), *BAR_CHART[1:]), BAR_CHART[0])
+
+
+_engines = weakref.WeakKeyDictionary()
+
+
+def get_summary_engine(wb):
+    engine = _engines.get(wb)
+    if engine is None:
+        engine = _engines[wb] = SummaryEngine(wb)
+    return engine
+
+
+def update_summary_sheet(wb, task_id, tester_name):
+    """Rebuild the Summary sheet (counts, tables and charts) from Sheet1"""
+    get_summary_engine(wb).recompute(task_id, tester_name)
@@ -0,0 +1,97 @@
+import copy
+
+import pandas as pd
+
+from utils import normalize_id, normalize_ids
+
+COMPLETED = "completed"
+AVAILABLE = "available"
+LOCKED = "locked"
+
+
+class TaskIndex:
+    """Lookup tables for the Testing App page, built once per workbook version"""
+
+    def __init__(self, df):
+        self.df = df
+        self.normalized = normalize_ids(df["Task ID"])
+
+        # normalized ID -> positional row in df (first occurrence wins)
+        self.row_by_id = {}
+        for pos, norm_id in enumerate(self.normalized):
+            self.row_by_id.setdefault(norm_id, pos)
+
+        self.completed_ids = set(self.normalized[df["Test Result"].notna()])
+
+        self.testers = sorted(df["Tester Name"].dropna().unique())
+        self.tasks_by_tester = {}
+        self.state = {}
+        for tester, tasks in df.groupby("Tester Name", sort=False)["Task ID"]:
+            self._index_tester(tester, tasks)
+
+    def _index_tester(self, tester, tasks):
+        sorted_task_ids = tasks.sort_values().unique().tolist()
+        states = {}
+        prev_done = True
+        for tid in sorted_task_ids:
+            done = normalize_id(tid) in self.completed_ids
+            if done:
+                states[tid] = COMPLETED
+            elif prev_done:
+                states[tid] = AVAILABLE
+            else:
+                states[tid] = LOCKED
+            prev_done = done
+        self.tasks_by_tester[tester] = sorted_task_ids
+        self.state[tester] = states
+
+    def updated(self, old_df, df, positions):
+        """Index for `df`, a new version in which only the result columns of rows `positions` changed.
+
+        Only the testers owning those rows are re-indexed; the instance itself is
+        left untouched for sessions still rendering the previous version.
+        """
+        new = copy.copy(self)
+        new.df = df
+        new.completed_ids = set(self.completed_ids)
+        for pos in positions:
+            norm_id = self.normalized.iat[pos]
+            if pd.notna(df["Test Result"].iat[pos]):
+                new.completed_ids.add(norm_id)
+            elif not df["Test Result"][(self.normalized == norm_id).to_numpy()].notna().any():
+                new.completed_ids.discard(norm_id)
+        testers = set(old_df["Tester Name"].iloc[positions].dropna()) | set(df["Tester Name"].iloc[positions].dropna())
+        new.tasks_by_tester = dict(self.tasks_by_tester)
+        new.state = dict(self.state)
+        names = df["Tester Name"]
+        for tester in testers:
+            tasks = df.loc[names == tester, "Task ID"]
+            if len(tasks):
+                new._index_tester(tester, tasks)
+            else:
+                new.tasks_by_tester.pop(tester, None)
+                new.state.pop(tester, None)
+        new.testers = sorted(names.dropna().unique())
+        return new
+
+    def tasks_for(self, tester):
+        return self.tasks_by_tester.get(tester, [])
+
+    def state_of(self, tester, task_id):
+        return self.state.get(tester, {}).get(task_id, LOCKED)
+
+    def available(self, tester):
+        return [tid for tid in self.tasks_for(tester) if self.state_of(tester, tid) == AVAILABLE]
+
+    def label(self, tester, task_id):
+        state = self.state_of(tester, task_id)
+        if state == COMPLETED:
+            return f"{task_id} ✅ (Completed)"
+        if state == LOCKED:
+            return f"{task_id} 🔒 (Locked)"
+        return task_id
+
+    def row(self, task_id):
+        """Sheet1 row (as a Series) for a Task ID in any format, or None"""
+        pos = self.row_by_id.get(normalize_id(task_id))
+        return None if pos is None else self.df.iloc[pos]
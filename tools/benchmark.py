@@ -0,0 +1,214 @@
+"""Benchmark the app's hot paths on synthetic workbooks.
+
+Each scenario generates a workbook with tools/generate_workbook.py, then
+times (min/median/mean over --repeat runs):
+
+    load_cold / load_warm   load_excel_data with an empty / primed cache
+    load_frame              load_excel_frame (read-only Sheet1 load of the read pages), empty cache
+    task_index              TaskIndex build + available tasks for every tester
+    analytics               AnalyticsAggregates (the Analytics page counts)
+    summary_full            update_summary_sheet (full rebuild)
+    summary_incremental     one SummaryEngine delta
+    save                    wb.save to disk
+    submit / submit_images  save_screenshots_to_excel without / with one screenshot
+    compact                 persist_workbook (folding journaled submissions into the file)
+    sync_upload             SyncWorker upload to a local fake GitHub (tools/fake_github.py)
+
+Results go to a JSON file, so two commits can be compared:
+
+    python tools/benchmark.py --scenarios small,medium --output before.json
+    python tools/benchmark.py --scenarios small,medium --output after.json --compare before.json
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+TOOLS_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(TOOLS_DIR)
+sys.path.insert(0, ROOT)
+sys.path.insert(0, TOOLS_DIR)
+
+from analytics import AnalyticsAggregates  # noqa: E402
+from fake_github import FakeGitHub  # noqa: E402
+from generate_workbook import generate_workbook, synthetic_image  # noqa: E402
+from github_sync import ContentsClient, SyncWorker  # noqa: E402
+from summary import get_summary_engine, update_summary_sheet  # noqa: E402
+from task_index import TaskIndex  # noqa: E402
+from utils import (get_compactor, invalidate_excel_cache, load_excel_data, load_excel_frame,  # noqa: E402
+                   persist_workbook, save_screenshots_to_excel, save_workbook)
+
+SCENARIOS = {
+    "small": dict(tasks=50, subtasks=3, testers=4, results=0.5, screenshots=1),
+    "medium": dict(tasks=500, subtasks=4, testers=10, results=0.6, screenshots=1),
+    "large": dict(tasks=2000, subtasks=4, testers=20, results=0.6, screenshots=1),
+    "text_only": dict(tasks=2000, subtasks=4, testers=20, results=0.6, screenshots=0),
+}
+
+
+def timed(fn, repeat, setup=None):
+    runs = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        started = time.perf_counter()
+        fn()
+        runs.append(time.perf_counter() - started)
+    return {
+        "runs": runs,
+        "min": min(runs),
+        "median": statistics.median(runs),
+        "mean": statistics.fmean(runs),
+    }
+
+
+def run_scenario(name, params, repeat, work_dir):
+    started = time.perf_counter()
+    wb = generate_workbook(**params)
+    path = os.path.join(work_dir, f"{name}.xlsx")
+    wb.save(path)
+    del wb
+    info = {"params": params, "generate_s": time.perf_counter() - started,
+            "workbook_mb": os.path.getsize(path) / 1e6, "results": {}}
+    results = info["results"]
+    # Submissions stay in the journal until the compact benchmark
+    compactor = get_compactor(path)
+    compactor.batch, compactor.interval = 10 ** 9, 10 ** 6
+
+    results["load_cold"] = timed(lambda: load_excel_data(path), repeat, setup=lambda: invalidate_excel_cache(path))
+    results["load_warm"] = timed(lambda: load_excel_data(path), repeat)
+    results["load_frame"] = timed(lambda: load_excel_frame(path), repeat, setup=lambda: invalidate_excel_cache(path))
+    df, wb = load_excel_data(path)
+
+    def task_index():
+        index = TaskIndex(df)
+        for tester in index.testers:
+            index.available(tester)
+    results["task_index"] = timed(task_index, repeat)
+    results["analytics"] = timed(lambda: AnalyticsAggregates(df), repeat)
+
+    results["summary_full"] = timed(lambda: update_summary_sheet(wb, "1.0", "Tester 1"), repeat)
+    engine = get_summary_engine(wb)
+    old, new = ("Tester 1", None, None), ("Tester 1", "Pass", "2025-02-01 10:00:00")
+    flips = iter(range(10 ** 9))
+
+    def summary_incremental():
+        # Alternate between recording and undoing one result so the counts stay valid
+        if next(flips) % 2:
+            engine.apply(new, old, "1.0", "Tester 1")
+        else:
+            engine.apply(old, new, "1.0", "Tester 1")
+    results["summary_incremental"] = timed(summary_incremental, repeat * 2)
+
+    results["save"] = timed(lambda: save_workbook(wb, os.path.join(work_dir, f"{name}_save.xlsx")), repeat)
+
+    pending = iter(df.loc[df["Test Result"].isna(), ["Task ID", "Tester Name"]].itertuples(index=False))
+    image = synthetic_image(random.Random(1))
+
+    def submit(screenshots):
+        task_id, tester = next(pending)
+        save_screenshots_to_excel(path, df, wb, task_id, tester, "Pass", "benchmark", screenshots)
+    results["submit"] = timed(lambda: submit([]), repeat)
+    results["submit_images"] = timed(lambda: submit([image]), repeat)
+    results["compact"] = timed(lambda: persist_workbook(path, load_excel_data(path)[1]), repeat)
+
+    with open(path, "rb") as f:
+        remote = f.read()
+    with FakeGitHub({"main_excel.xlsx": remote}) as fake:
+        client = ContentsClient("token", "owner/repo", base_url=fake.url)
+        worker = SyncWorker(client, path, "main_excel.xlsx", base_backoff=0.05)
+        versions = iter(range(1, 10 ** 9))
+
+        def sync_upload():
+            worker.notify(next(versions))
+            worker.wait_idle(timeout=300)
+        results["sync_upload"] = timed(sync_upload, repeat)
+    return info
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(current, baseline, threshold):
+    """Print median ratios against a baseline run; returns the benchmarks slower than `threshold`"""
+    regressions = []
+    for name, info in current["scenarios"].items():
+        base = baseline.get("scenarios", {}).get(name)
+        if not base:
+            continue
+        print(f"\n{name}: vs {baseline['meta'].get('commit')}")
+        for bench, stats in info["results"].items():
+            if bench not in base["results"]:
+                continue
+            ratio = stats["median"] / max(base["results"][bench]["median"], 1e-9)
+            flag = " ❌" if ratio > threshold else ""
+            print(f"  {bench:20s} {base['results'][bench]['median'] * 1000:10.2f} ms -> "
+                  f"{stats['median'] * 1000:10.2f} ms  x{ratio:.2f}{flag}")
+            if ratio > threshold:
+                regressions.append((name, bench, ratio))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", default="small,medium",
+                        help=f"comma-separated, from: {', '.join(SCENARIOS)} (default: %(default)s)")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", default="benchmark.json", help="where to write the JSON results")
+    parser.add_argument("--compare", metavar="BASELINE", help="JSON from an earlier run to compare against")
+    parser.add_argument("--threshold", type=float, default=1.25,
+                        help="with --compare, exit non-zero if a median is this many times slower")
+    args = parser.parse_args()
+
+    names = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = [name for name in names if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenario(s): {', '.join(unknown)}")
+
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "repeat": args.repeat,
+        },
+        "scenarios": {},
+    }
+    work_dir = tempfile.mkdtemp(prefix="benchmark_")
+    try:
+        for name in names:
+            info = report["scenarios"][name] = run_scenario(name, SCENARIOS[name], args.repeat, work_dir)
+            print(f"{name}: {info['workbook_mb']:.1f} MB workbook")
+            for bench, stats in info["results"].items():
+                print(f"  {bench:20s} median {stats['median'] * 1000:10.2f} ms  min {stats['min'] * 1000:10.2f} ms")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"wrote {args.output}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        if compare(report, baseline, args.threshold):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
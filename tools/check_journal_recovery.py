@@ -0,0 +1,83 @@
+"""Crash-recovery check for the submission journal (journal.py).
+
+A submission is journaled, then the journal gets a torn last line, as after a
+crash in the middle of an append. Two more submissions follow, each from a
+fresh process (a restart), and a last process loads the workbook. It checks:
+
+    - the journal still lists every acknowledged submission, in sequence
+    - loading the workbook replays all of them into Sheet1
+
+    python tools/check_journal_recovery.py
+"""
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+TOOLS_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(TOOLS_DIR)
+sys.path.insert(0, ROOT)
+sys.path.insert(0, TOOLS_DIR)
+
+from generate_workbook import build_sheet1  # noqa: E402
+
+SUBMIT = """
+import sys
+sys.path.insert(0, {root!r})
+from utils import journal_submissions
+journal_submissions({path!r}, [{{"task_id": {task_id!r}, "tester_name": "Recovery", "test_result": "Pass"}}])
+"""
+
+CHECK = """
+import json, sys
+sys.path.insert(0, {root!r})
+from utils import get_journal, load_excel_data, normalize_id
+df, _ = load_excel_data({path!r})
+results = dict(zip(df["Task ID"].map(normalize_id), df["Test Result"]))
+entries = get_journal({path!r}).entries_after(0)
+print(json.dumps({{"seqs": [entry["seq"] for entry in entries],
+                  "results": {{task_id: results.get(normalize_id(task_id)) for task_id in {task_ids!r}}}}}))
+"""
+
+
+def run(code):
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr[-2000:])
+    return result.stdout
+
+
+def main():
+    tmp_dir = tempfile.mkdtemp(prefix="journal_recovery_")
+    try:
+        path = os.path.join(tmp_dir, "main_excel.xlsx")
+        wb = build_sheet1(2, 1, 1)
+        wb.save(path)
+        task_ids = [str(row[0]) for row in wb["Sheet1"].iter_rows(min_row=2, max_row=4, values_only=True)]
+
+        run(SUBMIT.format(root=ROOT, path=path, task_id=task_ids[0]))
+        # The crash: half of the next entry reached the disk, without its newline
+        with open(os.path.join(f"{path}.journal", "journal.jsonl"), "a", encoding="utf-8") as f:
+            f.write('{"seq": 2, "task_id": "torn", "tester_na')
+        for task_id in task_ids[1:]:
+            run(SUBMIT.format(root=ROOT, path=path, task_id=task_id))
+
+        state = json.loads(run(CHECK.format(root=ROOT, path=path, task_ids=task_ids)).splitlines()[-1])
+        problems = []
+        if state["seqs"] != list(range(1, len(task_ids) + 1)):
+            problems.append(f"journal sequence after the torn line: {state['seqs']}")
+        problems += [f"Task {task_id} not replayed (result {result!r})"
+                     for task_id, result in state["results"].items() if result != "Pass"]
+        print(f"journal entries: {state['seqs']}")
+        print(f"problems: {len(problems)}")
+        for problem in problems:
+            print(f"  {problem}")
+        return 1 if problems else 0
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,209 @@
+"""Local stand-in for the GitHub contents API, for exercising the sync code offline.
+
+Supports GET and PUT on /repos/<owner>/<repo>/contents/<path> with the same
+SHA rules as GitHub: a PUT must carry the current blob SHA of an existing file,
+otherwise it is rejected with 409. GET answers with an ETag and honours
+If-None-Match with 304, like the real API. The repository itself (GET
+/repos/<owner>/<repo>) and the Git Data endpoints used for large files (blobs,
+trees, commits, refs) are modelled too: every change is a commit on one
+branch, and a ref update whose parent is not the head is rejected with 422.
+
+    with FakeGitHub() as fake:
+        client = ContentsClient("token", "owner/repo", base_url=fake.url)
+"""
+import base64
+import hashlib
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+
+def blob_sha(content):
+    return hashlib.sha1(b"blob %d\0" % len(content) + content).hexdigest()
+
+
+class FakeGitHub:
+    def __init__(self, files=None, latency=0.0, fail_every=0):
+        self.files = {}
+        self.lock = threading.Lock()
+        self.latency = latency
+        self.fail_every = fail_every
+        self.requests = []
+        self.blobs = {}
+        self.trees = {}
+        self.commits = {}
+        self.head = None
+        for path, content in (files or {}).items():
+            self.files[path] = content
+        self._commit()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _tree(self, snapshot):
+        tree_sha = hashlib.sha1(json.dumps({path: blob_sha(content) for path, content in snapshot.items()},
+                                           sort_keys=True).encode()).hexdigest()
+        self.trees[tree_sha] = snapshot
+        return tree_sha
+
+    def _new_commit(self, tree_sha, parents):
+        sha = hashlib.sha1(f"{parents}:{tree_sha}:{len(self.commits)}".encode()).hexdigest()
+        self.commits[sha] = {"tree": tree_sha, "parents": parents}
+        return sha
+
+    def _move_head(self, sha):
+        self.head = sha
+        self.files = dict(self.trees[self.commits[sha]["tree"]])
+
+    def _commit(self):
+        """Record the current files as a new head commit; call with the lock held (or from __init__)"""
+        self._move_head(self._new_commit(self._tree(dict(self.files)), [self.head] if self.head else []))
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _path(self):
+                parts = urlparse(self.path).path.split("/contents/", 1)
+                return parts[1] if len(parts) == 2 else None
+
+            def _route(self):
+                """Path after /repos/<owner>/<repo> ("" for the repository itself)"""
+                parts = urlparse(self.path).path.split("/", 4)
+                return "/" + parts[4] if len(parts) == 5 else ""
+
+            def _body(self):
+                return json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+
+            def _reply(self, status, body, etag=None):
+                data = json.dumps(body).encode()
+                self.send_response(status)
+                if etag:
+                    self.send_header("ETag", etag)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _maybe_fail(self):
+                with fake.lock:
+                    fake.requests.append((self.command, self.path))
+                    count = len(fake.requests)
+                if fake.latency:
+                    threading.Event().wait(fake.latency)
+                if fake.fail_every and count % fake.fail_every == 0:
+                    self._reply(502, {"message": "Injected failure"})
+                    return True
+                return False
+
+            def do_GET(self):
+                if self._maybe_fail():
+                    return
+                path = self._path()
+                if path is None:
+                    self._git_get(self._route())
+                    return
+                with fake.lock:
+                    content = fake.files.get(path)
+                if content is None:
+                    self._reply(404, {"message": "Not Found"})
+                    return
+                etag = f'"{blob_sha(content)}"'
+                if self.headers.get("If-None-Match") == etag:
+                    self.send_response(304)
+                    self.send_header("ETag", etag)
+                    self.end_headers()
+                    return
+                self._reply(200, {
+                    "path": path,
+                    "sha": blob_sha(content),
+                    "size": len(content),
+                    "encoding": "base64",
+                    "content": base64.b64encode(content).decode(),
+                }, etag=etag)
+
+            def do_PUT(self):
+                if self._maybe_fail():
+                    return
+                path = self._path()
+                body = self._body()
+                content = base64.b64decode(body["content"])
+                with fake.lock:
+                    current = fake.files.get(path)
+                    if current is not None and body.get("sha") != blob_sha(current):
+                        self._reply(409, {"message": f"{path} does not match {body.get('sha')}"})
+                        return
+                    fake.files[path] = content
+                    fake._commit()
+                self._reply(201 if current is None else 200, {"content": {"path": path, "sha": blob_sha(content)}})
+
+            def _git_get(self, route):
+                with fake.lock:
+                    if route == "":
+                        self._reply(200, {"full_name": "owner/repo", "default_branch": "main"})
+                    elif route.startswith("/git/ref/heads/"):
+                        self._reply(200, {"object": {"sha": fake.head, "type": "commit"}})
+                    elif route.startswith("/git/commits/") and route.rsplit("/", 1)[1] in fake.commits:
+                        sha = route.rsplit("/", 1)[1]
+                        self._reply(200, {"sha": sha, "tree": {"sha": fake.commits[sha]["tree"]}})
+                    else:
+                        self._reply(404, {"message": "Not Found"})
+
+            def do_POST(self):
+                if self._maybe_fail():
+                    return
+                route, body = self._route(), self._body()
+                with fake.lock:
+                    if route == "/git/blobs":
+                        content = base64.b64decode(body["content"])
+                        sha = blob_sha(content)
+                        fake.blobs[sha] = content
+                        self._reply(201, {"sha": sha})
+                    elif route == "/git/trees":
+                        snapshot = dict(fake.trees[body["base_tree"]])
+                        for entry in body["tree"]:
+                            snapshot[entry["path"]] = fake.blobs[entry["sha"]]
+                        self._reply(201, {"sha": fake._tree(snapshot)})
+                    elif route == "/git/commits":
+                        self._reply(201, {"sha": fake._new_commit(body["tree"], body["parents"])})
+                    else:
+                        self._reply(404, {"message": "Not Found"})
+
+            def do_PATCH(self):
+                if self._maybe_fail():
+                    return
+                route, body = self._route(), self._body()
+                with fake.lock:
+                    commit = fake.commits.get(body["sha"])
+                    if not route.startswith("/git/refs/heads/") or commit is None:
+                        self._reply(404, {"message": "Not Found"})
+                    elif commit["parents"] != [fake.head] and not body.get("force"):
+                        self._reply(422, {"message": "Update is not a fast forward"})
+                    else:
+                        fake._move_head(body["sha"])
+                        self._reply(200, {"object": {"sha": fake.head, "type": "commit"}})
+
+        return Handler
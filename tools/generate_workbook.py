@@ -0,0 +1,119 @@
+"""Synthetic workbooks in the main_excel.xlsx layout, for benchmarks and load tests.
+
+Sheet1 gets `tasks` main tasks (IDs 1, 2, ...) each followed by `subtasks`
+subtasks (1.1, 1.2, ...), assigned round-robin to `testers` testers. A
+`results` fraction of them is then submitted through the app's own
+apply_submissions, so "Task ID N" blocks, embedded screenshots and the
+Summary sheet look exactly like ones written by the app. Output is
+deterministic for a given --seed.
+
+    python tools/generate_workbook.py /tmp/big.xlsx --tasks 500 --subtasks 4 --testers 10 --results 0.6 --screenshots 1
+"""
+import argparse
+import io
+import os
+import random
+import sys
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import openpyxl  # noqa: E402
+from PIL import Image, ImageDraw  # noqa: E402
+
+from utils import apply_submissions  # noqa: E402
+
+HEADERS = ["Task ID", "Task Name", "Navigation", "Parameters", "Tester Name", "Test Result", "Timestamp"]
+RESULT_WEIGHTS = {"Pass": 0.7, "Fail": 0.2, "Hold": 0.1}
+# Subtask IDs are decimals (1.1 .. 1.9), as in the real sheet
+MAX_SUBTASKS = 9
+
+
+def synthetic_image(rng, size=(1280, 800)):
+    """PNG bytes of a screenshot-like image: flat UI panels, text-ish lines and a photo-like area"""
+    width, height = size
+    img = Image.new("RGB", size, "white")
+    draw = ImageDraw.Draw(img)
+    draw.rectangle([0, 0, width, 60], fill=(rng.randrange(256), rng.randrange(256), rng.randrange(256)))
+    for _ in range(12):
+        x, y = rng.randrange(width - 200), rng.randrange(80, height - 100)
+        draw.rectangle([x, y, x + rng.randrange(80, 200), y + rng.randrange(30, 100)],
+                       outline=(90, 90, 90), fill=(rng.randrange(200, 256),) * 3)
+    for row in range(80, height, 24):
+        draw.line([40, row, 40 + rng.randrange(100, width - 80), row], fill=(60, 60, 60), width=2)
+    noise = Image.frombytes("RGB", (40, 25), rng.randbytes(40 * 25 * 3)).resize((320, 200), Image.BILINEAR)
+    img.paste(noise, (width - 360, height - 240))
+    bio = io.BytesIO()
+    img.save(bio, format="PNG")
+    return bio.getvalue()
+
+
+def task_ids(tasks, subtasks):
+    for task in range(1, tasks + 1):
+        yield task
+        for sub in range(1, subtasks + 1):
+            yield round(task + sub / 10, 1)
+
+
+def build_sheet1(tasks, subtasks, testers):
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.title = "Sheet1"
+    ws.append(HEADERS)
+    tester_names = [f"Tester {i + 1}" for i in range(testers)]
+    for i, task_id in enumerate(task_ids(tasks, subtasks)):
+        ws.append([task_id, f"Feature {int(task_id)}", f"Home > Module {int(task_id) % 25} > Page {i}",
+                   "User ID, Date range", tester_names[i % testers], None, None])
+    return wb
+
+
+def generate_workbook(tasks=100, subtasks=3, testers=5, results=0.5, screenshots=0, image_pool=8,
+                      seed=0, days=30):
+    """Build the workbook in memory; returns it (not saved)"""
+    if subtasks > MAX_SUBTASKS:
+        raise ValueError(f"at most {MAX_SUBTASKS} subtasks per task (IDs are decimals like 1.9)")
+    rng = random.Random(seed)
+    wb = build_sheet1(tasks, subtasks, testers)
+    rows = list(wb["Sheet1"].iter_rows(min_row=2, max_col=5, values_only=True))
+    images = [synthetic_image(rng) for _ in range(image_pool if screenshots else 0)]
+    start = datetime(2025, 1, 1, 9, 0, 0)
+
+    submissions = []
+    for task_id, _, _, _, tester in rows:
+        if rng.random() >= results:
+            continue
+        timestamp = start + timedelta(days=rng.randrange(days), seconds=rng.randrange(8 * 3600))
+        submissions.append({
+            "task_id": str(float(task_id)),  # as the app passes it (from the DataFrame)
+            "tester_name": tester,
+            "test_result": rng.choices(list(RESULT_WEIGHTS), weights=list(RESULT_WEIGHTS.values()))[0],
+            "comment": rng.choice([None, "Looks good", "Button misaligned on mobile", "Timeout after 30s"]),
+            "screenshots": [rng.choice(images) for _ in range(screenshots)],
+            "timestamp": timestamp.strftime("%Y-%m-%d %H:%M:%S"),
+        })
+    # The app records results in time order
+    submissions.sort(key=lambda submission: submission["timestamp"])
+    apply_submissions(wb, submissions)
+    return wb
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("output", help="path of the .xlsx to write")
+    parser.add_argument("--tasks", type=int, default=100, help="main tasks")
+    parser.add_argument("--subtasks", type=int, default=3, help="subtasks per main task (max 9)")
+    parser.add_argument("--testers", type=int, default=5)
+    parser.add_argument("--results", type=float, default=0.5, help="fraction of tasks that already have a result")
+    parser.add_argument("--screenshots", type=int, default=0, help="screenshots per recorded result")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    wb = generate_workbook(args.tasks, args.subtasks, args.testers, args.results, args.screenshots, seed=args.seed)
+    wb.save(args.output)
+    print(f"wrote {args.output}: {args.tasks * (args.subtasks + 1)} tasks, "
+          f"{os.path.getsize(args.output) / 1e6:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
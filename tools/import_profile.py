@@ -0,0 +1,110 @@
+"""Cold-start profile of the Streamlit app, one fresh interpreter per page.
+
+For each page this reports how long the first script run takes (imports
+included) and which heavy libraries got loaded. Pages listed in
+LAZY_MODULES must not load those modules; the script exits non-zero if one
+does, so it can be run in CI to catch an import creeping back to top level.
+It runs against a temporary copy of main_excel.xlsx and without secrets, so
+nothing syncs to GitHub.
+
+    python tools/import_profile.py
+    python tools/import_profile.py --importtime 15   # also show the slowest imports of the base modules
+"""
+import argparse
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PAGES = ["Testing App", "Excel Sheet", "Analytics"]
+HEAVY_MODULES = ["matplotlib", "seaborn", "requests", "sqlite3"]
+# Modules each page must not import
+LAZY_MODULES = {
+    "Testing App": ["matplotlib", "seaborn", "requests"],
+    "Excel Sheet": ["matplotlib", "seaborn", "requests"],
+}
+
+PAGE_RUN = """
+import json, sys, time
+started = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+imported = time.perf_counter()
+at = AppTest.from_file({main!r}, default_timeout=120)
+at.run()
+first_run = time.perf_counter()
+if {page!r} != "Testing App":
+    at.sidebar.radio[0].set_value({page!r}).run()
+done = time.perf_counter()
+print(json.dumps({{
+    "streamlit_import_s": imported - started,
+    "first_run_s": first_run - imported,
+    "page_run_s": done - first_run,
+    "errors": [str(e.value) for e in at.exception],
+    "loaded": [m for m in {heavy!r} if m in sys.modules],
+}}))
+"""
+
+
+def profile_page(page, work_dir):
+    code = PAGE_RUN.format(main=os.path.join(ROOT, "main.py"), page=page, heavy=HEAVY_MODULES)
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    result = subprocess.run([sys.executable, "-c", code], cwd=work_dir, env=env, capture_output=True, text=True)
+    lines = [line for line in result.stdout.splitlines() if line.startswith("{")]
+    if result.returncode != 0 or not lines:
+        raise RuntimeError(f"profiling {page!r} failed:\n{result.stderr[-2000:]}")
+    return json.loads(lines[-1])
+
+
+def base_importtime(top):
+    """Slowest imports (cumulative) when loading the modules every page needs"""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import utils, storage, task_index"],
+                            cwd=ROOT, capture_output=True, text=True)
+    rows = []
+    for line in result.stderr.splitlines():
+        # The snippet's own imports and what they import directly (deeper levels are indented further)
+        match = re.match(r"import time:\s+\d+ \|\s+(\d+) \|( | {3})(\S.*)", line)
+        if match:
+            rows.append((int(match.group(1)), match.group(2)[1:] + match.group(3)))
+    return [(name, cumulative / 1e6) for cumulative, name in sorted(rows, reverse=True)[:top]]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--importtime", type=int, default=0, metavar="N",
+                        help="also list the N slowest top-level imports of the base modules")
+    parser.add_argument("--json", action="store_true", help="print the results as JSON")
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix="import_profile_")
+    shutil.copy(os.path.join(ROOT, "main_excel.xlsx"), work_dir)
+    try:
+        results = {page: profile_page(page, work_dir) for page in PAGES}
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    violations = [(page, module) for page, modules in LAZY_MODULES.items()
+                  for module in modules if module in results[page]["loaded"]]
+    if args.json:
+        print(json.dumps({"pages": results, "violations": violations}, indent=2))
+    else:
+        for page, result in results.items():
+            print(f"{page:12s} streamlit import {result['streamlit_import_s']:.2f}s  "
+                  f"first run {result['first_run_s']:.2f}s  page run {result['page_run_s']:.2f}s  "
+                  f"loaded: {', '.join(result['loaded']) or '-'}")
+            for error in result["errors"]:
+                print(f"{'':12s} error: {error}")
+        for page, module in violations:
+            print(f"❌ {page} imports {module}")
+    if args.importtime:
+        print("slowest imports of utils/storage/task_index:")
+        for name, seconds in base_importtime(args.importtime):
+            print(f"  {seconds:6.3f}s  {name}")
+    return 1 if violations or any(r["errors"] for r in results.values()) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,188 @@
+"""Concurrency test for the single-writer submission queue (writer.py).
+
+Many simulated sessions (one per tester) submit results at the same time to
+one storage, each through `storage.submit` as the app does. Every session
+submits each of its own tasks once (a resubmission continues the task's block
+in place, which this harness does not exercise). Afterwards it checks:
+
+    - every submission was acknowledged, and a session's acks (data versions) never go back
+    - Sheet1 holds each task's last submitted result
+    - each submitted task has exactly one block in its "Task ID N" sheet
+    - the Summary counts and tables equal a full recompute from Sheet1
+
+With --direct each session writes its own submissions (one journal fsync /
+transaction each, serialized only by the storage locks), for comparison.
+
+    python tools/stress_submit.py --sessions 16 --submissions 10
+    python tools/stress_submit.py --backend sqlite --sessions 32 --screenshots 1
+    python tools/stress_submit.py --sessions 16 --direct
+"""
+import argparse
+import io
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+
+TOOLS_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(TOOLS_DIR)
+sys.path.insert(0, ROOT)
+sys.path.insert(0, TOOLS_DIR)
+
+import openpyxl  # noqa: E402
+
+from generate_workbook import build_sheet1, synthetic_image  # noqa: E402
+import storage as storage_module  # noqa: E402
+from summary import DATE_HEADER_ROW, TESTER_HEADER_ROW, PROGRESS_ROW, SummaryEngine  # noqa: E402
+from utils import get_compactor, journal_submissions, normalize_id  # noqa: E402
+
+SUBTASKS = 3
+RESULTS = ["Pass", "Fail", "Hold"]
+
+
+def plan(sessions, submissions, rng):
+    """Per session: its tester and the (task_id, result) submissions it makes"""
+    tasks = -(-sessions * submissions // (SUBTASKS + 1))
+    wb = build_sheet1(tasks, SUBTASKS, sessions)
+    owned = {}
+    for row in wb["Sheet1"].iter_rows(min_row=2, max_col=5, values_only=True):
+        owned.setdefault(row[4], []).append(row[0])
+    work = {tester: [(task_id, rng.choice(RESULTS)) for task_id in task_ids[:submissions]]
+            for tester, task_ids in owned.items()}
+    return wb, work
+
+
+def summary_cells(ws):
+    rows = [(ws.cell(row=r, column=1).value, ws.cell(row=r, column=2).value) for r in range(1, 6)]
+    rows.append(ws.cell(row=PROGRESS_ROW, column=2).value)
+
+    def table(header_row, stop_row=None):
+        items, row = [], header_row + 1
+        while (stop_row is None or row < stop_row) and ws.cell(row=row, column=1).value not in (None, ""):
+            items.append((ws.cell(row=row, column=1).value, ws.cell(row=row, column=2).value))
+            row += 1
+        return items
+    return rows, table(DATE_HEADER_ROW, TESTER_HEADER_ROW), table(TESTER_HEADER_ROW)
+
+
+def check_workbook(wb, work):
+    """Problems found in the final workbook, as strings"""
+    problems = []
+    expected = {}
+    for tester, submissions in work.items():
+        for task_id, result in submissions:
+            expected[normalize_id(task_id)] = (tester, result)
+
+    recorded = {normalize_id(row[0]): (row[4], row[5])
+                for row in wb["Sheet1"].iter_rows(min_row=2, max_col=7, values_only=True) if row[5] is not None}
+    for task_id, value in expected.items():
+        if recorded.get(task_id) != value:
+            problems.append(f"Sheet1 {task_id}: {recorded.get(task_id)} != {value}")
+    blocks = Counter()
+    for ws in wb.worksheets:
+        if ws.title.startswith("Task ID "):
+            for label, text in ws.iter_rows(max_col=2, values_only=True):
+                if label in ("Task", "Subtask") and str(text).startswith("Task "):
+                    blocks[normalize_id(str(text)[len("Task "):])] += 1
+    for task_id in expected:
+        if blocks[task_id] != 1:
+            problems.append(f"Task {task_id}: {blocks[task_id]} blocks")
+
+    # The Summary as written incrementally must match a rescan of Sheet1 (the "Last Updated" rows aside)
+    engine = SummaryEngine(wb)
+    summary_data, progress, date_items, tester_items = engine.layout(None, None)
+    rows, dates, testers = summary_cells(wb["Summary"])
+    if rows[:5] != summary_data[:5] or rows[5] != progress:
+        problems.append(f"Summary counts {rows} != {summary_data[:5] + [progress]}")
+    if dates != [tuple(item) for item in date_items]:
+        problems.append(f"Summary dates {dates} != {date_items}")
+    if sorted(testers) != sorted(tester_items):
+        problems.append(f"Summary testers {testers} != {tester_items}")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backend", choices=["excel", "sqlite"], default="excel")
+    parser.add_argument("--sessions", type=int, default=16, help="concurrent sessions (one tester each)")
+    parser.add_argument("--submissions", type=int, default=10, help="submissions per session")
+    parser.add_argument("--screenshots", type=int, default=0, help="screenshots per submission")
+    parser.add_argument("--direct", action="store_true", help="bypass the queue: each session writes itself")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    wb, work = plan(args.sessions, args.submissions, rng)
+    images = [synthetic_image(rng, size=(640, 400)) for _ in range(min(args.screenshots, 4))]
+    tmp_dir = tempfile.mkdtemp(prefix="stress_submit_")
+    try:
+        path = os.path.join(tmp_dir, "main_excel.xlsx")
+        wb.save(path)
+        storage = storage_module.get_storage(path, backend=args.backend, db_path=os.path.join(tmp_dir, "testing.db"))
+        storage.load()
+
+        def write(submission):
+            if not args.direct:
+                return storage.submit(**submission)
+            if storage.name == "excel":
+                return journal_submissions(path, [submission])
+            return storage.submit_many([submission])
+
+        acks = {}
+        errors = []
+        barrier = threading.Barrier(len(work))
+
+        def session(tester, submissions):
+            barrier.wait()
+            versions = acks[tester] = []
+            for task_id, result in submissions:
+                try:
+                    versions.append(write({"task_id": task_id, "tester_name": tester, "test_result": result,
+                                           "comment": f"{tester}: {result}", "screenshots": images}))
+                except Exception as e:
+                    errors.append(f"{tester} {task_id}: {e!r}")
+
+        threads = [threading.Thread(target=session, args=item) for item in work.items()]
+        started = time.time()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        submit_time = time.time() - started
+
+        problems = list(errors)
+        total = sum(len(submissions) for submissions in work.values())
+        for tester, versions in acks.items():
+            if len(versions) != len(work[tester]):
+                problems.append(f"{tester}: {len(versions)} acks for {len(work[tester])} submissions")
+            if versions != sorted(versions):
+                problems.append(f"{tester}: acks went back: {versions}")
+
+        if storage.name == "excel":
+            get_compactor(path).compact_now()
+            final = openpyxl.load_workbook(path)
+        else:
+            final = openpyxl.load_workbook(io.BytesIO(storage.export_bytes()))
+        problems += check_workbook(final, work)
+
+        writer = storage.writer.status()
+        print(f"backend={storage.name} sessions={len(work)} submissions={total} screenshots={args.screenshots} "
+              f"mode={'direct' if args.direct else 'queue'}")
+        print(f"submit phase: {submit_time:.2f}s ({total / submit_time:.1f} submissions/s), "
+              f"distinct versions acked: {len({v for versions in acks.values() for v in versions})}")
+        if not args.direct:
+            print(f"writer batches: {writer['batches']} (mean {writer['mean_batch']:.1f} submissions per batch)")
+        print(f"problems: {len(problems)}")
+        for problem in problems[:20]:
+            print(f"  {problem}")
+        return 1 if problems else 0
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
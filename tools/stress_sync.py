@@ -0,0 +1,121 @@
+"""Multi-session stress test for the GitHub sync merge path.
+
+Simulates several app instances (each with its own local copy of the
+workbook, submission journal and SyncWorker) whose sessions submit results concurrently
+to one shared remote, served by tools/fake_github.py. At the end the remote
+workbook must contain every submitted result (no lost updates).
+
+    python tools/stress_sync.py --instances 4 --sessions 3 --tasks-per-session 10
+"""
+import argparse
+import io
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import openpyxl  # noqa: E402
+
+from fake_github import FakeGitHub  # noqa: E402
+from github_sync import ContentsClient, SyncWorker  # noqa: E402
+from merge import merge_remote_workbook  # noqa: E402
+from utils import (get_compactor, load_excel_data, normalize_id, save_screenshots_to_excel,  # noqa: E402
+                   set_save_listener)
+
+REMOTE_PATH = "main_excel.xlsx"
+HEADERS = ["Task ID", "Task Name", "Navigation", "Parameters", "Tester Name", "Test Result", "Timestamp"]
+
+
+def build_workbook(n_tasks, testers):
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.title = "Sheet1"
+    ws.append(HEADERS)
+    for i in range(n_tasks):
+        task_id = i // 4 + 1 + (i % 4) / 10
+        ws.append([task_id, f"Task {i}", f"Home > Page {i}", "", testers[i % len(testers)], None, None])
+    bio = io.BytesIO()
+    wb.save(bio)
+    return bio.getvalue()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--instances", type=int, default=4)
+    parser.add_argument("--sessions", type=int, default=3, help="concurrent sessions per instance")
+    parser.add_argument("--tasks-per-session", type=int, default=10)
+    parser.add_argument("--latency", type=float, default=0.05, help="fake API latency per request (s)")
+    args = parser.parse_args()
+
+    n_sessions = args.instances * args.sessions
+    n_tasks = n_sessions * args.tasks_per_session
+    testers = [f"Tester {i}" for i in range(n_sessions)]
+    initial = build_workbook(n_tasks, testers)
+
+    tmp_dir = tempfile.mkdtemp(prefix="stress_sync_")
+    fake = FakeGitHub({REMOTE_PATH: initial}, latency=args.latency).start()
+    try:
+        workers = []
+        for i in range(args.instances):
+            path = os.path.join(tmp_dir, f"instance_{i}.xlsx")
+            with open(path, "wb") as f:
+                f.write(initial)
+            client = ContentsClient("token", "owner/repo", base_url=fake.url)
+            worker = SyncWorker(client, path, REMOTE_PATH, base_backoff=0.05, max_backoff=1.0,
+                                merge=lambda content, path=path: merge_remote_workbook(path, content))
+            set_save_listener(path, worker.notify)
+            workers.append((path, worker))
+
+        # Every task is submitted exactly once, by the session owning its tester
+        df, _ = load_excel_data(workers[0][0])
+        task_ids = df["Task ID"].tolist()
+        expected = {}
+
+        def session(path, worker, tester):
+            for tid in task_ids[testers.index(tester)::n_sessions]:
+                df_main, wb = load_excel_data(path)
+                save_screenshots_to_excel(path, df_main, wb, tid, tester, "Pass", "stress", [])
+                expected[normalize_id(tid)] = tester
+
+        threads = []
+        started = time.time()
+        for s in range(n_sessions):
+            path, worker = workers[s % args.instances]
+            threads.append(threading.Thread(target=session, args=(path, worker, testers[s])))
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        submit_time = time.time() - started
+        for path, worker in workers:
+            get_compactor(path).compact_now()
+            worker.wait_idle(timeout=120)
+        total_time = time.time() - started
+
+        remote_wb = openpyxl.load_workbook(io.BytesIO(fake.files[REMOTE_PATH]), read_only=True)
+        recorded = {}
+        for row in remote_wb["Sheet1"].iter_rows(min_row=2, max_col=7, values_only=True):
+            if row[5] is not None:
+                recorded[normalize_id(row[0])] = row[4]
+        lost = sorted(tid for tid, tester in expected.items() if recorded.get(tid) != tester)
+
+        print(f"instances={args.instances} sessions={n_sessions} submissions={len(expected)}")
+        print(f"submit phase: {submit_time:.2f}s ({len(expected) / submit_time:.1f} submissions/s)")
+        print(f"until remote consistent: {total_time:.2f}s")
+        print(f"PUT requests: {sum(1 for method, _ in fake.requests if method == 'PUT')}, "
+              f"merges: {sum(worker.merges for _, worker in workers)}")
+        print(f"lost updates: {len(lost)} {lost[:10]}")
+        return 1 if lost else 0
+    finally:
+        fake.stop()
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
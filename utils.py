@@ -1,82 +1,635 @@
 import os
 import io
-import base64
-import requests
-from datetime import datetime
-from PIL import Image
+import itertools
+import threading
+import weakref
+from datetime import datetime, timezone
+from zipfile import ZIP_DEFLATED, ZipFile
+import numpy as np
 import pandas as pd
-import streamlit as st
 import openpyxl
+from openpyxl.cell import WriteOnlyCell
 from openpyxl.drawing.image import Image as OpenpyxlImage
 from openpyxl.styles import Font, PatternFill
-from openpyxl.chart import PieChart, LineChart, BarChart, Reference
-from openpyxl.chart.label import DataLabelList
+from openpyxl.packaging.custom import IntProperty
+from openpyxl.packaging.relationship import get_rels_path
+from openpyxl.writer.excel import ExcelWriter
+from openpyxl.xml.functions import tostring
+from summary import get_summary_engine
+from screenshots import ProcessedScreenshot, content_hash, make_preview, process_screenshots, read_upload
+from journal import Compactor, SubmissionJournal
+from perf import span, trace
+import blobstore
+from blobstore import get_blob_store
+
+
+_excel_cache = {}
+_excel_cache_lock = threading.Lock()
+_data_versions = itertools.count(1)
+# Workbooks persist_workbook is writing to disk: path -> {"wb", "deferred"}. Submissions journaled
+# meanwhile are kept in "deferred" (shown through the Sheet1 frame only) and applied after the save
+_saving = {}
+
+# Sheet1 columns a submission or merge changes; edits anywhere else rebuild derived data
+RESULT_COLUMNS = ("Tester Name", "Test Result", "Timestamp")
+# Derived data is rebuilt instead of updated when more than this fraction of rows changed
+INCREMENTAL_MAX_FRACTION = 0.2
+
+
+def get_file_version(path):
+    """Cheap signature of the file on disk, used to key the workbook cache"""
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def dataframe_from_sheet(ws):
+    """Build the Sheet1 DataFrame from an already loaded worksheet (same shape as pd.read_excel)"""
+    return _frame_from_rows(list(ws.values))
+
+
+def _frame_from_rows(rows):
+    if not rows:
+        return pd.DataFrame()
+    while len(rows) > 1 and all(value is None for value in rows[-1]):
+        rows.pop()
+    headers = [col if col is not None else f"Unnamed: {i}" for i, col in enumerate(rows[0])]
+    # Read-only loads of files without a stored dimension (e.g. written in write-only mode) end rows early
+    width = len(headers)
+    body = [row if len(row) == width else tuple(row[:width]) + (None,) * (width - len(row)) for row in rows[1:]]
+    df = pd.DataFrame(body, columns=headers).infer_objects()
+    df["Task ID"] = df["Task ID"].astype(str).str.strip()
+    return df
+
+
+class _ReusableBytesIO(io.BytesIO):
+    """Image buffer that survives openpyxl closing it on save, so a cached workbook can be saved again"""
+
+    def close(self):
+        self.seek(0)
+
+
+def _make_images_reusable(wb):
+    for ws in wb.worksheets:
+        for img in ws._images:
+            if not isinstance(img.ref, _ReusableBytesIO) and isinstance(img.ref, io.BytesIO):
+                img.ref = _ReusableBytesIO(img.ref.getvalue())
+
+
+class _SharedMediaWriter(ExcelWriter):
+    """ExcelWriter that stores each distinct image once: every drawing showing the same bytes
+    (e.g. one screenshot submitted for several tasks) points at a single media part"""
+
+    def __init__(self, workbook, archive):
+        super().__init__(workbook, archive)
+        self._media = {}
+
+    def _write_drawing(self, drawing):
+        # ExcelWriter._write_drawing, with images numbered per distinct content
+        self._drawings.append(drawing)
+        drawing._id = len(self._drawings)
+        for chart in drawing.charts:
+            self._charts.append(chart)
+            chart._id = len(self._charts)
+        for img in drawing.images:
+            data = img._data()
+            digest = content_hash(data)
+            if digest not in self._media:
+                self._images.append(img)
+                img._id = len(self._images)
+                self._media[digest] = (img._id, img.path, data)
+            img._id = self._media[digest][0]
+        rels_path = get_rels_path(drawing.path)[1:]
+        self._archive.writestr(drawing.path[1:], tostring(drawing._write()))
+        self._archive.writestr(rels_path, tostring(drawing._write_rels()))
+        self.manifest.append(drawing)
+
+    def _write_images(self):
+        for _, path, data in self._media.values():
+            self._archive.writestr(path[1:], data)
+
+
+def write_workbook(wb, target):
+    """`wb.save(target)` (a path or file object), with identical images stored once"""
+    if wb.write_only and not wb.worksheets:
+        wb.create_sheet()
+    wb.properties.modified = datetime.now(tz=timezone.utc).replace(tzinfo=None)
+    _SharedMediaWriter(wb, ZipFile(target, "w", ZIP_DEFLATED, allowZip64=True)).save()
+
+
+def changed_rows(old_df, df):
+    """Positions of the rows whose result columns differ between two versions of Sheet1.
+
+    None when anything else changed (rows added, removed or reordered, other
+    columns edited), i.e. when derived data has to be rebuilt.
+    """
+    if old_df is None or len(old_df) != len(df) or list(old_df.columns) != list(df.columns):
+        return None
+    differs = np.zeros(len(df), dtype=bool)
+    for column in df.columns:
+        old, new = old_df[column].astype(object), df[column].astype(object)
+        column_differs = ~((old == new) | (old.isna() & new.isna())).to_numpy()
+        if column not in RESULT_COLUMNS and column_differs.any():
+            return None
+        differs |= column_differs
+    return np.flatnonzero(differs)
+
+
+def update_derived(old_df, old_derived, df):
+    """Derived data for a new version `df` of Sheet1, carried over from the previous version.
+
+    Unchanged data keeps everything. Otherwise objects with an
+    `updated(old_df, df, positions)` method are updated for the changed rows
+    only; the rest is rebuilt on next use.
+    """
+    if not old_derived:
+        return {}
+    positions = changed_rows(old_df, df)
+    if positions is None or len(positions) > INCREMENTAL_MAX_FRACTION * len(df):
+        return {}
+    if not len(positions):
+        return dict(old_derived)
+    with span("derived.update", rows=len(positions)):
+        return {name: value.updated(old_df, df, positions)
+                for name, value in old_derived.items() if hasattr(value, "updated")}
+
+
+def _new_entry(path, signature, df, wb, dirty):
+    previous = _excel_cache.get(path)
+    entry = _excel_cache[path] = {
+        "signature": signature,
+        "version": next(_data_versions),
+        "df": df,
+        "wb": wb,
+        "dirty": dirty,
+        "derived": update_derived(previous["df"], previous.get("derived"), df) if previous else {},
+    }
+    return entry
+
+
+def _store_excel_cache(path, wb, signature, dirty):
+    """Cache `wb` as the current data; `dirty` means it holds changes the file on disk does not"""
+    _make_images_reusable(wb)
+    return _new_entry(path, signature, dataframe_from_sheet(wb["Sheet1"]), wb, dirty)
+
+
+def _read_frame(path):
+    """Sheet1 values and the journal checkpoint via a read-only load (no styles, images or other sheets)"""
+    wb = openpyxl.load_workbook(path, read_only=True)
+    try:
+        rows = list(wb["Sheet1"].values)
+        seq = get_journal_seq(wb)
+    finally:
+        wb.close()
+    return rows, seq
+
+
+def load_excel_frame(path):
+    """Sheet1 DataFrame of the file at `path`, for pages that only read.
+
+    Shares the cache (and data version) with load_excel_data, but when nothing
+    has loaded the full workbook yet only Sheet1 is streamed in; the writable
+    workbook is opened on the first submission.
+    """
+    signature = get_file_version(path)
+    with _excel_cache_lock:
+        entry = _excel_cache.get(path)
+        if entry is not None and path in _saving:
+            # The file is being rewritten from this entry: its signature changes, the data does not
+            return entry["df"]
+        if entry is None or entry["signature"] != signature:
+            with span("load", path=path, read_only=True):
+                rows, seq = _read_frame(path)
+            with span("journal_replay"):
+                replayed = _overlay_journal(path, rows, seq)
+            with span("dataframe"):
+                entry = _new_entry(path, signature, _frame_from_rows(rows), None, dirty=bool(replayed))
+            if replayed:
+                get_compactor(path).appended(replayed)
+    return entry["df"]
+
+
+def read_excel_frame(path):
+    """Sheet1 DataFrame of the file at `path` (with journaled submissions), read-only and not cached"""
+    rows, seq = _read_frame(path)
+    _overlay_journal(path, rows, seq)
+    return _frame_from_rows(rows)
 
 
 def load_excel_data(path):
-    """Load Excel file from path or GitHub"""
+    """Load Excel file from path, parsing it only once per file version; returns (df, writable workbook)"""
+    signature = get_file_version(path)
+    with _excel_cache_lock:
+        entry = _excel_cache.get(path)
+        if entry is not None and path in _saving:
+            return entry["df"], entry["wb"]
+        if entry is None or entry["signature"] != signature or entry["wb"] is None:
+            with span("load", path=path):
+                wb = openpyxl.load_workbook(path)
+            _workbook_paths[wb] = path
+            with span("journal_replay"):
+                replayed = _replay_journal(path, wb)
+            if entry is not None and entry["signature"] == signature:
+                # Upgrading a load_excel_frame entry: same data, so the version and derived caches stay
+                _make_images_reusable(wb)
+                entry["wb"] = wb
+            else:
+                with span("dataframe"):
+                    entry = _store_excel_cache(path, wb, signature, dirty=bool(replayed))
+                if replayed:
+                    get_compactor(path).appended(replayed)
+    return entry["df"], entry["wb"]
+
+
+def refresh_excel_cache(path, wb, dirty=False):
+    """Re-key the cache after `wb` was saved to `path` so the next load does not re-parse it
+    (`dirty` if `wb` was changed again after the save)"""
+    with _excel_cache_lock:
+        return _store_excel_cache(path, wb, get_file_version(path), dirty=dirty)["version"]
+
+
+def _bump_excel_cache(path, wb):
+    """New data version for an in-memory change that is not on disk yet (journaled submissions)"""
+    with _excel_cache_lock:
+        entry = _excel_cache.get(path)
+        signature = entry["signature"] if entry else get_file_version(path)
+        return _store_excel_cache(path, wb, signature, dirty=True)["version"]
+
+
+def _overlay_excel_cache(path, submissions):
+    """New data version with `submissions` in the Sheet1 frame only, for a workbook that is being saved"""
+    with _excel_cache_lock:
+        entry = _excel_cache[path]
+        df = entry["df"].copy()
+        positions = {}
+        for position, task_id in enumerate(normalize_ids(df["Task ID"])):
+            positions.setdefault(task_id, position)
+        columns = [df.columns.get_loc(column) for column in RESULT_COLUMNS]
+        for column in RESULT_COLUMNS:
+            df[column] = df[column].astype(object)
+        for submission in submissions:
+            values = submission["tester_name"], submission["test_result"], submission["timestamp"]
+            df.iloc[positions[normalize_id(submission["task_id"])], columns] = values
+        return _new_entry(path, entry["signature"], df.infer_objects(), entry["wb"], dirty=True)["version"]
+
+
+def invalidate_excel_cache(path=None):
+    with _excel_cache_lock:
+        if path is None:
+            _excel_cache.clear()
+        else:
+            _excel_cache.pop(path, None)
+
+
+def get_data_version(path):
+    """Monotonic version of the cached data for `path` (None if not loaded yet)"""
+    entry = _excel_cache.get(path)
+    return entry["version"] if entry else None
+
+
+def get_derived(path, name, build):
+    """Return `build(df)` for the cached data of `path`, computed once per data version"""
+    with _excel_cache_lock:
+        entry = _excel_cache[path]
+        derived = entry["derived"]
+        if name not in derived:
+            with span(f"derived.{name}"):
+                derived[name] = build(entry["df"])
+        return derived[name]
+
+
+def normalize_id(task_id):
+    """Canonical string form of a Task ID: 2, 2.0 and "2.0" -> "2"; other IDs keep their text
+    (2.1 -> "2.1", and "1.10" stays distinct from "1.1")"""
+    text = str(task_id).strip()
     try:
-        df = pd.read_excel(path, sheet_name="Sheet1")
-        wb = openpyxl.load_workbook(path)
-        return df, wb
-    except Exception as e:
-        st.error(f"Error loading Excel: {str(e)}")
-        raise
+        number = float(text)
+    except ValueError:
+        return text
+    return str(int(number)) if number.is_integer() else text
+
+
+def normalize_ids(task_ids):
+    """Vectorized normalize_id for a Series of Task IDs"""
+    text = task_ids.astype(str).str.strip()
+    numbers = pd.to_numeric(text, errors="coerce")
+    integral = numbers.notna() & (numbers % 1 == 0)
+    normalized = text.astype(object)
+    normalized[integral] = numbers[integral].astype("int64").astype(str)
+    return normalized
+
+
+BLOCK_LABELS = ("Task", "Subtask")
+
+
+class WorkbookIndex:
+    """Row positions in a loaded workbook, built lazily and kept current by every write.
+
+    `main_rows` maps normalized Task ID -> Sheet1 row. For each "Task ID N"
+    sheet, `blocks` maps (label, "Task <id>") -> [start, end], where `end` is
+    the first row after the block's labelled rows (where new rows are written).
+    If a key appears more than once (e.g. a block merged in from another copy of
+    the workbook is appended), the last block is the current one.
+    """
+
+    def __init__(self, wb):
+        self.wb = wb
+        self._main_rows = None
+        self.blocks = {}
+        self.last_row = {}
+
+    @property
+    def main_rows(self):
+        if self._main_rows is None:
+            main_ws = self.wb["Sheet1"]
+            main_rows = {}
+            with span("index.main_rows"):
+                for row, (value,) in enumerate(main_ws.iter_rows(min_row=2, max_col=1, values_only=True), start=2):
+                    if value is not None:
+                        main_rows.setdefault(normalize_id(value), row)
+            self._main_rows = main_rows
+        return self._main_rows
+
+    def sheet_blocks(self, ws):
+        if ws.title not in self.blocks:
+            blocks = {}
+            last_row = 0
+            for row, (label, text) in enumerate(ws.iter_rows(min_row=1, max_col=2, values_only=True), start=1):
+                if label is not None or text is not None:
+                    last_row = row
+                if label in BLOCK_LABELS:
+                    blocks[(label, text)] = [row, None]
+            for block in blocks.values():
+                block[1] = self._block_end(ws, block[0])
+            self.blocks[ws.title] = blocks
+            self.last_row[ws.title] = last_row
+        return self.blocks[ws.title]
+
+    @staticmethod
+    def _block_end(ws, start):
+        row = start + 1
+        while ws.cell(row=row, column=1).value not in [None, "", "Task", "Subtask"]:
+            row += 1
+        return row
+
+    def find_block(self, ws, label, text):
+        return self.sheet_blocks(ws).get((label, text))
+
+    def add_block(self, ws, label, text, start):
+        self.sheet_blocks(ws)[(label, text)] = [start, start]
+
+    def block_written(self, ws, block, last_written_row):
+        block[1] = self._block_end(ws, block[0])
+        self.last_row[ws.title] = max(self.last_row.get(ws.title, 0), last_written_row)
+
+    def append_row(self, ws):
+        """Start row for a new block at the end of the sheet (one blank row after the last one)"""
+        self.sheet_blocks(ws)
+        return self.last_row[ws.title] + 2
+
+
+_workbook_indexes = weakref.WeakKeyDictionary()
+# File each cached workbook was loaded from, for its blob store
+_workbook_paths = weakref.WeakKeyDictionary()
+
+
+def get_workbook_index(wb):
+    index = _workbook_indexes.get(wb)
+    if index is None:
+        index = _workbook_indexes[wb] = WorkbookIndex(wb)
+    return index
+
+
+def workbook_blob_store(wb):
+    """Blob store next to the file `wb` was loaded from (the current directory for other workbooks)"""
+    return get_blob_store(_workbook_paths.get(wb, os.path.join(os.getcwd(), "")))
 
 
 def get_task_ids(df):
     return df["Task ID"].dropna().astype(str).tolist()
 
 
-def insert_image(ws, img_bytes, row):
-    img = Image.open(img_bytes)
-    img.thumbnail((600, 400))
-    bio = io.BytesIO()
-    img.save(bio, format="PNG")
-    bio.seek(0)
-    img_obj = OpenpyxlImage(bio)
-    cell = f"A{row}"
-    ws.add_image(img_obj, cell)
+SCREENSHOT_LINK_TEXT = "🔗 Full screenshot"
+
+
+def insert_image(ws, screenshot, row):
+    """Add one screenshot (a ProcessedScreenshot or a raw upload) at `row`; returns the next free row.
+
+    Depending on blobstore.SCREENSHOT_STORAGE the full image is embedded, or it is
+    written to the blob store and the sheet only gets a thumbnail and/or a link to it.
+    """
+    if not isinstance(screenshot, ProcessedScreenshot):
+        screenshot = process_screenshots([screenshot])[0]
+    mode = blobstore.SCREENSHOT_STORAGE
+    if mode == "embed":
+        img_obj = OpenpyxlImage(_ReusableBytesIO(screenshot.data))
+        ws.add_image(img_obj, f"A{row}")
+        ws.column_dimensions['A'].width = 60
+        ws.row_dimensions[row].height = 100
+        return row + 15
+
+    name = workbook_blob_store(ws.parent).put(screenshot)
+    link = ws.cell(row=row, column=2, value=SCREENSHOT_LINK_TEXT)
+    link.hyperlink = f"{blobstore.BLOB_DIR}/{name}"
+    link.style = "Hyperlink"
+    if mode == "link":
+        ws.cell(row=row, column=1, value="Screenshot")
+        return row + 1
+    preview = screenshot.preview or make_preview(screenshot.data)
+    ws.add_image(OpenpyxlImage(_ReusableBytesIO(preview)), f"A{row}")
     ws.column_dimensions['A'].width = 60
-    ws.row_dimensions[row].height = 100
-    return row + 15
-
-
-
-
-def save_screenshots_to_excel(excel_path, df_main, wb, task_id, tester_name, test_result, comment, screenshots):
-    def normalize_id(tid):
-        return str(int(float(tid))) if float(tid).is_integer() else str(tid)
-
+    ws.row_dimensions[row].height = 125
+    return row + 1
+
+
+def append_block(ws, row, label, block_text, navigation, tester_name, timestamp, test_result, comment, screenshots,
+                 blob_store=None):
+    """Append one result block to a write-only worksheet whose next row is `row`; returns the next row.
+
+    Same cells as apply_submission writes into a new block, but appended in
+    order (write-only sheets have no row heights, so those are left out).
+    Unless screenshots are embedded they go to `blob_store`, the store of the
+    file the workbook is for.
+    """
+    bold = Font(bold=True)
+
+    def append(values=(), fill=None):
+        nonlocal row
+        cells = []
+        for value in values:
+            cell = WriteOnlyCell(ws, value=value)
+            cell.font = bold
+            cells.append(cell)
+        if fill is not None:
+            cells[1].fill = fill
+        ws.append(cells)
+        row += 1
+
+    for key, value in ((label, block_text), ("Navigation", navigation), ("Tester Name", tester_name),
+                       ("Timestamp", timestamp)):
+        append([key, value])
+
+    mode = blobstore.SCREENSHOT_STORAGE
+    for screenshot in process_screenshots(screenshots):
+        if mode == "embed":
+            ws.add_image(OpenpyxlImage(_ReusableBytesIO(screenshot.data)), f"A{row}")
+            for _ in range(15):
+                append()
+            continue
+        link = WriteOnlyCell(ws, value=SCREENSHOT_LINK_TEXT)
+        link.hyperlink = f"{blobstore.BLOB_DIR}/{blob_store.put(screenshot)}"
+        link.style = "Hyperlink"
+        if mode != "link":
+            preview = screenshot.preview or make_preview(screenshot.data)
+            ws.add_image(OpenpyxlImage(_ReusableBytesIO(preview)), f"A{row}")
+        ws.append(["Screenshot" if mode == "link" else None, link])
+        row += 1
+
+    fill_color = RESULT_FILLS.get(test_result, "FFFFFF")
+    append(["Test Result", test_result],
+           fill=PatternFill(start_color=fill_color, end_color=fill_color, fill_type="solid"))
+    if comment:
+        append(["Comment", comment])
+    return row
+
+
+RESULT_FILLS = {
+    "Pass": "90EE90",
+    "Fail": "FF6347",
+    "Hold": "FFB6C1"
+}
+
+# Serializes mutations of cached workbooks (submissions and remote merges)
+workbook_lock = threading.RLock()
+# Notified when persist_workbook finishes saving a workbook
+_saved = threading.Condition(workbook_lock)
+
+
+def writable_workbook(path):
+    """The cached workbook of `path`, to be changed; call with workbook_lock held.
+    Waits while persist_workbook is saving it"""
+    while path in _saving:
+        _saved.wait()
+    return load_excel_data(path)[1]
+
+
+def save_screenshots_to_excel(excel_path, df_main, wb, task_id, tester_name, test_result, comment, screenshots,
+                              timestamp=None):
+    """Record one submission in `wb`; returns the new data version for file paths.
+
+    For a file path the submission is appended to the journal and applied to the
+    cached workbook; the file itself is rewritten later by the compactor. Any
+    other target (e.g. a BytesIO) gets a full save.
+    """
+    with workbook_lock:
+        if not isinstance(excel_path, (str, os.PathLike)):
+            apply_submission(wb, task_id, tester_name, test_result, comment, screenshots, timestamp=timestamp)
+            write_workbook(wb, excel_path)
+            return None
+        return journal_submissions(excel_path, [{
+            "task_id": task_id,
+            "tester_name": tester_name,
+            "test_result": test_result,
+            "comment": comment,
+            "screenshots": screenshots,
+            "timestamp": timestamp,
+        }])
+
+
+def prepare_submissions(path, submissions):
+    """Check and decode a batch of submissions before anything is journaled.
+
+    Returns (submission, images) pairs: `submission` has its timestamp filled in
+    and decoded ProcessedScreenshot objects for apply_submission, `images` the
+    raw bytes that go into the journal. Unknown Task IDs raise KeyError and
+    images that do not decode raise PIL's error.
+    """
+    now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    with workbook_lock:
+        _, wb = load_excel_data(path)
+        # Built before any save (see persist_workbook), so this only reads a workbook being saved
+        main_rows = get_workbook_index(wb).main_rows
+    missing = [submission["task_id"] for submission in submissions
+               if normalize_id(submission["task_id"]) not in main_rows]
+    if missing:
+        raise KeyError(f"Task IDs not found in Sheet1: {missing}")
+    prepared = []
+    for submission in submissions:
+        images = [read_upload(screenshot) for screenshot in submission.get("screenshots") or []]
+        prepared.append((dict(submission, timestamp=submission.get("timestamp") or now,
+                              comment=submission.get("comment"), screenshots=process_screenshots(images)), images))
+    return prepared
+
+
+def journal_submissions(path, submissions):
+    """Journal a batch of submissions (dicts of apply_submission arguments) with one fsync and
+    apply them to the cached workbook; returns the new data version.
+
+    The whole batch is checked and decoded first (prepare_submissions), so a
+    bad submission raises before anything is journaled. The file itself is
+    rewritten later by the compactor.
+    """
+    return journal_prepared(path, prepare_submissions(path, submissions))
+
+
+def journal_prepared(path, prepared, record=None):
+    """journal_submissions for (submission, images) pairs from prepare_submissions.
+
+    `record(submissions)` (e.g. the result history) is called under the same
+    lock, before the new data version becomes visible to readers. While the
+    workbook is being saved the batch does not wait: it is journaled and shown
+    in the Sheet1 frame, and applied to the workbook once the save is done.
+    """
+    with workbook_lock:
+        _, wb = load_excel_data(path)
+        with span("journal", count=len(prepared), images=sum(len(images) for _, images in prepared)):
+            seqs = get_journal(path).append_many([dict(submission, task_id=str(submission["task_id"]),
+                                                       screenshots=images)
+                                                  for submission, images in prepared])
+        submissions = [submission for submission, _ in prepared]
+        saving = _saving.get(path)
+        if saving is not None and saving["wb"] is wb:
+            saving["deferred"].append((submissions, seqs[-1]))
+            if record is not None:
+                record(submissions)
+            version = _overlay_excel_cache(path, submissions)
+        else:
+            apply_submissions(wb, submissions)
+            set_journal_seq(wb, seqs[-1])
+            if record is not None:
+                record(submissions)
+            version = _bump_excel_cache(path, wb)
+    get_compactor(path).appended(len(prepared))
+    return version
+
+
+def apply_submission(wb, task_id, tester_name, test_result, comment, screenshots, timestamp=None, summary=True):
+    """Write a submission's block, Sheet1 row and Summary changes into `wb` (no save).
+
+    Returns the Sheet1 (old, new) change; with `summary=False` the Summary sheet is
+    left for the caller to update (see apply_submissions).
+    """
+    timestamp = timestamp or datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    index = get_workbook_index(wb)
+    main_ws = wb["Sheet1"]
     normalized_task_id = normalize_id(task_id)
-    task_info = df_main[df_main["Task ID"].astype(str).apply(normalize_id) == normalized_task_id].iloc[0]
+    main_row = index.main_rows.get(normalized_task_id)
+    if main_row is None:
+        raise KeyError(f"Task ID {task_id} not found in Sheet1")
+    navigation = main_ws.cell(row=main_row, column=3).value
     main_task_id = str(task_id).split('.')[0]
     sheet_name = f"Task ID {main_task_id}"
+    label = "Task" if '.' not in str(task_id) else "Subtask"
+    block_text = f"Task {task_id}"
 
-    new_sheet = False
     if sheet_name not in wb.sheetnames:
         ws = wb.create_sheet(sheet_name)
+        block = None
         current_row = 1
-        new_sheet = True
     else:
         ws = wb[sheet_name]
-        current_row = None
-
-        search_label = "Task" if '.' not in str(task_id) else "Subtask"
-        search_text = f"Task {task_id}"
-
-        for row in ws.iter_rows(min_row=1, max_col=2):
-            if row[0].value == search_label and row[1].value == search_text:
-                current_row = row[0].row
-                while True:
-                    current_row += 1
-                    next_label = ws.cell(row=current_row, column=1).value
-                    if next_label in [None, "", "Task", "Subtask"]:
-                        break
-                break
-
-        if current_row is None:
-            current_row = ws.max_row + 2
+        with span("block_search", sheet=sheet_name):
+            block = index.find_block(ws, label, block_text)
+        current_row = block[1] if block else index.append_row(ws)
 
     def write_row(label, value, bold=False):
         nonlocal current_row
@@ -85,182 +638,245 @@ def save_screenshots_to_excel(excel_path, df_main, wb, task_id, tester_name, tes
         ws.cell(row=current_row, column=2, value=value).font = font_style
         current_row += 1
 
-    is_new_block = new_sheet or current_row == ws.max_row + 2
-
-    if is_new_block:
-        label = "Task" if '.' not in str(task_id) else "Subtask"
-        write_row(label, f"Task {task_id}", bold=True)
-        write_row("Navigation", task_info["Navigation"], bold=True)
+    if block is None:
+        index.add_block(ws, label, block_text, current_row)
+        block = index.find_block(ws, label, block_text)
+        write_row(label, block_text, bold=True)
+        write_row("Navigation", navigation, bold=True)
         write_row("Tester Name", tester_name, bold=True)
-        write_row("Timestamp", datetime.now().strftime("%Y-%m-%d %H:%M:%S"), bold=True)
+        write_row("Timestamp", timestamp, bold=True)
 
-    for screenshot in screenshots:
-        current_row = insert_image(ws, screenshot, current_row)
+    processed = process_screenshots(screenshots)
+    with span("insert_images", count=len(processed)):
+        for screenshot in processed:
+            current_row = insert_image(ws, screenshot, current_row)
 
     result_row = current_row
     write_row("Test Result", test_result, bold=True)
 
-    fill_color = {
-        "Pass": "90EE90",
-        "Fail": "FF6347",
-        "Hold": "FFB6C1"
-    }.get(test_result, "FFFFFF")
+    fill_color = RESULT_FILLS.get(test_result, "FFFFFF")
 
     ws.cell(row=result_row, column=2).fill = PatternFill(start_color=fill_color, end_color=fill_color, fill_type="solid")
 
     if comment:
         write_row("Comment", comment, bold=True)
 
+    index.block_written(ws, block, current_row - 1)
     current_row += 2
 
-    main_ws = wb["Sheet1"]
-    for row in range(2, main_ws.max_row + 1):
-        cell_task_id = str(main_ws.cell(row=row, column=1).value)
-        if normalize_id(cell_task_id) == normalized_task_id:
-            main_ws.cell(row=row, column=5).value = tester_name
-            main_ws.cell(row=row, column=6).value = test_result
-            main_ws.cell(row=row, column=7).value = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            result_cell = main_ws.cell(row=row, column=6)
-            result_cell.fill = PatternFill(start_color=fill_color, end_color=fill_color, fill_type="solid")
-            break
-
-    def update_summary_sheet():
-        summary_sheet_name = "Summary"
-        summary_ws = wb.create_sheet(summary_sheet_name) if summary_sheet_name not in wb.sheetnames else wb[summary_sheet_name]
-
-        df_updated = pd.DataFrame(main_ws.values)
-        headers = df_updated.iloc[0].tolist()
-        df_updated.columns = [str(col).strip() if col is not None else f"Column_{i}" for i, col in enumerate(headers)]
-        df_updated = df_updated.drop(index=0).reset_index(drop=True)
-
-        total_tasks = df_updated.shape[0]
-        pass_count = df_updated[df_updated["Test Result"] == "Pass"].shape[0]
-        fail_count = df_updated[df_updated["Test Result"] == "Fail"].shape[0]
-        hold_count = df_updated[df_updated["Test Result"] == "Hold"].shape[0]
-        pass_rate = f"{(pass_count / total_tasks * 100):.2f}%" if total_tasks else "0%"
-
-        summary_data = [
-            ("Total Tasks", total_tasks),
-            ("Pass", pass_count),
-            ("Fail", fail_count),
-            ("Hold", hold_count),
-            ("Pass Rate", pass_rate),
-            ("Last Updated Task ID", task_id),
-            ("Last Updated By", tester_name),
-            ("Last Updated On", datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
-        ]
-
-        for i, (label, value) in enumerate(summary_data, start=1):
-            summary_ws.cell(row=i, column=1).value = label
-            summary_ws.cell(row=i, column=2).value = value
-            summary_ws.cell(row=i, column=1).font = Font(bold=True)
-
-        while summary_ws._charts:
-            summary_ws._charts.pop()
-
-        labels = Reference(summary_ws, min_col=1, min_row=2, max_row=4)
-        data = Reference(summary_ws, min_col=2, min_row=2, max_row=4)
-        pie_chart = PieChart()
-        pie_chart.title = "Test Result Summary"
-        pie_chart.add_data(data, titles_from_data=False)
-        pie_chart.set_categories(labels)
-        pie_chart.dataLabels = DataLabelList()
-        pie_chart.dataLabels.showVal = True
-        summary_ws.add_chart(pie_chart, "D2")
-
-        progress_row = 12
-        percent_complete = (pass_count + fail_count + hold_count) / total_tasks if total_tasks else 0
-        progress_bar = int(percent_complete * 20) * "█" + (20 - int(percent_complete * 20)) * "-"
-        summary_ws.cell(row=progress_row, column=1).value = "Progress"
-        summary_ws.cell(row=progress_row, column=2).value = f"[{progress_bar}] {int(percent_complete * 100)}%"
-        summary_ws.cell(row=progress_row, column=2).fill = PatternFill(start_color="ADD8E6", end_color="ADD8E6", fill_type="solid")
-
-        if "Timestamp" in df_updated.columns:
-            df_filtered = df_updated[df_updated["Timestamp"].notna()]
-            df_filtered["Date"] = pd.to_datetime(df_filtered["Timestamp"]).dt.date
-            date_summary = df_filtered.groupby("Date").size().reset_index(name="Tasks Completed")
-
-            summary_ws.cell(row=19, column=1).value = "Date"
-            summary_ws.cell(row=19, column=2).value = "Test Count"
-            summary_ws.cell(row=19, column=1).font = Font(bold=True)
-            summary_ws.cell(row=19, column=2).font = Font(bold=True)
-
-            for i, (date, count) in enumerate(date_summary.itertuples(index=False), start=20):
-                summary_ws.cell(row=i, column=1).value = str(date)
-                summary_ws.cell(row=i, column=2).value = count
-
-            line_chart = LineChart()
-            line_chart.title = "Task Completion Over Time"
-            line_chart.y_axis.title = "Tasks Completed"
-            line_chart.x_axis.title = "Date"
-            line_chart.add_data(Reference(summary_ws, min_col=2, min_row=19, max_row=19 + len(date_summary)), titles_from_data=True)
-            line_chart.set_categories(Reference(summary_ws, min_col=1, min_row=20, max_row=19 + len(date_summary)))
-            summary_ws.add_chart(line_chart, "D18")
-
-        if "Tester Name" in df_updated.columns and "Test Result" in df_updated.columns:
-            df_filtered = df_updated[df_updated["Test Result"].notna()]
-            tester_summary = df_filtered["Tester Name"].value_counts().reset_index()
-            tester_summary.columns = ["Tester Name", "Tasks Completed"]
-
-            summary_ws.cell(row=39, column=1).value = "Tester Name"
-            summary_ws.cell(row=39, column=2).value = "Test Count"
-            summary_ws.cell(row=39, column=1).font = Font(bold=True)
-            summary_ws.cell(row=39, column=2).font = Font(bold=True)
-
-            for i, (name, count) in enumerate(tester_summary.itertuples(index=False), start=40):
-                summary_ws.cell(row=i, column=1).value = name
-                summary_ws.cell(row=i, column=2).value = count
-
-            bar_chart = BarChart()
-            bar_chart.title = "Tasks Completed Per Tester"
-            bar_chart.y_axis.title = "Task Count"
-            bar_chart.x_axis.title = "Tester"
-            bar_chart.add_data(Reference(summary_ws, min_col=2, min_row=39, max_row=39 + len(tester_summary)), titles_from_data=True)
-            bar_chart.set_categories(Reference(summary_ws, min_col=1, min_row=40, max_row=39 + len(tester_summary)))
-            summary_ws.add_chart(bar_chart, "D35")
-
-    update_summary_sheet()
-    wb.save(excel_path)
-    upload_to_github(
-        local_file_path="main_excel.xlsx",
-        github_username="Ai-TestingApp",
-        repo_name="Ai-Testing-Tool",
-        github_token=st.secrets["GITHUB_TOKEN"],
-        repo_file_path="main_excel.xlsx"
-    )
-
-        
-        
-
-        # Upload to GitHub
-        #upload_to_github(excel_path, "Ai-TestingApp", "Ai-Testing-Tool", st.secrets["GITHUB_TOKEN"], excel_path)
-def upload_to_github(local_file_path, github_username, repo_name, github_token, repo_file_path, branch="main"):
-    url = f"https://api.github.com/repos/{github_username}/{repo_name}/contents/{repo_file_path}"
-    headers = {
-        "Authorization": f"Bearer {github_token}",
-        "Accept": "application/vnd.github.v3+json"
-    }
-
-    # Step 1: Get current SHA of the file
-    response = requests.get(url, headers=headers)
-    if response.status_code != 200:
-        raise Exception(f"❌ Failed to get file SHA from GitHub: {response.status_code}, {response.text}")
-    
-    sha = response.json()["sha"]
-
-    # Step 2: Read and encode the local file
-    with open(local_file_path, "rb") as f:
-        content = base64.b64encode(f.read()).decode()
-
-    # Step 3: Upload new content
-    data = {
-        "message": "Automated update from Streamlit app",
-        "content": content,
-        "sha": sha,
-        "branch": branch
-    }
+    summary_engine = get_summary_engine(wb)
+    old_values = tuple(main_ws.cell(row=main_row, column=col).value for col in (5, 6, 7))
+    new_values = (tester_name, test_result, timestamp)
+    for col, value in zip((5, 6, 7), new_values):
+        main_ws.cell(row=main_row, column=col).value = value
+    result_cell = main_ws.cell(row=main_row, column=6)
+    result_cell.fill = PatternFill(start_color=fill_color, end_color=fill_color, fill_type="solid")
+
+    if summary:
+        with span("summary"):
+            summary_engine.apply(old_values, new_values, task_id, tester_name)
+    return old_values, new_values
+
+
+def apply_submissions(wb, submissions):
+    """Apply several submissions (dicts of apply_submission arguments) and render the Summary once"""
+    main_rows = get_workbook_index(wb).main_rows
+    missing = [submission["task_id"] for submission in submissions
+               if normalize_id(submission["task_id"]) not in main_rows]
+    if missing:
+        # Checked up front so a bad batch leaves the workbook untouched
+        raise KeyError(f"Task IDs not found in Sheet1: {missing}")
+    changes = [apply_submission(wb, summary=False, **submission) for submission in submissions]
+    if changes:
+        last = submissions[-1]
+        with span("summary", count=len(changes)):
+            get_summary_engine(wb).apply_changes(changes, last["task_id"], last["tester_name"])
+    return len(changes)
+
+
+def save_submissions(path, submissions, record=None):
+    """Apply a batch of submissions to the workbook at `path` and save it once; returns the new data version.
+    Nothing is applied if any submission fails prepare_submissions; `record` is as for journal_prepared"""
+    prepared = prepare_submissions(path, submissions)
+    with workbook_lock:
+        wb = writable_workbook(path)
+        submissions = [submission for submission, _ in prepared]
+        apply_submissions(wb, submissions)
+        if record is not None:
+            record(submissions)
+        return persist_workbook(path, wb)
+
+
+def save_workbook(wb, path):
+    """Save via a temp file + rename so readers (e.g. the sync worker) never see a half-written file"""
+    tmp_path = f"{path}.tmp"
+    with span("save", path=path):
+        write_workbook(wb, tmp_path)
+        os.replace(tmp_path, path)
+
+
+JOURNAL_SEQ_PROPERTY = "journal_seq"
+
+_journals = {}
+_compactors = {}
+_save_listeners = {}
+_journal_lock = threading.Lock()
+
+
+def get_journal_seq(wb):
+    """Sequence number of the last journal entry contained in `wb`"""
+    props = wb.custom_doc_props
+    return props[JOURNAL_SEQ_PROPERTY].value if JOURNAL_SEQ_PROPERTY in props.names else 0
+
+
+def set_journal_seq(wb, seq):
+    props = wb.custom_doc_props
+    if JOURNAL_SEQ_PROPERTY in props.names:
+        props[JOURNAL_SEQ_PROPERTY].value = seq
+    else:
+        props.append(IntProperty(name=JOURNAL_SEQ_PROPERTY, value=seq))
+
+
+def get_journal(path):
+    with _journal_lock:
+        if path not in _journals:
+            _journals[path] = SubmissionJournal(f"{path}.journal")
+        return _journals[path]
+
+
+def get_compactor(path):
+    with _journal_lock:
+        if path not in _compactors:
+            _compactors[path] = Compactor(lambda: compact_workbook(path))
+        return _compactors[path]
+
+
+def set_save_listener(path, listener):
+    """Call `listener(version)` whenever the workbook at `path` is rewritten on disk"""
+    _save_listeners[path] = listener
+
+
+def _replay_journal(path, wb):
+    """Apply journal entries newer than the workbook's checkpoint; returns how many were applied.
+
+    An entry that cannot be applied (unknown Task ID, missing or undecodable
+    screenshot) is quarantined by the journal instead of failing the load.
+    """
+    if not os.path.isdir(f"{path}.journal"):
+        return 0
+    journal = get_journal(path)
+    entries = journal.entries_after(get_journal_seq(wb))
+    main_rows = get_workbook_index(wb).main_rows
+    submissions = []
+    for entry in entries:
+        try:
+            if normalize_id(entry["task_id"]) not in main_rows:
+                raise KeyError(f"Task ID {entry['task_id']} not found in Sheet1")
+            screenshots = process_screenshots([journal.blob(digest) for digest in entry["screenshots"]])
+        except Exception as e:
+            journal.reject(entry, e)
+            continue
+        submissions.append({
+            "task_id": entry["task_id"],
+            "tester_name": entry["tester_name"],
+            "test_result": entry["test_result"],
+            "comment": entry["comment"],
+            "screenshots": screenshots,
+            "timestamp": entry["timestamp"],
+        })
+    apply_submissions(wb, submissions)
+    if entries:
+        set_journal_seq(wb, entries[-1]["seq"])
+    return len(submissions)
+
+
+def _overlay_journal(path, rows, seq):
+    """Apply the Sheet1 part of journal entries newer than `seq` to raw Sheet1 `rows` (in place)"""
+    if not os.path.isdir(f"{path}.journal"):
+        return 0
+    entries = get_journal(path).entries_after(seq)
+    if not entries:
+        return 0
+    main_rows = {}
+    for i, row in enumerate(rows[1:], start=1):
+        if row and row[0] is not None:
+            main_rows.setdefault(normalize_id(row[0]), i)
+    for entry in entries:
+        i = main_rows.get(normalize_id(entry["task_id"]))
+        if i is None:
+            continue
+        row = list(rows[i]) + [None] * (7 - len(rows[i]))
+        row[4:7] = entry["tester_name"], entry["test_result"], entry["timestamp"]
+        rows[i] = tuple(row)
+    return len(entries)
+
+
+def persist_workbook(path, wb):
+    """Write the cached workbook to disk and drop the journal entries it now contains.
+
+    The save itself runs outside workbook_lock (unless the caller holds it), so
+    submissions keep being journaled meanwhile; see journal_prepared.
+    """
+    with workbook_lock:
+        while path in _saving:
+            _saved.wait()
+        seq = get_journal_seq(wb)
+        # Submissions read the index of the workbook being saved, so it must not be built during the save
+        get_workbook_index(wb).main_rows
+        _saving[path] = {"wb": wb, "deferred": []}
+    saved = False
+    try:
+        save_workbook(wb, path)
+        saved = True
+    finally:
+        with workbook_lock:
+            deferred = _saving[path]["deferred"]
+            for submissions, last_seq in deferred:
+                apply_submissions(wb, submissions)
+                set_journal_seq(wb, last_seq)
+            if saved:
+                version = refresh_excel_cache(path, wb, dirty=bool(deferred))
+            elif deferred:
+                _bump_excel_cache(path, wb)
+            del _saving[path]
+            _saved.notify_all()
+            # Still under the lock, so the journal never loses an entry the file does not have
+            if saved and os.path.isdir(f"{path}.journal"):
+                get_journal(path).truncate(seq)
+    return version
+
+
+def compact_workbook(path):
+    """Fold journaled submissions into the file at `path`; returns the new data version"""
+    with _excel_cache_lock:
+        entry = _excel_cache.get(path)
+    if entry is None:
+        return None
+    with trace("compaction", path=path):
+        wb = entry["wb"] or load_excel_data(path)[1]
+        version = persist_workbook(path, wb)
+    listener = _save_listeners.get(path)
+    if listener:
+        listener(version)
+    return version
+
+
+def export_workbook_bytes(path):
+    """Current workbook contents (including uncompacted submissions) as .xlsx bytes.
+
+    The file on disk is returned as is when it is up to date; the workbook is
+    only serialized while it holds journaled changes.
+    """
+    with workbook_lock:
+        load_excel_frame(path)
+        with _excel_cache_lock:
+            dirty = _excel_cache[path]["dirty"]
+        if not dirty:
+            with open(path, "rb") as f:
+                return f.read()
+        wb = writable_workbook(path)
+        bio = io.BytesIO()
+        with span("serialize"):
+            write_workbook(wb, bio)
+    return bio.getvalue()
 
-    put_response = requests.put(url, headers=headers, json=data)
-    if put_response.status_code != 200:
-        raise Exception(f"⚠️ GitHub update failed: {put_response.status_code} {put_response.text}")
-    return put_response.json()
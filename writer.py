@@ -0,0 +1,103 @@
+"""Single writer for submissions: one queue and one thread per storage.
+
+Sessions never write to the storage themselves. `submit()` enqueues a
+submission and blocks until the writer thread has applied it; the return value
+is the data version that contains it (the acknowledgment). Submissions that
+arrive while a batch is being written, or within WRITE_WINDOW of the first one,
+are written together in one call (one journal fsync / one transaction), so
+throughput grows with the number of concurrent testers instead of each one
+waiting for its own write.
+
+Each submission is prepared (checked and decoded) in its caller's thread before
+it is queued, so screenshot decoding runs in parallel across sessions and one
+bad submission fails only its own caller. The writer thread only writes: each
+batch all or nothing, never retried, since a retry could apply part of it twice.
+"""
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from perf import current_context, span, trace
+
+# How long the writer waits for more submissions after the first one of a batch (s)
+WRITE_WINDOW = 0.005
+WRITE_BATCH = 50
+
+
+class SubmissionQueue:
+    """Serializes writes through `write_batch(prepared) -> version`, called from one thread only.
+    `prepare(submission)` runs in the submitting thread and raises for a submission that cannot be written"""
+
+    def __init__(self, write_batch, prepare=None, name="writer", window=WRITE_WINDOW, max_batch=WRITE_BATCH):
+        self.write_batch = write_batch
+        self.prepare = prepare
+        self.name = name
+        self.window = window
+        self.max_batch = max_batch
+        self.batches = 0
+        self.written = 0
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+
+    def submit_async(self, submission):
+        """Enqueue a submission (dict); the Future resolves to its data version or raises its error"""
+        self._start()
+        future = Future()
+        if self.prepare is not None:
+            try:
+                with span("prepare"):
+                    submission = self.prepare(submission)
+            except Exception as e:
+                future.set_exception(e)
+                return future
+        # The caller's trace context (tester, task, ...) goes into the writer's trace for this batch
+        self._queue.put((submission, current_context(), future))
+        return future
+
+    def submit(self, submission, timeout=None):
+        return self.submit_async(submission).result(timeout)
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.window
+        while len(batch) < self.max_batch:
+            try:
+                batch.append(self._queue.get(timeout=max(0.0, deadline - time.monotonic())))
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, batch):
+        with trace("write", writer=self.name, count=len(batch), submissions=[context for _, context, _ in batch]):
+            try:
+                version = self.write_batch([prepared for prepared, _, _ in batch])
+            except Exception as e:
+                for _, _, future in batch:
+                    future.set_exception(e)
+                return
+        self.batches += 1
+        self.written += len(batch)
+        for _, _, future in batch:
+            future.set_result(version)
+
+    def _run(self):
+        while True:
+            batch = [item for item in self._collect() if item[2].set_running_or_notify_cancel()]
+            if batch:
+                self._write(batch)
+
+    def status(self):
+        return {
+            "queued": self._queue.qsize(),
+            "batches": self.batches,
+            "written": self.written,
+            "mean_batch": self.written / self.batches if self.batches else 0.0,
+        }